@@ -1,14 +1,14 @@
 import tempfile
-from flask import Flask, request, jsonify
+from flask import Flask, Response, request, jsonify
 import os
 from flask_cors import CORS
 from werkzeug.utils import secure_filename
-from admin_upload import process_pdf
+from ingest import get_ingestion_worker
+from telemetry import register_gauge, render_metrics
 app = Flask(__name__)
 CORS(app)
 # Set up allowed extensions
 ALLOWED_EXTENSIONS = {'pdf'}
-OUTPUT_FOLDER = 'data'
 
 # Utility function to check allowed file extensions
 def allowed_file(filename):
@@ -27,18 +27,34 @@ def upload_pdf():
     if file and allowed_file(file.filename):
         filename = secure_filename(file.filename)
         
-        # Create a temporary directory to store the uploaded file
-        with tempfile.TemporaryDirectory() as tempdir:
-            file_path = os.path.join(tempdir, filename)
-            file.save(file_path)  # Save the uploaded file in the temporary directory
+        # Save into a temporary directory that the ingestion job removes when it is done
+        tempdir = tempfile.mkdtemp()
+        file_path = os.path.join(tempdir, filename)
+        file.save(file_path)
 
-            # Process the uploaded PDF (you can call your processing function here)
-            output_file = process_pdf(file_path, OUTPUT_FOLDER)
-        
-        # After the 'with' block, the temporary directory and its contents are automatically deleted
-        return jsonify({"message": "File processed successfully", "output_file": output_file}), 200
+        # Extract, chunk, embed and upsert this document in the background
+        job = get_ingestion_worker().submit(file_path, filename, cleanup_dir=tempdir)
+        return jsonify({
+            "message": "File queued for indexing",
+            "job_id": job.id,
+            "status_url": f"/jobs/{job.id}",
+        }), 202
     else:
         return jsonify({"error": "Invalid file format. Only PDFs are allowed."}), 400
 
+@app.route('/jobs/<job_id>', methods=['GET'])
+def job_status(job_id):
+    job = get_ingestion_worker().get(job_id)
+    if job is None:
+        return jsonify({"error": "Unknown job"}), 404
+    return jsonify(job.to_dict()), 200
+
+register_gauge("eduquest_ingest_queue_depth", "PDF ingestion jobs queued or running.",
+               lambda: get_ingestion_worker().queue_depth())
+
+@app.route('/metrics', methods=['GET'])
+def metrics():
+    return Response(render_metrics(), mimetype="text/plain; version=0.0.4")
+
 if __name__ == '__main__':
     app.run(host="0.0.0.0",port=5000,debug=True)
@@ -1,11 +1,10 @@
 from flask import Flask, request, jsonify, send_from_directory
 import os
 import fitz  # PyMuPDF
-from pdfminer.high_level import extract_text
-import subprocess
 import tempfile
 import logging
 from werkzeug.utils import secure_filename
+from pdf_extract import iter_pages
 
 # Configure logging
 logging.basicConfig(level=logging.INFO, 
@@ -27,32 +26,35 @@ os.makedirs(PROCESSED_FOLDER, exist_ok=True)
 def allowed_file(filename):
     return '.' in filename and filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
 
-# Function to extract text using PyMuPDF (fitz)
-def extract_text_pymupdf(input_pdf_path):
-    """Extracts text from a PDF using PyMuPDF."""
-    text = ""
+# Function to extract text page by page and stream it to disk
+def write_text(input_pdf_path, output_path, progress=None):
+    """Writes a PDF's text to output_path one page at a time.
+
+    Each page is read once with the best extractor for it (PyMuPDF, pdfminer
+    for pages with broken text, OCR for scanned pages), and pages are written
+    as soon as they arrive so the whole document is never held in memory.
+    The text goes to a temporary file that replaces output_path only once
+    every page is written; extraction errors are logged and re-raised so a
+    truncated file is never indexed. Returns the number of pages written.
+    """
+    pages = 0
+    methods = {}
+    tmp_path = f"{output_path}.tmp"
     try:
-        doc = fitz.open(input_pdf_path)
-        for page_num in range(len(doc)):
-            page = doc.load_page(page_num)
-            extracted_text = page.get_text("text")
-            if extracted_text:
-                text += extracted_text + "\n"
-        logger.info(f"Text extracted from: {input_pdf_path}")
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            for extracted_text in iter_pages(input_pdf_path, progress=progress, methods=methods):
+                if extracted_text:
+                    f.write(extracted_text)
+                    f.write("\n")
+                pages += 1
+        os.replace(tmp_path, output_path)
     except Exception as e:
         logger.error(f"Failed to extract text from {input_pdf_path}: {e}")
-    return text
-
-# Function to extract text using pdfminer
-def extract_text_pdfminer(input_pdf_path):
-    """Extracts text from a PDF using pdfminer."""
-    try:
-        text = extract_text(input_pdf_path)
-        logger.info(f"Text extracted using pdfminer from: {input_pdf_path}")
-        return text
-    except Exception as e:
-        logger.error(f"Failed to extract text using pdfminer from {input_pdf_path}: {e}")
-        return ""
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+    logger.info(f"Text extracted from: {input_pdf_path} ({pages} pages, {methods})")
+    return pages
 
 # Function to remove watermarks (if needed)
 def remove_watermarks(input_pdf_path, output_pdf_path):
@@ -64,24 +66,12 @@ def remove_watermarks(input_pdf_path, output_pdf_path):
     except Exception as e:
         logger.error(f"Failed to remove watermarks from {input_pdf_path}: {e}")
 
-# Function to apply OCR to the PDF if text extraction fails (via OCRmyPDF)
-def apply_ocr(input_pdf_path, output_pdf_path):
-    """Applies OCR to the PDF using OCRmyPDF."""
-    try:
-        subprocess.run([
-            "ocrmypdf", 
-            input_pdf_path, 
-            output_pdf_path, 
-            "--force-ocr", 
-            "--output-type", "pdf"
-        ], check=True)
-        logger.info(f"OCR applied to: {input_pdf_path}")
-    except subprocess.CalledProcessError as e:
-        logger.error(f"Failed to apply OCR to {input_pdf_path}: {e}")
-
 # Main processing function
-def process_pdf(input_pdf, output_folder):
-    """Process the uploaded PDF to remove watermarks, extract, clean text, and apply OCR if needed."""
+def process_pdf(input_pdf, output_folder, progress=None):
+    """Process the uploaded PDF to remove watermarks and extract its text, applying OCR where needed.
+
+    progress, if given, is called as progress(pages_done, page_count) during extraction.
+    """
     
     # Step 1: Create a temporary directory for cleaned PDFs
     with tempfile.TemporaryDirectory() as temp_dir:
@@ -91,22 +81,9 @@ def process_pdf(input_pdf, output_folder):
         # Step 2: Remove Watermarks
         remove_watermarks(input_pdf, cleaned_pdf)
 
-        # Step 3: Extract and Clean Text using PyMuPDF
-        final_text = extract_text_pymupdf(cleaned_pdf)
-        if len(final_text.strip()) < 1000:  # If extraction fails or has insufficient text
-            logger.info(f"Low content detected in {input_pdf}, applying OCR...")
-            ocr_output_pdf = os.path.join(temp_dir, f"ocr_{os.path.basename(input_pdf)}")
-            apply_ocr(cleaned_pdf, ocr_output_pdf)
-            final_text = extract_text_pymupdf(ocr_output_pdf)
-
-        # Step 4: Use pdfminer for additional extraction if needed
-        pdfminer_text = extract_text_pdfminer(cleaned_pdf)
-        final_text += "\n" + pdfminer_text
-
-        # Save Cleaned Text
+        # Step 3: Extract each page once and stream the text to the output file
         cleaned_text_file = os.path.join(output_folder, f"{os.path.basename(input_pdf)}.txt")
-        with open(cleaned_text_file, "w", encoding="utf-8") as f:
-            f.write(final_text)
+        write_text(cleaned_pdf, cleaned_text_file, progress=progress)
         logger.info(f"Cleaned text saved to: {cleaned_text_file}")
 
     # Cleaned PDF is automatically discarded after processing due to the temporary directory
@@ -140,7 +117,9 @@ def upload_file():
             logger.info(f"File saved to {file_path}, now processing...")
             
             # Process the PDF
-            result_file = process_pdf(file_path, PROCESSED_FOLDER)
+            result_file = process_pdf(
+                file_path, PROCESSED_FOLDER,
+                progress=lambda done, total: logger.info(f"Extracted {done}/{total} pages of {filename}"))
             
             # Return success response
             return jsonify({
@@ -0,0 +1,464 @@
+"""Precomputed answers for past question papers.
+
+An offline job runs the full pipeline over a folder of past papers and keeps
+every question's answer and sources on disk with an index over the question
+embeddings. /query serves banked answers first and only generates the misses.
+When the textbook index changes the bank goes stale; refresh re-retrieves each
+stale question and regenerates only those whose context changed. Every upload
+changes the index, so run refresh --watch next to the server or banked
+answers stop being served after the first upload.
+
+    python answer_bank.py build PastPapers/
+    python answer_bank.py refresh [--watch]
+    python answer_bank.py status
+"""
+import argparse
+import glob
+import json
+import logging
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+import numpy as np
+from filelock import FileLock
+from answer_cache import context_fingerprint, normalize_question
+from get_embedding_function import cache_name, get_backend
+from pdf_cache import file_sha256
+from query import (MAX_QUESTIONS, QUERY_WORKERS, QUESTION_TIMEOUT, answer_question,
+                   extract_questions_from_pdf, query_many, source_list)
+from rag_engine import TOP_K, get_engine
+from telemetry import count, span
+
+logger = logging.getLogger(__name__)
+
+# Configuration
+ANSWER_BANK_DIR = os.getenv("ANSWER_BANK_DIR", "answer_bank")
+BANK_THRESHOLD = float(os.getenv("ANSWER_BANK_THRESHOLD", "0.95"))  # cosine similarity
+BANK_NAME = "bank.json"
+LOCK_NAME = "bank.lock"
+VECTORS_NAME = "questions.f32"
+WATCH_SECONDS = 60
+
+
+class AnswerBank:
+    """On-disk store of answers to past-paper questions.
+
+    bank.json holds the entries (question, answer, sources, the fingerprint of
+    the retrieved context and the index version they were generated against)
+    and the question keys of every paper by content hash. questions.f32 holds
+    one unit question embedding per entry, searched with a single matrix
+    product. Only entries generated against the index being served are
+    returned, so an index change marks them stale until they are refreshed.
+    The files are reloaded when another process rewrites them; writers hold
+    the bank's file lock from loading to saving (see updating()).
+    """
+
+    def __init__(self, bank_dir=ANSWER_BANK_DIR, threshold=BANK_THRESHOLD):
+        self.bank_dir = bank_dir
+        self.threshold = threshold
+        self.model = None
+        self.entries = []
+        self.rows = {}  # question key -> row
+        self.papers = {}  # PDF sha256 -> {"name", "keys"}
+        self.vectors = None
+        self.hits = 0
+        self.misses = 0
+        self._fresh = (None, None)  # (index version, mask of rows generated against it)
+        self._mtime = None
+        self._dirty = False  # changed since the last save
+        self._lock = threading.Lock()
+        self._bank_path = os.path.join(bank_dir, BANK_NAME)
+        self._vectors_path = os.path.join(bank_dir, VECTORS_NAME)
+        os.makedirs(bank_dir, exist_ok=True)
+        self._file_lock = FileLock(os.path.join(bank_dir, LOCK_NAME))
+        with self._lock:
+            self._load()
+
+    @contextmanager
+    def updating(self):
+        """Hold the file lock with the latest files loaded, and save any changes on success.
+
+        build and refresh in other processes wait for the lock, so none of them
+        saves over entries another one added.
+        """
+        with self._file_lock:
+            with self._lock:
+                self._load()
+            yield self
+            if self._dirty:
+                self.save()
+
+    def _load(self):
+        try:
+            mtime = os.stat(self._bank_path).st_mtime
+        except OSError:
+            return
+        if mtime == self._mtime:
+            return
+        with open(self._bank_path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        dim = data["dim"]
+        vectors = np.fromfile(self._vectors_path, dtype=np.float32) if dim else np.zeros(0, np.float32)
+        # Vectors are written before the entries, so rows only ever run ahead of them
+        rows = min(len(data["entries"]), len(vectors) // dim) if dim else 0
+        self.model = data["model"]
+        self.entries = data["entries"][:rows]
+        self.rows = {entry["key"]: row for row, entry in enumerate(self.entries)}
+        self.papers = data["papers"]
+        self.vectors = vectors[:rows * dim].reshape(rows, dim) if rows else None
+        self._fresh = (None, None)
+        self._mtime = mtime
+
+    def save(self):
+        with self._file_lock, self._lock:
+            vectors = self.vectors if self.vectors is not None else np.zeros((0, 0), np.float32)
+            data = {"model": self.model, "dim": int(vectors.shape[1]), "entries": self.entries,
+                    "papers": self.papers}
+            tmp_path = f"{self._vectors_path}.tmp"
+            vectors.tofile(tmp_path)
+            os.replace(tmp_path, self._vectors_path)
+            tmp_path = f"{self._bank_path}.tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(data, f, ensure_ascii=False)
+            os.replace(tmp_path, self._bank_path)
+            self._mtime = os.stat(self._bank_path).st_mtime
+            self._dirty = False
+
+    def _is_fresh(self, entry, version):
+        return entry["index_version"] == version and self.model == cache_name(get_backend())
+
+    def _fresh_mask(self, version):
+        if self._fresh[0] != version:
+            self._fresh = (version, np.array([self._is_fresh(entry, version) for entry in self.entries], dtype=bool))
+        return self._fresh[1]
+
+    def has_fresh(self, version):
+        """True if any entry can be served for this index version."""
+        with self._lock:
+            self._load()
+            return bool(self.entries) and bool(self._fresh_mask(version).any())
+
+    def get_exact(self, question, version):
+        """Fresh entry for the normalized question text, else None."""
+        with self._lock:
+            self._load()
+            row = self.rows.get(normalize_question(question))
+            if row is not None and self._is_fresh(self.entries[row], version):
+                self.hits += 1
+                return self.entries[row]
+        return None
+
+    def get_semantic(self, embedding, version):
+        """Fresh entry whose question is within threshold cosine similarity, else None.
+
+        Counts a miss when nothing matches; call after get_exact.
+        """
+        query = _unit(embedding)
+        with self._lock:
+            self._load()
+            if self.vectors is None or self.vectors.shape[1] != len(query):
+                self.misses += 1
+                return None
+            scores = np.where(self._fresh_mask(version), self.vectors @ query, -1.0)
+            best = int(np.argmax(scores))
+            if scores[best] < self.threshold:
+                self.misses += 1
+                return None
+            self.hits += 1
+            return self.entries[best]
+
+    def get_paper(self, sha256, version):
+        """Fresh entries for every question of a banked paper, in order, else None."""
+        with self._lock:
+            self._load()
+            paper = self.papers.get(sha256)
+            if paper is None:
+                return None
+            entries = [self.entries[self.rows[key]] for key in paper["keys"] if key in self.rows]
+            if len(entries) < len(paper["keys"]) or not all(self._is_fresh(e, version) for e in entries):
+                return None
+            return entries
+
+    def is_fresh(self, question, version):
+        with self._lock:
+            self._load()
+            row = self.rows.get(normalize_question(question))
+            return row is not None and self._is_fresh(self.entries[row], version)
+
+    def entry(self, question):
+        with self._lock:
+            self._load()
+            row = self.rows.get(normalize_question(question))
+            return None if row is None else self.entries[row]
+
+    def stale_questions(self, version):
+        with self._lock:
+            self._load()
+            return [entry["question"] for entry in self.entries if not self._is_fresh(entry, version)]
+
+    def put(self, question, embedding, answer, sources, context_key, version):
+        key = normalize_question(question)
+        vector = _unit(embedding)
+        model = cache_name(get_backend())
+        with self._lock:
+            if model != self.model or self.vectors is not None and self.vectors.shape[1] != len(vector):
+                # New embedding model: old vectors are unusable, every entry is re-embedded on refresh
+                self.model = model
+                self.vectors = np.zeros((len(self.entries), len(vector)), np.float32) if self.entries else None
+            entry = {"key": key, "question": question, "answer": answer, "sources": sources,
+                     "context_key": context_key, "index_version": version, "updated": time.time()}
+            row = self.rows.get(key)
+            if row is None:
+                row = self.rows[key] = len(self.entries)
+                self.entries.append(entry)
+                self.vectors = (vector[None, :] if self.vectors is None
+                                else np.vstack([self.vectors, vector[None, :]]))
+            else:
+                self.entries[row] = entry
+                self.vectors[row] = vector
+            self._fresh = (None, None)
+            self._dirty = True
+
+    def add_paper(self, sha256, name, questions):
+        with self._lock:
+            self.papers[sha256] = {"name": name, "keys": [normalize_question(q) for q in questions]}
+            self._dirty = True
+
+    def stats(self, version=None):
+        with self._lock:
+            self._load()
+            fresh = sum(1 for entry in self.entries if self._is_fresh(entry, version)) if version else None
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self.entries),
+                "papers": len(self.papers),
+                "fresh": fresh,
+                "stale": len(self.entries) - fresh if version else None,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0,
+                "model": self.model,
+                "index_version": version,
+            }
+
+
+def _unit(vector):
+    vector = np.asarray(vector, dtype=np.float32)
+    norm = np.linalg.norm(vector)
+    return vector / norm if norm else vector
+
+
+_bank = None
+_bank_lock = threading.Lock()
+
+
+def get_answer_bank():
+    """Return the process-wide answer bank."""
+    global _bank
+    if _bank is None:
+        with _bank_lock:
+            if _bank is None:
+                _bank = AnswerBank()
+    return _bank
+
+
+def _banked(question, entry):
+    return {"question": question, "answer": entry["answer"], "error": None}
+
+
+def _count_bank(result, amount=1):
+    if amount:
+        count("eduquest_cache_requests_total", "Cache lookups by cache and result.", amount,
+              cache="answer_bank", result=result)
+
+
+_warned_stale = set()
+
+
+def _has_fresh(bank, version):
+    """bank.has_fresh, warning once per index version when every entry is stale."""
+    if bank.has_fresh(version):
+        return True
+    if bank.entries and version not in _warned_stale:
+        _warned_stale.add(version)
+        logger.warning(f"Answer bank is stale for index {version}; run 'python answer_bank.py refresh --watch'")
+    return False
+
+
+def lookup_answer(question):
+    """Look a question up in the bank; returns (entry or None, embedding or None).
+
+    The question is only embedded when the exact tier misses and the bank has
+    fresh entries; on a miss pass the embedding on to answer_question.
+    """
+    bank = get_answer_bank()
+    engine = get_engine()
+    version = engine.index_version()
+    embedding = None
+    with span("answer_bank", questions=1):
+        entry = bank.get_exact(question, version)
+        if entry is None and _has_fresh(bank, version):
+            embedding = engine.embed_query(question)
+            entry = bank.get_semantic(embedding, version)
+    _count_bank("miss" if entry is None else "hit")
+    return entry, embedding
+
+
+def answer_with_bank(question):
+    """answer_question with the bank in front; errors propagate."""
+    entry, embedding = lookup_answer(question)
+    return answer_question(question, embedding=embedding) if entry is None else entry["answer"]
+
+
+def answer_many(questions, max_workers=QUERY_WORKERS, timeout=QUESTION_TIMEOUT):
+    """query_many with the bank in front: only questions it cannot answer are generated."""
+    bank = get_answer_bank()
+    engine = get_engine()
+    version = engine.index_version()
+    results = [None] * len(questions)
+    embeddings = None  # of the misses, once computed for the semantic tier
+    with span("answer_bank", questions=len(questions)):
+        misses = []
+        for i, question in enumerate(questions):
+            entry = bank.get_exact(question, version)
+            if entry is None:
+                misses.append(i)
+            else:
+                results[i] = _banked(question, entry)
+        if misses and _has_fresh(bank, version):
+            remaining, embeddings = [], []
+            for i, embedding in zip(misses, engine.embed_queries([questions[i] for i in misses])):
+                entry = bank.get_semantic(embedding, version)
+                if entry is None:
+                    remaining.append(i)
+                    embeddings.append(embedding)
+                else:
+                    results[i] = _banked(questions[i], entry)
+            misses = remaining
+    _count_bank("hit", len(questions) - len(misses))
+    _count_bank("miss", len(misses))
+
+    if misses:
+        answers = query_many([questions[i] for i in misses], max_workers, timeout, embeddings=embeddings)
+        for i, result in zip(misses, answers):
+            results[i] = result
+    return results
+
+
+def answer_paper(pdf_path, max_questions=MAX_QUESTIONS):
+    """Answers for an uploaded paper, or None if it has no questions.
+
+    A paper the bank was built from is answered without extracting its text.
+    """
+    entries = get_answer_bank().get_paper(file_sha256(pdf_path), get_engine().index_version())
+    if entries is not None:
+        _count_bank("paper_hit")
+        return [_banked(entry["question"], entry) for entry in entries[:max_questions]]
+    questions = extract_questions_from_pdf(pdf_path)
+    if not questions:
+        return None
+    return answer_many(questions[:max_questions])
+
+
+def bank_questions(bank, questions, workers=QUERY_WORKERS):
+    """Add or refresh the bank's answers to questions.
+
+    Fresh entries are skipped. The rest are retrieved in one batch; a stale
+    entry whose retrieved context is unchanged keeps its answer, everything
+    else is generated. Returns (generated, reused) counts.
+    """
+    engine = get_engine().warm_up()
+    version = engine.index_version()
+    todo = list(dict.fromkeys(q for q in questions if not bank.is_fresh(q, version)))
+    if not todo:
+        return 0, 0
+    embeddings = engine.embed_queries(todo)
+    retrieved = engine.retrieve_batch(todo, k=TOP_K, embeddings=embeddings)
+
+    generate, reused = [], 0
+    for question, embedding, results in zip(todo, embeddings, retrieved):
+        context_key = context_fingerprint(results) if results else None
+        entry = bank.entry(question)
+        if entry is not None and context_key is not None and entry["context_key"] == context_key:
+            bank.put(question, embedding, entry["answer"], source_list(results), context_key, version)
+            reused += 1
+        else:
+            generate.append((question, embedding, results, context_key))
+
+    def answer(item):
+        question, embedding, results, _context_key = item
+        try:
+            return answer_question(question, results, embedding)
+        except Exception as e:
+            logger.error(f"Could not answer {question[:60]!r}: {e}")
+            return None
+
+    generated = 0
+    with ThreadPoolExecutor(max_workers=max(1, workers), thread_name_prefix="bank") as executor:
+        for (question, embedding, results, context_key), text in zip(generate, executor.map(answer, generate)):
+            if text is not None:
+                bank.put(question, embedding, text, source_list(results), context_key, version)
+                generated += 1
+    return generated, reused
+
+
+def build(bank, paper_dir, workers=QUERY_WORKERS):
+    """Bank every question of the PDFs in paper_dir."""
+    for pdf_path in sorted(glob.glob(os.path.join(paper_dir, "*.pdf"))):
+        name = os.path.basename(pdf_path)
+        questions = extract_questions_from_pdf(pdf_path)
+        if not questions:
+            print(f"⚠️ No questions found in {name}")
+            continue
+        start = time.perf_counter()
+        with bank.updating():
+            generated, reused = bank_questions(bank, questions, workers)
+            bank.add_paper(file_sha256(pdf_path), name, questions)
+        print(f"✅ {name}: {len(questions)} questions, {generated} generated, {reused} unchanged "
+              f"in {time.perf_counter() - start:.1f}s")
+
+
+def refresh(bank, workers=QUERY_WORKERS):
+    """Catch stale entries up with the served index; returns the number of questions checked."""
+    version = get_engine().warm_up().index_version()
+    with bank.updating():
+        stale = bank.stale_questions(version)
+        if not stale:
+            return 0
+        generated, reused = bank_questions(bank, stale, workers)
+    print(f"🔄 {len(stale)} stale answers for index {version}: {generated} regenerated, {reused} unchanged")
+    return len(stale)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build and refresh the past-paper answer bank.")
+    parser.add_argument("--workers", type=int, default=QUERY_WORKERS, help="Questions generated in parallel.")
+    commands = parser.add_subparsers(dest="command", required=True)
+    build_parser = commands.add_parser("build", help="Answer every question of the PDFs in a folder.")
+    build_parser.add_argument("paper_dir")
+    refresh_parser = commands.add_parser("refresh", help="Update answers made stale by an index change.")
+    refresh_parser.add_argument("--watch", action="store_true",
+                                help=f"Keep running and refresh every {WATCH_SECONDS}s when the index changes.")
+    commands.add_parser("status", help="Show bank size and freshness.")
+    args = parser.parse_args()
+
+    bank = get_answer_bank()
+    if args.command == "build":
+        build(bank, args.paper_dir, args.workers)
+    elif args.command == "refresh":
+        while True:
+            if not refresh(bank, args.workers) and not args.watch:
+                print("✅ Answer bank is up to date")
+            if not args.watch:
+                break
+            time.sleep(WATCH_SECONDS)
+    else:
+        stats = bank.stats(get_engine().index_version())
+        print(f"{stats['entries']} answers from {stats['papers']} papers, {stats['fresh']} fresh, "
+              f"{stats['stale']} stale (index {stats['index_version']}, embeddings {stats['model']})")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,199 @@
+import hashlib
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+import numpy as np
+
+# Configuration
+ANSWER_CACHE_SIZE = int(os.getenv("ANSWER_CACHE_SIZE", "2000"))
+ANSWER_CACHE_TTL = float(os.getenv("ANSWER_CACHE_TTL", str(7 * 24 * 3600)))  # seconds
+SEMANTIC_THRESHOLD = float(os.getenv("ANSWER_CACHE_THRESHOLD", "0.95"))  # cosine similarity
+
+
+def normalize_question(text):
+    """Lower-case, drop question numbering and punctuation, collapse whitespace."""
+    text = text.lower()
+    text = re.sub(r"^\s*(q\.?\s*)?\d+\s*[.)]\s*", "", text)
+    text = re.sub(r"[^\w\s]", " ", text)
+    return " ".join(text.split())
+
+
+def context_fingerprint(results):
+    """Identify the retrieved context by its chunk IDs (or text when IDs are missing)."""
+    digest = hashlib.sha256()
+    for doc, _score in results:
+        digest.update((doc.metadata.get("id") or doc.page_content).encode("utf-8"))
+        digest.update(b"\0")
+    return digest.hexdigest()
+
+
+class AnswerCache:
+    """Two-tier answer cache in front of generation.
+
+    The exact tier is keyed on the normalized question text. The semantic tier
+    returns an answer whose question embedding is within `threshold` cosine
+    similarity of the new question, provided both retrieved the same context.
+    Entries expire after `ttl` seconds, the least recently used ones are dropped
+    beyond `max_entries`, and everything is cleared when the index version changes.
+    Question embeddings are rows of one unit-vector matrix, so the semantic tier
+    is a single matrix product over the entries that share the context.
+    """
+
+    def __init__(self, max_entries=ANSWER_CACHE_SIZE, ttl=ANSWER_CACHE_TTL, threshold=SEMANTIC_THRESHOLD):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.threshold = threshold
+        self.index_version = None
+        self.exact_hits = 0
+        self.semantic_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries = OrderedDict()  # key -> entry, least recently used first
+        self._lock = threading.Lock()
+        self._reset_rows()
+
+    def _reset_rows(self):
+        self._vectors = None  # row -> unit question embedding
+        self._row_keys = []  # row -> entry key, None for a free row
+        self._row_contexts = np.empty(0, dtype=object)  # row -> context fingerprint
+        self._row_created = np.empty(0, dtype=np.float64)  # row -> creation time, -inf for a free row
+        self._free_rows = []
+
+    def sync_index_version(self, version):
+        """Drop every entry if the index changed since the answers were cached."""
+        with self._lock:
+            if version != self.index_version:
+                self._entries.clear()
+                self._reset_rows()
+                self.index_version = version
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._reset_rows()
+
+    def _drop(self, key):
+        row = self._entries.pop(key)["row"]
+        self._row_keys[row] = None
+        self._row_contexts[row] = None
+        self._row_created[row] = -np.inf
+        self._free_rows.append(row)
+
+    def _alive(self, key, entry, now):
+        if now - entry["created"] <= self.ttl:
+            return True
+        self._drop(key)
+        self.evictions += 1
+        return False
+
+    def _allocate_row(self, dim):
+        if self._vectors is None or self._vectors.shape[1] != dim:
+            # First entry, or a different embedding model: old vectors can't be compared
+            self._entries.clear()
+            self._reset_rows()
+            self._vectors = np.zeros((0, dim), np.float32)
+        if self._free_rows:
+            return self._free_rows.pop()
+        row = len(self._row_keys)
+        if row == len(self._vectors):
+            capacity = min(max(2 * row, 64), max(self.max_entries, row + 1))
+            extra = capacity - row
+            self._vectors = np.vstack([self._vectors, np.zeros((extra, dim), np.float32)])
+            self._row_contexts = np.concatenate([self._row_contexts, np.full(extra, None, dtype=object)])
+            self._row_created = np.concatenate([self._row_created, np.full(extra, -np.inf)])
+        self._row_keys.append(None)
+        return row
+
+    def get_exact(self, question):
+        key = normalize_question(question)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and self._alive(key, entry, time.time()):
+                self._entries.move_to_end(key)
+                self.exact_hits += 1
+                return entry
+        return None
+
+    def get_semantic(self, embedding, context_key):
+        """Best cached entry with the same context and cosine >= threshold, else None.
+
+        Counts a miss when nothing matches; call after get_exact.
+        """
+        query = _unit(embedding)
+        now = time.time()
+        with self._lock:
+            rows = len(self._row_keys)
+            if not rows or self._vectors.shape[1] != len(query):
+                self.misses += 1
+                return None
+            candidates = (self._row_contexts[:rows] == context_key) & (self._row_created[:rows] >= now - self.ttl)
+            scores = np.where(candidates, self._vectors[:rows] @ query, -np.inf)
+            best = int(np.argmax(scores))
+            if scores[best] < self.threshold:
+                self.misses += 1
+                return None
+            key = self._row_keys[best]
+            self._entries.move_to_end(key)
+            self.semantic_hits += 1
+            return self._entries[key]
+
+    def put(self, question, embedding, context_key, answer, sources=None):
+        if self.max_entries <= 0:
+            return
+        key = normalize_question(question)
+        vector = _unit(embedding)
+        now = time.time()
+        with self._lock:
+            if key in self._entries:
+                self._drop(key)
+            row = self._allocate_row(len(vector))
+            self._vectors[row] = vector
+            self._row_keys[row] = key
+            self._row_contexts[row] = context_key
+            self._row_created[row] = now
+            self._entries[key] = {
+                "answer": answer,
+                "sources": sources or [],
+                "context_key": context_key,
+                "created": now,
+                "row": row,
+            }
+            while len(self._entries) > self.max_entries:
+                self._drop(next(iter(self._entries)))
+                self.evictions += 1
+
+    def stats(self):
+        with self._lock:
+            hits = self.exact_hits + self.semantic_hits
+            lookups = hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "exact_hits": self.exact_hits,
+                "semantic_hits": self.semantic_hits,
+                "misses": self.misses,
+                "hit_rate": round(hits / lookups, 3) if lookups else 0.0,
+                "evictions": self.evictions,
+                "index_version": self.index_version,
+            }
+
+
+def _unit(vector):
+    vector = np.asarray(vector, dtype=np.float32)
+    norm = np.linalg.norm(vector)
+    return vector / norm if norm else vector
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_answer_cache():
+    """Return the process-wide answer cache."""
+    global _cache
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                _cache = AnswerCache()
+    return _cache
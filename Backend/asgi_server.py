@@ -0,0 +1,298 @@
+"""Production serving mode: FastAPI under uvicorn.
+
+Interactive question traffic and heavy PDF work run in separate bounded
+worker pools, so a long OCR job can't hold up text questions. When a pool
+and its queue are full, requests are rejected with 429 and a Retry-After
+header instead of piling up. Concurrent question embeddings are
+micro-batched into one encoder call.
+
+    python asgi_server.py            # or: uvicorn asgi_server:app --port 5000
+"""
+import asyncio
+import logging
+import os
+import shutil
+import tempfile
+import threading
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager, contextmanager
+import uvicorn
+from fastapi import FastAPI, File, Form, Request, UploadFile
+from fastapi.concurrency import run_in_threadpool
+from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
+from starlette.background import BackgroundTask
+from werkzeug.utils import secure_filename
+from answer_bank import answer_paper, answer_with_bank
+from embedding_batcher import EmbeddingBatcher
+from ingest import get_ingestion_worker
+from get_embedding_function import get_embedding_function
+from query import query_rag_sse
+from rag_engine import get_engine
+from telemetry import get_profiler, register_gauge, render_metrics
+
+logging.basicConfig(level=logging.INFO,
+                    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+# Configuration: worker threads and extra queued requests per pool
+INTERACTIVE_WORKERS = int(os.getenv("INTERACTIVE_WORKERS", "8"))
+INTERACTIVE_QUEUE = int(os.getenv("INTERACTIVE_QUEUE", "32"))
+HEAVY_WORKERS = int(os.getenv("HEAVY_WORKERS", "2"))
+HEAVY_QUEUE = int(os.getenv("HEAVY_QUEUE", "4"))
+INGEST_QUEUE = int(os.getenv("INGEST_QUEUE", "8"))
+UPLOAD_FOLDER = os.path.join(os.getcwd(), "upload")
+os.makedirs(UPLOAD_FOLDER, exist_ok=True)
+
+
+_DONE = object()
+
+
+class PoolFull(Exception):
+    def __init__(self, retry_after):
+        super().__init__("Server busy")
+        self.retry_after = retry_after
+
+
+class BoundedPool:
+    """Thread pool that admits at most workers + queue_size requests at once."""
+
+    def __init__(self, name, workers, queue_size, retry_after):
+        self.name = name
+        self.capacity = workers + queue_size
+        self.retry_after = retry_after
+        self.in_flight = 0
+        self.rejected = 0
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix=name)
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        """Take one admission slot, or raise PoolFull."""
+        with self._lock:
+            if self.in_flight >= self.capacity:
+                self.rejected += 1
+                raise PoolFull(self.retry_after)
+            self.in_flight += 1
+
+    def release(self):
+        with self._lock:
+            self.in_flight -= 1
+
+    @contextmanager
+    def slot(self):
+        self.acquire()
+        try:
+            yield
+        finally:
+            self.release()
+
+    async def run(self, fn, *args):
+        with self.slot():
+            return await asyncio.get_running_loop().run_in_executor(self._executor, fn, *args)
+
+    def stream(self, generator):
+        """Admit a streamed response; return (async body, release), or raise PoolFull.
+
+        Each step of the blocking generator runs on this pool's workers. The
+        slot is given back once, when the body ends or is closed, or when
+        release() is called; pass release as the response's background task so
+        a body that never starts (client gone before the first byte) does not
+        keep the slot.
+        """
+        self.acquire()
+        once = threading.Lock()
+        step_lock = threading.Lock()  # a cancelled step may still be running when the body is closed
+
+        def release():
+            if once.acquire(blocking=False):
+                self.release()
+
+        def step():
+            with step_lock:
+                return next(generator, _DONE)
+
+        def close():
+            try:
+                with step_lock:
+                    generator.close()
+            finally:
+                release()
+
+        async def body():
+            loop = asyncio.get_running_loop()
+            try:
+                while True:
+                    item = await loop.run_in_executor(self._executor, step)
+                    if item is _DONE:
+                        return
+                    yield item
+            finally:
+                self._executor.submit(close)
+
+        return body(), release
+
+    def stats(self):
+        return {"in_flight": self.in_flight, "capacity": self.capacity, "rejected": self.rejected}
+
+
+interactive_pool = BoundedPool("interactive", INTERACTIVE_WORKERS, INTERACTIVE_QUEUE, retry_after=1)
+heavy_pool = BoundedPool("heavy", HEAVY_WORKERS, HEAVY_QUEUE, retry_after=30)
+
+register_gauge("eduquest_pool_in_flight", "Requests admitted to each worker pool.",
+               lambda: {pool.name: pool.in_flight for pool in (interactive_pool, heavy_pool)}, label="pool")
+register_gauge("eduquest_pool_rejected", "Requests turned away with 429 per pool since startup.",
+               lambda: {pool.name: pool.rejected for pool in (interactive_pool, heavy_pool)}, label="pool")
+register_gauge("eduquest_ingest_queue_depth", "PDF ingestion jobs queued or running.",
+               lambda: get_ingestion_worker().queue_depth())
+
+def warm_up():
+    # Wrap the encoder so concurrent questions share one forward pass, then load everything
+    get_profiler()
+    engine = get_engine()
+    if engine.embedding_function is None:
+        engine.embedding_function = EmbeddingBatcher(get_embedding_function())
+    try:
+        engine.warm_up()
+    except Exception:
+        pass  # recorded in engine.error and reported by /health
+
+
+@asynccontextmanager
+async def lifespan(app):
+    await run_in_threadpool(warm_up)
+    yield
+
+
+app = FastAPI(title="EduQuest", lifespan=lifespan)
+app.add_middleware(CORSMiddleware, allow_origins=["*"], allow_methods=["*"], allow_headers=["*"])
+
+
+@app.exception_handler(PoolFull)
+def pool_full(request: Request, exc: PoolFull):
+    return JSONResponse({"error": "Server busy, retry later"}, status_code=429,
+                        headers={"Retry-After": str(exc.retry_after)})
+
+
+def save_upload(file, path):
+    with open(path, "wb") as f:
+        shutil.copyfileobj(file.file, f)
+
+
+def answer_uploaded_paper(pdf_path):
+    try:
+        return answer_paper(pdf_path)
+    finally:
+        os.remove(pdf_path)
+
+
+@app.post("/query")
+async def handle_query(question: str = Form(None), file: UploadFile = File(None)):
+    if file is not None:
+        if not file.filename:
+            return JSONResponse({"error": "Empty file uploaded"}, status_code=400)
+        if not file.filename.lower().endswith('.pdf'):
+            return JSONResponse({"error": "Only PDF files are allowed"}, status_code=400)
+        pdf_path = os.path.join(UPLOAD_FOLDER, f"{uuid.uuid4().hex}.pdf")
+        await run_in_threadpool(save_upload, file, pdf_path)
+        try:
+            results = await heavy_pool.run(answer_uploaded_paper, pdf_path)
+        except PoolFull:
+            os.remove(pdf_path)
+            raise
+        except Exception as e:
+            logger.error(f"Error answering paper: {e}")
+            return JSONResponse({"error": str(e)}, status_code=500)
+        if results is None:
+            return JSONResponse({"error": "No questions found in the PDF"}, status_code=400)
+        failed = sum(1 for r in results if r["error"] is not None)
+        return {"status": "partial" if failed else "success", "responses": results}
+
+    if question is not None:
+        query_text = question.strip()
+        if not query_text:
+            return JSONResponse({"error": "Invalid or missing 'question' in request body"}, status_code=400)
+        try:
+            answer = await interactive_pool.run(answer_with_bank, query_text)
+        except PoolFull:
+            raise
+        except Exception as e:
+            logger.error(f"Error answering question: {e}")
+            return JSONResponse({"error": "Error processing question."}, status_code=500)
+        return {"status": "success", "responses": [{"question": query_text, "answer": answer}]}
+
+    return JSONResponse({"error": "No file or question provided"}, status_code=400)
+
+
+@app.api_route("/query_stream", methods=["GET", "POST"])
+async def handle_query_stream(request: Request):
+    if request.method == "GET":
+        query_text = request.query_params.get("question", "").strip()
+    else:
+        query_text = ((await request.form()).get("question") or "").strip()
+    if not query_text:
+        return JSONResponse({"error": "Invalid or missing 'question' in request"}, status_code=400)
+
+    # Raises PoolFull -> 429 before the stream starts; generation runs on the interactive workers
+    body, release = interactive_pool.stream(query_rag_sse(query_text))
+    return StreamingResponse(body, media_type="text/event-stream", background=BackgroundTask(release),
+                             headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+
+@app.post("/upload")
+async def upload_pdf(file: UploadFile = File(None)):
+    if file is None or not file.filename:
+        return JSONResponse({"error": "No selected file"}, status_code=400)
+    if not file.filename.lower().endswith('.pdf'):
+        return JSONResponse({"error": "Invalid file format. Only PDFs are allowed."}, status_code=400)
+    worker = get_ingestion_worker()
+    if worker.queue_depth() >= INGEST_QUEUE:
+        raise PoolFull(retry_after=60)
+
+    filename = secure_filename(file.filename)
+    tempdir = tempfile.mkdtemp()
+    file_path = os.path.join(tempdir, filename)
+    await run_in_threadpool(save_upload, file, file_path)
+    job = worker.submit(file_path, filename, cleanup_dir=tempdir)
+    return JSONResponse({"message": "File queued for indexing", "job_id": job.id,
+                         "status_url": f"/jobs/{job.id}"}, status_code=202)
+
+
+@app.get("/jobs/{job_id}")
+def job_status(job_id: str):
+    job = get_ingestion_worker().get(job_id)
+    if job is None:
+        return JSONResponse({"error": "Unknown job"}, status_code=404)
+    return job.to_dict()
+
+
+@app.get("/health")
+def health():
+    engine = get_engine()
+    status = engine.status()
+    status["pools"] = {
+        "interactive": interactive_pool.stats(),
+        "heavy": heavy_pool.stats(),
+        "ingest_queue": get_ingestion_worker().queue_depth(),
+    }
+    if isinstance(engine.embedding_function, EmbeddingBatcher):
+        status["embedding_batches"] = engine.embedding_function.stats()
+    return JSONResponse(status, status_code=200 if status["ready"] else 503)
+
+
+@app.get("/metrics")
+def metrics():
+    return PlainTextResponse(render_metrics(), media_type="text/plain; version=0.0.4")
+
+
+@app.get("/debug/profile")
+def profile(reset: bool = False):
+    # Folded stacks for flamegraph.pl / speedscope; ?reset=true starts a new window
+    profiler = get_profiler()
+    if profiler is None:
+        return JSONResponse({"error": "Profiler disabled, start the server with PROFILER=1"}, status_code=404)
+    return PlainTextResponse(profiler.folded(reset=reset))
+
+
+if __name__ == '__main__':
+    uvicorn.run(app, host="0.0.0.0", port=5000)
@@ -0,0 +1,59 @@
+"""Compare per-question retrieval with RAGEngine.retrieve_batch.
+
+Run from the Backend directory against an existing index:
+
+    python benchmarks/bench_batch_retrieval.py --sizes 5 20 100
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from rag_engine import get_engine, TOP_K
+
+
+def sample_questions(engine, n):
+    """Build n questions from the opening words of indexed chunks."""
+    stored = engine.db._collection.get(limit=max(n, 1), include=["documents"])
+    texts = [t for t in stored["documents"] if t and t.strip()] or ["What is an operating system?"]
+    questions = []
+    while len(questions) < n:
+        text = texts[len(questions) % len(texts)]
+        words = text.split()[:12]
+        questions.append(f"Explain {' '.join(words)}? ({len(questions)})")
+    return questions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[5, 20, 100])
+    parser.add_argument("--k", type=int, default=TOP_K)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    engine = get_engine().warm_up()
+    print(f"{'questions':>10} {'loop (s)':>10} {'batch (s)':>10} {'speedup':>8} {'same top-k':>10}")
+    for size in args.sizes:
+        questions = sample_questions(engine, size)
+        loop_times, batch_times = [], []
+        for _ in range(args.repeat):
+            start = time.perf_counter()
+            looped = [engine.retrieve(q, k=args.k) for q in questions]
+            loop_times.append(time.perf_counter() - start)
+
+            start = time.perf_counter()
+            batched = engine.retrieve_batch(questions, k=args.k)
+            batch_times.append(time.perf_counter() - start)
+
+        same = all(
+            [doc.id for doc, _ in a] == [doc.id for doc, _ in b]
+            for a, b in zip(looped, batched)
+        )
+        loop_t, batch_t = min(loop_times), min(batch_times)
+        print(f"{size:>10} {loop_t:>10.3f} {batch_t:>10.3f} {loop_t / batch_t:>7.1f}x {str(same):>10}")
+
+
+if __name__ == "__main__":
+    main()
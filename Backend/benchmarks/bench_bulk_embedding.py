@@ -0,0 +1,66 @@
+"""Measure bulk chunk embedding throughput against the number of worker processes.
+
+Chunks come from the text files in data/ (or the given files), split the same
+way as data_process.py. Nothing is written to Chroma or the embedding cache.
+Run from the Backend directory:
+
+    python benchmarks/bench_bulk_embedding.py --workers 1 2 4 --batch-size 64 --limit 2000
+"""
+import argparse
+import glob
+import itertools
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bulk_embed import ParallelEmbeddings, BULK_BATCH_SIZE
+from data_process import iter_chunks, DATA_PATH
+from get_embedding_function import load_encoder
+
+
+def load_texts(paths, limit):
+    chunks = itertools.chain.from_iterable(iter_chunks(path) for path in paths)
+    return [chunk.page_content for chunk in itertools.islice(chunks, limit)]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("files", nargs="*", help="Text files to chunk (default: data/*.txt)")
+    parser.add_argument("--workers", type=int, nargs="+",
+                        default=sorted({1, 2, 4, os.cpu_count() or 1}))
+    parser.add_argument("--batch-size", type=int, default=BULK_BATCH_SIZE)
+    parser.add_argument("--limit", type=int, default=2000, help="Maximum chunks to embed")
+    args = parser.parse_args()
+
+    texts = load_texts(args.files or sorted(glob.glob(os.path.join(DATA_PATH, "*.txt"))), args.limit)
+    if not texts:
+        print("No chunks to benchmark.")
+        return
+
+    print(f"{len(texts)} chunks, batch size {args.batch_size}, cores available: {os.cpu_count()}")
+    print(f"{'workers':>8} {'bucketed':>9} {'seconds':>9} {'chunks/s':>9}")
+
+    model = load_encoder()
+    start = time.perf_counter()
+    for i in range(0, len(texts), args.batch_size):
+        model.embed_documents(texts[i:i + args.batch_size])
+    elapsed = time.perf_counter() - start
+    print(f"{'inline':>8} {'no':>9} {elapsed:>9.2f} {len(texts) / elapsed:>9.1f}")
+
+    for workers in args.workers:
+        for bucket in (False, True):
+            embedder = ParallelEmbeddings(workers, args.batch_size, bucket)
+            step = args.batch_size * workers
+            embedder.embed_documents(texts[:step])  # load the model in every worker first
+            start = time.perf_counter()
+            for i in range(0, len(texts), step):
+                embedder.embed_documents(texts[i:i + step])
+            elapsed = time.perf_counter() - start
+            embedder.close()
+            print(f"{workers:>8} {'yes' if bucket else 'no':>9} {elapsed:>9.2f} {len(texts) / elapsed:>9.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,82 @@
+"""Compare embedding backends on load time, encode latency and memory.
+
+Each backend is measured in a fresh process so load time and peak RSS are
+not skewed by models loaded earlier. Run from the Backend directory:
+
+    python benchmarks/bench_embedding_backends.py --backends torch onnx int8 --queries 200
+"""
+import argparse
+import multiprocessing
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from get_embedding_function import ALLOW_FAKE_EMBEDDINGS, BACKENDS, MODEL_BACKENDS, get_embedding_function
+
+QUESTION = "Explain the difference between TCP and UDP with an example."
+PASSAGE = ("The transport layer provides end-to-end communication services for applications. "
+           "TCP is connection-oriented and guarantees delivery, while UDP sends datagrams "
+           "without establishing a connection. ") * 4
+
+
+def peak_rss_mb():
+    try:
+        import resource
+    except ImportError:  # Windows
+        return float("nan")
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+def measure(backend, queries, batch_size):
+    start = time.perf_counter()
+    embedder = get_embedding_function(backend=backend)
+    embedder.embed_query("warm up")
+    load_seconds = time.perf_counter() - start
+
+    latencies = []
+    for i in range(queries):
+        start = time.perf_counter()
+        embedder.embed_query(f"{QUESTION} {i}")
+        latencies.append((time.perf_counter() - start) * 1000)
+    latencies.sort()
+
+    start = time.perf_counter()
+    embedder.embed_documents([PASSAGE] * batch_size)
+    batch_seconds = time.perf_counter() - start
+    return {
+        "load_s": load_seconds,
+        "p50_ms": statistics.median(latencies),
+        "p95_ms": latencies[int(0.95 * (len(latencies) - 1))],
+        "passages_per_s": batch_size / batch_seconds,
+        "peak_rss_mb": peak_rss_mb(),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--backends", nargs="+", default=list(MODEL_BACKENDS), choices=BACKENDS)
+    parser.add_argument("--queries", type=int, default=200, help="Single-question encodes to time")
+    parser.add_argument("--batch-size", type=int, default=64, help="Passages in the batch encode")
+    args = parser.parse_args()
+    if "hash" in args.backends:
+        os.environ[ALLOW_FAKE_EMBEDDINGS] = "1"
+
+    context = multiprocessing.get_context("spawn")
+    print(f"{'backend':>8} {'load s':>8} {'p50 ms':>8} {'p95 ms':>8} {'passages/s':>11} {'peak MB':>8}")
+    for backend in args.backends:
+        with context.Pool(1) as pool:
+            try:
+                r = pool.apply(measure, (backend, args.queries, args.batch_size))
+            except Exception as e:
+                print(f"{backend:>8} failed: {e}")
+                continue
+        print(f"{backend:>8} {r['load_s']:>8.2f} {r['p50_ms']:>8.1f} {r['p95_ms']:>8.1f} "
+              f"{r['passages_per_s']:>11.1f} {r['peak_rss_mb']:>8.0f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,43 @@
+"""Measure page-sharded PDF extraction throughput against the worker count.
+
+Run from the Backend directory:
+
+    python benchmarks/bench_extraction.py Upload/*.pdf --workers 1 2 4 8
+"""
+import argparse
+import glob
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from pdf_extract import extract_pages_parallel, SHARD_PAGES
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("pdfs", nargs="*", help="PDFs to extract (default: Upload/*.pdf)")
+    parser.add_argument("--workers", type=int, nargs="+",
+                        default=sorted({1, 2, 4, os.cpu_count() or 1}))
+    parser.add_argument("--shard-pages", type=int, default=SHARD_PAGES)
+    args = parser.parse_args()
+
+    pdfs = args.pdfs or sorted(glob.glob(os.path.join("Upload", "*.pdf")))
+    if not pdfs:
+        print("No PDFs to benchmark.")
+        return
+
+    print(f"cores available: {os.cpu_count()}")
+    print(f"{'workers':>8} {'pages':>8} {'seconds':>9} {'pages/s':>9}")
+    for workers in args.workers:
+        pages = 0
+        start = time.perf_counter()
+        for pdf in pdfs:
+            pages += len(extract_pages_parallel(pdf, workers=workers, shard_pages=args.shard_pages))
+        elapsed = time.perf_counter() - start
+        print(f"{workers:>8} {pages:>8} {elapsed:>9.2f} {pages / elapsed:>9.1f}")
+
+
+if __name__ == "__main__":
+    main()
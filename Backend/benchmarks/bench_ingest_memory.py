@@ -0,0 +1,74 @@
+"""Measure peak memory of an index build against corpus size.
+
+Each corpus size is indexed by data_process.sync_directory in a fresh process,
+so its peak RSS is not carried over from a smaller run. Ingestion streams
+chunks in batches, so peak RSS should stay roughly flat as the corpus grows.
+--fake-embeddings uses HashEmbeddings so nothing is downloaded. Run from the
+Backend directory:
+
+    python benchmarks/bench_ingest_memory.py --fake-embeddings --documents 10 50 200
+"""
+import argparse
+import multiprocessing
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from run_benchmarks import directory_size, make_corpus, peak_rss_mb
+
+
+def measure(documents, paragraphs, workers, fake_embeddings):
+    workdir = tempfile.mkdtemp(prefix="eduquest-ingest-")
+    # Set before data_process is imported so nothing touches the real index
+    os.environ.update({
+        "INDEX_ROOT": os.path.join(workdir, "index"),
+        "EMBEDDING_CACHE_DIR": os.path.join(workdir, "embedding_cache"),
+    })
+    if fake_embeddings:
+        os.environ["EMBEDDING_BACKEND"] = "hash"
+        os.environ["ALLOW_FAKE_EMBEDDINGS"] = "1"
+    try:
+        from data_process import sync_directory
+        from index_store import INDEX_ROOT, current_path, read_index_manifest
+
+        data_dir = os.path.join(workdir, "data")
+        os.makedirs(data_dir)
+        make_corpus(data_dir, documents, paragraphs)
+        start = time.perf_counter()
+        sync_directory(data_dir, INDEX_ROOT, workers=workers)
+        seconds = time.perf_counter() - start
+        manifest = read_index_manifest(current_path(INDEX_ROOT)) or {}
+        return {
+            "corpus_mb": directory_size(data_dir) / (1024 * 1024),
+            "chunks": manifest.get("chunks", 0),
+            "seconds": seconds,
+            "peak_rss_mb": peak_rss_mb()["self"],
+        }
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--documents", type=int, nargs="+", default=[10, 50, 200],
+                        help="Corpus sizes to index, in synthetic documents")
+    parser.add_argument("--paragraphs", type=int, default=40, help="Paragraphs per document")
+    parser.add_argument("--workers", type=int, default=1, help="Embedding worker processes")
+    parser.add_argument("--fake-embeddings", action="store_true", help="Use HashEmbeddings")
+    args = parser.parse_args()
+
+    context = multiprocessing.get_context("spawn")
+    print(f"{'documents':>9} {'corpus MB':>10} {'chunks':>8} {'seconds':>8} {'peak MB':>8}")
+    for documents in args.documents:
+        with context.Pool(1) as pool:
+            r = pool.apply(measure, (documents, args.paragraphs, args.workers, args.fake_embeddings))
+        print(f"{documents:>9} {r['corpus_mb']:>10.2f} {r['chunks']:>8} "
+              f"{r['seconds']:>8.2f} {r['peak_rss_mb']:>8.0f}")
+
+
+if __name__ == "__main__":
+    main()
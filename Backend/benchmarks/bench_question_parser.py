@@ -0,0 +1,265 @@
+"""Precision/recall of question extraction: the old DOTALL regex against question_parser.
+
+Scores both parsers on bundled KTU-style sample papers (inline marks, table
+layouts with numbers and marks on their own lines, modules with a)/b) parts,
+running headers, unnumbered questions), then times them on a long paper to
+show how each scales.
+Real papers can be added with a gold file mapping PDF names to their
+questions; their pages are extracted with pdf_extract. Run from the Backend
+directory:
+
+    python benchmarks/bench_question_parser.py
+    python benchmarks/bench_question_parser.py --gold papers.json --pdf-dir Upload
+"""
+import argparse
+import json
+import os
+import re
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from question_parser import normalize, parse_questions
+
+# A predicted question matches a gold one when their word sets overlap this much
+MATCH_JACCARD = 0.8
+
+HEADER = """A 1000CST206052201 Pages: 2
+Reg No.:_______________ Name:__________________________
+APJ ABDUL KALAM TECHNOLOGICAL UNIVERSITY
+Fourth Semester B.Tech Degree Examination June 2022 (2019 scheme)
+Course Code: CST206
+Course Name: OPERATING SYSTEMS
+Max. Marks: 100 Duration: 3 Hours
+"""
+
+SAMPLE_PAPERS = [
+    (
+        "inline_marks",
+        [
+            HEADER + """PART A
+Answer all questions, each carries 3 marks. Marks
+1 What is a system call? List any two types of system calls. (3)
+2 Differentiate between a process and a thread. (3)
+3 Explain the critical section problem with an
+example. (3)
+4 What are the necessary conditions for a deadlock to occur? (3)
+5 Define thrashing. (3)
+PART B
+Answer any one full question from each module, each carries 14 marks.
+Module I
+11 a) Explain the layered structure of an operating system with a neat
+diagram. (7)
+b) Describe the different states of a process with a state transition diagram. (7)
+OR
+12 a) What is a process control block? Explain its fields. (7)
+b) Compare preemptive and non-preemptive scheduling. (7)
+Page 1 of 2
+""",
+            """A 1000CST206052201 Pages: 2
+Module II
+13 Consider the following set of processes with their burst times:
+a) Draw the Gantt chart for FCFS and Round Robin scheduling. (8)
+b) Find the average waiting time for each algorithm. (6)
+OR
+14 a) Explain the producer consumer problem using semaphores. (9)
+b) What is a monitor? (5)
+Page 2 of 2
+""",
+        ],
+        [
+            "What is a system call? List any two types of system calls.",
+            "Differentiate between a process and a thread.",
+            "Explain the critical section problem with an example.",
+            "What are the necessary conditions for a deadlock to occur?",
+            "Define thrashing.",
+            "Explain the layered structure of an operating system with a neat diagram.",
+            "Describe the different states of a process with a state transition diagram.",
+            "What is a process control block? Explain its fields.",
+            "Compare preemptive and non-preemptive scheduling.",
+            "Consider the following set of processes with their burst times: "
+            "Draw the Gantt chart for FCFS and Round Robin scheduling.",
+            "Consider the following set of processes with their burst times: "
+            "Find the average waiting time for each algorithm.",
+            "Explain the producer consumer problem using semaphores.",
+            "What is a monitor?",
+        ],
+    ),
+    (
+        "table_layout",
+        [
+            HEADER.replace("OPERATING SYSTEMS", "COMPUTER NETWORKS") + """PART A
+Answer all questions, each carries 3 marks.
+Marks
+1
+Differentiate between circuit switching and packet switching.
+3
+2
+What is the purpose of the data link layer?
+3
+3
+List the services provided by the transport layer.
+3
+4
+Why is the three way handshake needed in TCP?
+3
+PART B
+Module 1
+11
+a)
+Explain the OSI reference model with a neat diagram.
+8
+b)
+Compare TCP and UDP.
+6
+""",
+        ],
+        [
+            "Differentiate between circuit switching and packet switching.",
+            "What is the purpose of the data link layer?",
+            "List the services provided by the transport layer.",
+            "Why is the three way handshake needed in TCP?",
+            "Explain the OSI reference model with a neat diagram.",
+            "Compare TCP and UDP.",
+        ],
+    ),
+    (
+        "q_numbering",
+        [
+            """DATABASE MANAGEMENT SYSTEMS - MODEL QUESTION PAPER
+Instructions: Write legibly. Draw diagrams wherever necessary.
+Q1. Define a candidate key with an example. [3 marks]
+Q2. What is the difference between DDL and DML? [3 marks]
+Q3. Explain the ACID properties of a transaction.
+Illustrate each property with a banking example. [6 marks]
+Q4. Normalize the given relation into 3NF:
+(i) Find the functional dependencies.
+(ii) Decompose the relation. [8 marks]
+Q4. Normalize the given relation into 3NF:
+(i) Find the functional dependencies.
+(ii) Decompose the relation. [8 marks]
+Q5. Why are indexes used in databases? [3 marks]
+""",
+        ],
+        [
+            "Define a candidate key with an example.",
+            "What is the difference between DDL and DML?",
+            "Explain the ACID properties of a transaction. Illustrate each property with a banking example.",
+            "Normalize the given relation into 3NF: (i) Find the functional dependencies. "
+            "(ii) Decompose the relation.",
+            "Why are indexes used in databases?",
+        ],
+    ),
+    (
+        "unnumbered",
+        [
+            """SOFTWARE ENGINEERING - REVISION QUESTIONS
+The following questions are taken from previous class tests.
+What is the difference between verification and
+validation?
+Why is the waterfall model unsuitable for projects
+with changing requirements?
+What are the advantages of pair programming?
+Discuss with examples.
+""",
+            """SOFTWARE ENGINEERING - REVISION QUESTIONS
+How does regression testing differ from unit testing?
+What is meant by technical debt?
+""",
+        ],
+        [
+            "What is the difference between verification and validation?",
+            "Why is the waterfall model unsuitable for projects with changing requirements?",
+            "What are the advantages of pair programming?",
+            "How does regression testing differ from unit testing?",
+            "What is meant by technical debt?",
+        ],
+    ),
+]
+
+
+def legacy_parse(pages):
+    """The regex query.parse_questions used before question_parser."""
+    text = "\n".join(pages)
+    return re.compile(r'(?<=\n)(.*?\?)', re.DOTALL).findall(text)
+
+
+def new_parse(pages):
+    return [question["text"] for question in parse_questions(pages)]
+
+
+def _jaccard(left, right):
+    left, right = set(normalize(left).split()), set(normalize(right).split())
+    return len(left & right) / len(left | right) if left | right else 1.0
+
+
+def score(predicted, gold):
+    """Return (true positives, predicted count, gold count) with one-to-one matching."""
+    unmatched = list(gold)
+    hits = 0
+    for question in predicted:
+        best = max(unmatched, key=lambda g: _jaccard(question, g), default=None)
+        if best is not None and _jaccard(question, best) >= MATCH_JACCARD:
+            unmatched.remove(best)
+            hits += 1
+    return hits, len(predicted), len(gold)
+
+
+def load_gold(gold_path, pdf_dir):
+    from pdf_extract import extract_pages
+    with open(gold_path, "r", encoding="utf-8") as f:
+        gold = json.load(f)
+    return [(name, extract_pages(os.path.join(pdf_dir, name)), questions) for name, questions in gold.items()]
+
+
+def long_paper(pages, lines_per_page=60):
+    """Many pages of numbered prose without a single question mark."""
+    line = "Explain the working of the scheduler and the memory manager in detail."
+    return ["\n".join(f"{i % 9 + 1}. {line}" for i in range(lines_per_page)) for _ in range(pages)]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--gold", help="JSON file mapping PDF names to their expected questions")
+    parser.add_argument("--pdf-dir", default="Upload", help="Directory holding the PDFs named in --gold")
+    parser.add_argument("--pages", type=int, nargs="+", default=[10, 30, 100], help="Long paper sizes to time")
+    parser.add_argument("--verbose", action="store_true", help="Print every extracted question")
+    args = parser.parse_args()
+
+    papers = list(SAMPLE_PAPERS)
+    if args.gold:
+        papers += load_gold(args.gold, args.pdf_dir)
+
+    totals = {"legacy": [0, 0, 0], "parser": [0, 0, 0]}
+    print(f"{'paper':<20} {'parser':<8} {'found':>6} {'gold':>5} {'precision':>10} {'recall':>7}")
+    for name, pages, gold in papers:
+        for label, parse in (("legacy", legacy_parse), ("parser", new_parse)):
+            predicted = parse(pages)
+            hits, found, expected = score(predicted, gold)
+            totals[label] = [t + v for t, v in zip(totals[label], (hits, found, expected))]
+            print(f"{name:<20} {label:<8} {found:>6} {expected:>5} "
+                  f"{hits / found if found else 0:>10.2f} {hits / expected if expected else 0:>7.2f}")
+            if args.verbose:
+                for question in predicted:
+                    print(f"    {question[:100]!r}")
+    for label, (hits, found, expected) in totals.items():
+        precision = hits / found if found else 0
+        recall = hits / expected if expected else 0
+        f1 = 2 * precision * recall / (precision + recall) if precision + recall else 0
+        print(f"{'all':<20} {label:<8} {found:>6} {expected:>5} {precision:>10.2f} {recall:>7.2f}  F1 {f1:.2f}")
+
+    print(f"\n{'pages':>6} {'legacy s':>10} {'parser s':>10} {'parser pages/s':>15}")
+    for page_count in args.pages:
+        pages = long_paper(page_count)
+        start = time.perf_counter()
+        legacy_parse(pages)
+        legacy_seconds = time.perf_counter() - start
+        start = time.perf_counter()
+        new_parse(pages)
+        parser_seconds = time.perf_counter() - start
+        print(f"{page_count:>6} {legacy_seconds:>10.3f} {parser_seconds:>10.3f} {page_count / parser_seconds:>15.0f}")
+
+
+if __name__ == "__main__":
+    main()
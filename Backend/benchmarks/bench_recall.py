@@ -0,0 +1,70 @@
+"""Recall@k of vector-only retrieval against hybrid BM25 + vector retrieval.
+
+Uses a held-out JSONL file of {"question": ..., "chunk_id": ...} pairs, or
+samples pairs from the index (a phrase cut from a chunk is the question and
+that chunk is the answer) when no file is given:
+
+    python benchmarks/bench_recall.py --pairs heldout.jsonl --k 1 3 5 10
+"""
+import argparse
+import json
+import os
+import random
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from rag_engine import get_engine
+
+
+def load_pairs(path):
+    with open(path, "r", encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def sample_pairs(engine, n, seed=0):
+    rng = random.Random(seed)
+    stored = engine.db.get(include=["documents"])
+    candidates = [(cid, text) for cid, text in zip(stored["ids"], stored["documents"])
+                  if text and len(text.split()) >= 30]
+    pairs = []
+    for chunk_id, text in rng.sample(candidates, min(n, len(candidates))):
+        words = text.split()
+        start = rng.randrange(0, len(words) - 12)
+        pairs.append({"question": " ".join(words[start:start + 12]), "chunk_id": chunk_id})
+    return pairs
+
+
+def recall_at(engine, pairs, ks, hybrid):
+    engine.hybrid = hybrid
+    top = max(ks)
+    hits = {k: 0 for k in ks}
+    for pair in pairs:
+        ids = [doc.id or doc.metadata.get("id") for doc, _ in engine.retrieve(pair["question"], k=top)]
+        for k in ks:
+            hits[k] += pair["chunk_id"] in ids[:k]
+    return {k: hits[k] / len(pairs) for k in ks}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--pairs", help="Held-out question/chunk JSONL file.")
+    parser.add_argument("--sample", type=int, default=200, help="Pairs to sample when --pairs is not given.")
+    parser.add_argument("--k", type=int, nargs="+", default=[1, 3, 5, 10])
+    args = parser.parse_args()
+
+    engine = get_engine().warm_up()
+    pairs = load_pairs(args.pairs) if args.pairs else sample_pairs(engine, args.sample)
+    if not pairs:
+        print("No question/chunk pairs to evaluate.")
+        return
+
+    print(f"{len(pairs)} pairs")
+    print(f"{'mode':>8} " + " ".join(f"{f'R@{k}':>7}" for k in args.k))
+    for name, hybrid in (("vector", False), ("hybrid", True)):
+        recall = recall_at(engine, pairs, args.k, hybrid)
+        print(f"{name:>8} " + " ".join(f"{recall[k]:>7.3f}" for k in args.k))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,73 @@
+"""Compare the old double-pass text extraction with per-page extractor selection.
+
+The legacy path ran PyMuPDF (with OCR) over every page and then pdfminer over
+the whole document, concatenating both outputs. The current path reads each
+page once and writes it straight to disk. Run from the Backend directory:
+
+    python benchmarks/bench_text_extraction.py Upload/*.pdf --workers 4
+"""
+import argparse
+import glob
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from pdfminer.high_level import extract_text as pdfminer_extract_text
+from admin_upload import write_text
+from pdf_extract import extract_pages_parallel, EXTRACT_WORKERS
+
+
+def legacy_extract(pdf_path, output_path, workers):
+    text = ""
+    for page_text in extract_pages_parallel(pdf_path, workers=workers):
+        if page_text:
+            text += page_text + "\n"
+    text += "\n" + pdfminer_extract_text(pdf_path)
+    with open(output_path, "w", encoding="utf-8") as f:
+        f.write(text)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("pdfs", nargs="*", help="PDFs to extract (default: Upload/*.pdf)")
+    parser.add_argument("--workers", type=int, default=EXTRACT_WORKERS)
+    args = parser.parse_args()
+
+    pdfs = args.pdfs or sorted(glob.glob(os.path.join("Upload", "*.pdf")))
+    if not pdfs:
+        print("No PDFs to benchmark.")
+        return
+
+    print(f"{'file':<40} {'legacy s':>9} {'new s':>9} {'legacy KB':>10} {'new KB':>10}")
+    totals = [0.0, 0.0, 0, 0]
+    with tempfile.TemporaryDirectory() as temp_dir:
+        for pdf in pdfs:
+            legacy_path = os.path.join(temp_dir, "legacy.txt")
+            new_path = os.path.join(temp_dir, "new.txt")
+
+            start = time.perf_counter()
+            legacy_extract(pdf, legacy_path, args.workers)
+            legacy_seconds = time.perf_counter() - start
+
+            start = time.perf_counter()
+            write_text(pdf, new_path)
+            new_seconds = time.perf_counter() - start
+
+            legacy_size, new_size = os.path.getsize(legacy_path), os.path.getsize(new_path)
+            for i, value in enumerate((legacy_seconds, new_seconds, legacy_size, new_size)):
+                totals[i] += value
+            print(f"{os.path.basename(pdf)[:40]:<40} {legacy_seconds:>9.2f} {new_seconds:>9.2f} "
+                  f"{legacy_size / 1024:>10.0f} {new_size / 1024:>10.0f}")
+
+    legacy_seconds, new_seconds, legacy_size, new_size = totals
+    print(f"{'total':<40} {legacy_seconds:>9.2f} {new_seconds:>9.2f} "
+          f"{legacy_size / 1024:>10.0f} {new_size / 1024:>10.0f}")
+    if new_seconds and new_size:
+        print(f"speedup {legacy_seconds / new_seconds:.2f}x, text size {new_size / legacy_size:.0%} of legacy")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,103 @@
+"""Check that the embedding backends retrieve the same chunks as the current model.
+
+Chunks come from data/*.txt, split and IDed as in data_process.py, and are
+searched in memory by cosine similarity. Questions are read from a JSONL file
+of {"question": ..., "chunk_id": ...} pairs, or sampled from the chunks (a
+phrase cut from a chunk is the question and that chunk is the answer). The
+reference is the current setup: full-precision PyTorch without e5 prefixes.
+
+    python benchmarks/check_embedding_accuracy.py --backends torch onnx int8 --k 5
+"""
+import argparse
+import glob
+import itertools
+import json
+import os
+import random
+import sys
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from data_process import iter_chunk_ids, iter_chunks, DATA_PATH
+from get_embedding_function import (ALLOW_FAKE_EMBEDDINGS, BACKENDS, MODEL_BACKENDS, E5Embeddings, EMBEDDING_MODEL,
+                                    embed_queries, load_encoder)
+
+
+def load_chunks(paths, limit):
+    chunks = itertools.chain.from_iterable(iter_chunk_ids(iter_chunks(path)) for path in paths)
+    return list(itertools.islice(chunks, limit))
+
+
+def sample_pairs(chunks, n, seed=0):
+    rng = random.Random(seed)
+    candidates = [chunk for chunk in chunks if len(chunk.page_content.split()) >= 30]
+    pairs = []
+    for chunk in rng.sample(candidates, min(n, len(candidates))):
+        words = chunk.page_content.split()
+        start = rng.randrange(0, len(words) - 12)
+        pairs.append({"question": " ".join(words[start:start + 12]), "chunk_id": chunk.metadata["id"]})
+    return pairs
+
+
+def unit(vectors):
+    vectors = np.asarray(vectors, dtype=np.float32)
+    return vectors / np.maximum(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-12)
+
+
+def top_ids(embedder, chunks, questions, k, batch_size=64):
+    texts = [chunk.page_content for chunk in chunks]
+    passages = unit(np.vstack([embedder.embed_documents(texts[i:i + batch_size])
+                               for i in range(0, len(texts), batch_size)]))
+    queries = unit(embed_queries(embedder, questions))
+    best = np.argsort(-(queries @ passages.T), axis=1)[:, :k]
+    ids = [chunk.metadata["id"] for chunk in chunks]
+    return [[ids[i] for i in row] for row in best], passages
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--pairs", help="Held-out question/chunk JSONL file.")
+    parser.add_argument("--sample", type=int, default=200, help="Pairs to sample when --pairs is not given.")
+    parser.add_argument("--limit", type=int, default=3000, help="Maximum chunks to search.")
+    parser.add_argument("--backends", nargs="+", default=list(MODEL_BACKENDS), choices=BACKENDS)
+    parser.add_argument("--k", type=int, default=5)
+    args = parser.parse_args()
+    if "hash" in args.backends:
+        os.environ[ALLOW_FAKE_EMBEDDINGS] = "1"
+
+    chunks = load_chunks(sorted(glob.glob(os.path.join(DATA_PATH, "*.txt"))), args.limit)
+    if args.pairs:
+        with open(args.pairs, "r", encoding="utf-8") as f:
+            pairs = [json.loads(line) for line in f if line.strip()]
+    else:
+        pairs = sample_pairs(chunks, args.sample)
+    if not pairs:
+        print("No question/chunk pairs to evaluate.")
+        return
+    questions = [pair["question"] for pair in pairs]
+
+    from langchain_huggingface import HuggingFaceEmbeddings
+    reference, _vectors = top_ids(HuggingFaceEmbeddings(model_name=EMBEDDING_MODEL),
+                                    chunks, questions, args.k)
+
+    def report(name, ranked, vectors):
+        recall = sum(pair["chunk_id"] in ids for pair, ids in zip(pairs, ranked)) / len(pairs)
+        overlap = np.mean([len(set(ids) & set(ref)) / args.k for ids, ref in zip(ranked, reference)])
+        print(f"{name:>10} {recall:>8.3f} {overlap:>11.3f} {vectors:>12}")
+
+    print(f"{len(chunks)} chunks, {len(pairs)} questions, {EMBEDDING_MODEL}")
+    print(f"{'backend':>10} {f'R@{args.k}':>8} {'overlap@k':>11} {'cos vs torch':>12}")
+    report("current", reference, "-")
+    torch_vectors = None
+    for backend in args.backends:
+        ranked, vectors = top_ids(E5Embeddings(load_encoder(backend)), chunks, questions, args.k)
+        if backend == "torch":
+            torch_vectors = vectors
+        similarity = (f"{np.mean(np.sum(vectors * torch_vectors, axis=1)):.4f}"
+                      if torch_vectors is not None else "-")
+        report(backend, ranked, similarity)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,102 @@
+"""Load-test the /query endpoint and report latency percentiles per concurrency level.
+
+Every request asks a different question, so the answer cache and the answer
+bank only help as much as they would for real traffic. To time the full
+retrieval and generation path, start the server with ANSWER_CACHE_SIZE=0 and
+ANSWER_BANK_DIR pointing at an empty directory. Start a server first
+(python asgi_server.py or python servereq.py), then:
+
+    python benchmarks/load_test.py --url http://127.0.0.1:5000 --concurrency 1 4 16 64
+"""
+import argparse
+import asyncio
+import itertools
+import random
+import statistics
+import time
+import httpx
+
+TEMPLATES = [
+    "What is {}?",
+    "Explain {} with an example.",
+    "What are the advantages and disadvantages of {}?",
+    "Describe how {} works.",
+    "Why is {} needed?",
+    "Compare {} with its alternatives.",
+    "Give a short note on {}.",
+    "What problems does {} solve?",
+]
+TOPICS = [
+    "an operating system", "deadlock", "normalization in databases", "a process control block",
+    "paging", "segmentation", "virtual memory", "a translation lookaside buffer", "demand paging",
+    "thrashing", "a semaphore", "a mutex", "the critical section problem", "round robin scheduling",
+    "priority scheduling", "a context switch", "an interrupt", "direct memory access", "a file system",
+    "an inode", "RAID", "disk scheduling", "the TCP handshake", "UDP", "congestion control",
+    "the sliding window protocol", "routing", "subnetting", "the OSI model", "DNS", "ARP",
+    "a database transaction", "ACID properties", "two phase locking", "a B+ tree index", "hashing",
+    "a relational join", "the entity relationship model", "referential integrity", "a view in SQL",
+]
+
+
+def unique_questions(seed=None):
+    """Yield TEMPLATES x TOPICS questions in random order, repeating only once all have been asked."""
+    questions = [template.format(topic) for template in TEMPLATES for topic in TOPICS]
+    random.Random(seed).shuffle(questions)
+    return itertools.cycle(questions)
+
+
+def percentile(values, pct):
+    if not values:
+        return float("nan")
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, round(pct / 100 * len(ordered)) - 1))
+    return ordered[index]
+
+
+async def run_level(client, url, concurrency, requests, questions):
+    latencies, statuses = [], {}
+    counter = iter(range(requests))
+
+    async def worker():
+        for _ in counter:
+            start = time.perf_counter()
+            try:
+                response = await client.post(f"{url}/query", data={"question": next(questions)})
+                status = response.status_code
+            except httpx.HTTPError:
+                status = "error"
+            statuses[status] = statuses.get(status, 0) + 1
+            if status == 200:
+                latencies.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - start
+    return latencies, statuses, elapsed
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--url", default="http://127.0.0.1:5000")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 2, 4, 8, 16, 32])
+    parser.add_argument("--requests", type=int, default=64, help="Requests per concurrency level.")
+    parser.add_argument("--timeout", type=float, default=300)
+    parser.add_argument("--seed", type=int, default=None, help="Seed for the question order.")
+    args = parser.parse_args()
+
+    print(f"{'conc':>5} {'ok':>5} {'429':>5} {'other':>6} {'req/s':>7} {'p50 (s)':>8} {'p99 (s)':>8} {'mean (s)':>9}")
+    questions = unique_questions(args.seed)
+    limits = httpx.Limits(max_connections=max(args.concurrency))
+    async with httpx.AsyncClient(timeout=args.timeout, limits=limits) as client:
+        for concurrency in args.concurrency:
+            latencies, statuses, elapsed = await run_level(client, args.url, concurrency, args.requests, questions)
+            ok = statuses.get(200, 0)
+            busy = statuses.get(429, 0)
+            other = sum(statuses.values()) - ok - busy
+            mean = statistics.mean(latencies) if latencies else float("nan")
+            print(f"{concurrency:>5} {ok:>5} {busy:>5} {other:>6} {ok / elapsed:>7.2f} "
+                  f"{percentile(latencies, 50):>8.3f} {percentile(latencies, 99):>8.3f} {mean:>9.3f}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
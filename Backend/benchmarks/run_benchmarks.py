@@ -0,0 +1,304 @@
+"""End-to-end ingestion and query benchmarks that run fully offline.
+
+Builds a fresh index in a scratch directory from the PDFs in Upload/ plus a
+synthetic corpus, then answers the questions extracted from those PDFs and
+from a synthetic question paper. Generation uses the stub LLM with a
+configurable latency, and --fake-embeddings swaps the embedding model for
+HashEmbeddings so nothing is downloaded. Results are JSON (throughput,
+p50/p95/p99 latency, per-stage time, peak RSS, index size) and can be
+checked against a stored baseline. Run from the Backend directory:
+
+    python benchmarks/run_benchmarks.py --fake-embeddings --output results.json
+    python benchmarks/run_benchmarks.py --fake-embeddings --save-baseline benchmarks/baseline.json
+    python benchmarks/run_benchmarks.py --fake-embeddings --baseline benchmarks/baseline.json
+"""
+import argparse
+import contextlib
+import glob
+import json
+import os
+import platform
+import random
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+VOCABULARY = (
+    "process thread scheduler deadlock semaphore mutex paging segmentation virtual memory cache "
+    "kernel interrupt file system inode directory disk buffer protocol packet router switch "
+    "transport network layer congestion window handshake socket database relation schema "
+    "normalization transaction isolation index query join tree graph traversal hashing sorting "
+    "recursion complexity algorithm compiler parser grammar token register pipeline instruction"
+).split()
+
+# (metric path, which direction is better) checked against the baseline
+TRACKED_METRICS = (
+    ("ingestion.extraction_pages_per_s", "higher"),
+    ("ingestion.chunks_per_s", "higher"),
+    ("ingestion.index_bytes", "lower"),
+    ("query.questions_per_s", "higher"),
+    ("query.latency_ms.p50", "lower"),
+    ("query.latency_ms.p95", "lower"),
+    ("query.latency_ms.p99", "lower"),
+    ("peak_rss_mb.self", "lower"),
+)
+
+
+def make_corpus(directory, documents, paragraphs, seed=0):
+    """Write documents synthetic text files of topic-word paragraphs."""
+    rng = random.Random(seed)
+    paths = []
+    for i in range(documents):
+        path = os.path.join(directory, f"synthetic_{i:03d}.txt")
+        with open(path, "w", encoding="utf-8") as f:
+            for p in range(paragraphs):
+                words = rng.choices(VOCABULARY, k=rng.randint(40, 120))
+                f.write(f"{p + 1}. {' '.join(words).capitalize()}.\n\n")
+        paths.append(path)
+    return paths
+
+
+def make_question_paper(path, questions, seed=0):
+    """Write a PDF with numbered questions built from the corpus vocabulary."""
+    import fitz
+    rng = random.Random(seed)
+    doc = fitz.open()
+    page, y = doc.new_page(), 72
+    for i in range(questions):
+        text = f"{i + 1}. Explain {' '.join(rng.choices(VOCABULARY, k=6))} with an example? [5 marks]"
+        if y > 760:
+            page, y = doc.new_page(), 72
+        page.insert_text((72, y), text, fontsize=10)
+        y += 24
+    doc.save(path)
+    doc.close()
+    return path
+
+
+def percentiles(seconds):
+    if not seconds:
+        return {"p50": None, "p95": None, "p99": None, "mean": None}
+    ordered = sorted(seconds)
+
+    def at(pct):
+        return round(ordered[min(len(ordered) - 1, int(pct / 100 * len(ordered)))] * 1000, 2)
+
+    return {"p50": at(50), "p95": at(95), "p99": at(99),
+            "mean": round(sum(ordered) / len(ordered) * 1000, 2)}
+
+
+def peak_rss_mb():
+    try:
+        import resource
+    except ImportError:  # Windows
+        return {"self": None, "children": None}
+    scale = 1024 * 1024 if sys.platform == "darwin" else 1024
+    return {
+        "self": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / scale, 1),
+        "children": round(resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss / scale, 1),
+    }
+
+
+def directory_size(path):
+    return sum(os.path.getsize(os.path.join(root, name))
+               for root, _dirs, names in os.walk(path) for name in names)
+
+
+def stage_times(before, after):
+    """Mean milliseconds per stage between two STAGE_SECONDS snapshots."""
+    stages = {}
+    for stage, totals in after.items():
+        count = totals["count"] - before.get(stage, {}).get("count", 0)
+        seconds = totals["seconds"] - before.get(stage, {}).get("seconds", 0.0)
+        if count:
+            stages[stage] = {"count": count, "mean_ms": round(seconds / count * 1000, 2)}
+    return stages
+
+
+def run_ingestion(args, workdir):
+    import fitz
+    from admin_upload import process_pdf
+    from data_process import sync_directory
+    from index_store import INDEX_ROOT, current_path, read_index_manifest
+
+    data_dir = os.path.join(workdir, "data")
+    os.makedirs(data_dir)
+    latencies, pages = [], 0
+    start = time.perf_counter()
+    for pdf in args.pdfs:
+        with fitz.open(pdf) as doc:
+            pages += doc.page_count
+        pdf_start = time.perf_counter()
+        process_pdf(pdf, data_dir)
+        latencies.append(time.perf_counter() - pdf_start)
+    extraction_seconds = time.perf_counter() - start
+
+    make_corpus(data_dir, args.docs, args.paragraphs, args.seed)
+    start = time.perf_counter()
+    sync_directory(data_dir, INDEX_ROOT, workers=args.workers)
+    index_seconds = time.perf_counter() - start
+    manifest = read_index_manifest(current_path(INDEX_ROOT)) or {}
+    chunks = manifest.get("chunks", 0)
+    return {
+        "pdfs": len(args.pdfs),
+        "pages": pages,
+        "extraction_seconds": round(extraction_seconds, 3),
+        "extraction_pages_per_s": round(pages / extraction_seconds, 2) if extraction_seconds else None,
+        "extraction_latency_ms": percentiles(latencies),
+        "documents": len(manifest.get("documents", {})),
+        "chunks": chunks,
+        "index_seconds": round(index_seconds, 3),
+        "chunks_per_s": round(chunks / index_seconds, 2) if index_seconds else None,
+        "index_bytes": directory_size(INDEX_ROOT),
+    }
+
+
+def run_queries(args, workdir):
+    from query import answer_question, extract_questions_from_pdf
+    from rag_engine import get_engine
+    from telemetry import STAGE_SECONDS
+
+    papers = list(args.pdfs) + [make_question_paper(os.path.join(workdir, "paper.pdf"),
+                                                    args.paper_questions, args.seed)]
+    questions, extraction = [], []
+    for pdf in papers:
+        start = time.perf_counter()
+        questions += extract_questions_from_pdf(pdf)
+        extraction.append(time.perf_counter() - start)
+    questions = [q.strip() for q in questions if q.strip()] or ["What is an operating system?"]
+
+    start = time.perf_counter()
+    get_engine().warm_up()
+    warmup_seconds = time.perf_counter() - start
+
+    before = STAGE_SECONDS.snapshot()
+    latencies, errors = [], 0
+    start = time.perf_counter()
+    for i in range(args.questions):
+        question_start = time.perf_counter()
+        try:
+            answer_question(questions[i % len(questions)])
+        except Exception:
+            errors += 1
+            continue
+        latencies.append(time.perf_counter() - question_start)
+    elapsed = time.perf_counter() - start
+    return {
+        "papers": len(papers),
+        "questions_extracted": len(questions),
+        "question_extraction_latency_ms": percentiles(extraction),
+        "warmup_seconds": round(warmup_seconds, 3),
+        "questions": args.questions,
+        "errors": errors,
+        "questions_per_s": round(len(latencies) / elapsed, 2) if elapsed else None,
+        "latency_ms": percentiles(latencies),
+        "stages": stage_times(before, STAGE_SECONDS.snapshot()),
+    }
+
+
+def lookup(result, path):
+    for key in path.split("."):
+        if not isinstance(result, dict) or key not in result:
+            return None
+        result = result[key]
+    return result
+
+
+def compare(result, baseline, tolerance):
+    """Print each tracked metric against the baseline; returns the regressed metric names."""
+    regressions = []
+    print(f"{'metric':<36} {'baseline':>12} {'current':>12} {'change':>8}")
+    for path, better in TRACKED_METRICS:
+        old, new = lookup(baseline, path), lookup(result, path)
+        if old is None or new is None or not old:
+            continue
+        change = (new - old) / old
+        worse = change < -tolerance if better == "higher" else change > tolerance
+        if worse:
+            regressions.append(path)
+        print(f"{path:<36} {old:>12} {new:>12} {change:>+8.1%}{'  REGRESSION' if worse else ''}")
+    if baseline.get("config") != result.get("config"):
+        print("⚠️ Baseline was recorded with a different configuration; comparison is indicative only")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("pdfs", nargs="*", help="PDFs to ingest and extract questions from (default: Upload/*.pdf)")
+    parser.add_argument("--docs", type=int, default=20, help="Synthetic text documents to add to the corpus")
+    parser.add_argument("--paragraphs", type=int, default=200, help="Paragraphs per synthetic document")
+    parser.add_argument("--paper-questions", type=int, default=20, help="Questions in the synthetic paper")
+    parser.add_argument("--questions", type=int, default=100, help="Questions to answer")
+    parser.add_argument("--llm-latency", type=float, default=0.05, help="Stub LLM seconds per answer")
+    parser.add_argument("--fake-embeddings", action="store_true", help="Use HashEmbeddings instead of the model")
+    parser.add_argument("--workers", type=int, default=1, help="Embedding worker processes for the index build")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="Write the JSON results here (default: stdout, with progress on stderr)")
+    parser.add_argument("--baseline", help="Compare with this results file; exit 1 on regressions")
+    parser.add_argument("--save-baseline", help="Also write the results to this baseline file")
+    parser.add_argument("--tolerance", type=float, default=0.10, help="Allowed relative change before flagging")
+    parser.add_argument("--keep", action="store_true", help="Keep the scratch directory")
+    args = parser.parse_args()
+    args.pdfs = args.pdfs or sorted(glob.glob(os.path.join("Upload", "*.pdf")))
+
+    # Pipeline progress and the baseline report go to stderr, so stdout carries only the JSON
+    stdout = sys.stdout
+    with contextlib.redirect_stdout(sys.stderr):
+        workdir = tempfile.mkdtemp(prefix="eduquest-bench-")
+        # Everything the pipeline writes goes to the scratch directory; set before the modules are imported
+        os.environ.update({
+            "INDEX_ROOT": os.path.join(workdir, "index"),
+            "EMBEDDING_CACHE_DIR": os.path.join(workdir, "embedding_cache"),
+            "PDF_CACHE_DIR": os.path.join(workdir, "pdf_cache"),
+            "LLM_BACKEND": "stub",
+            "STUB_LLM_LATENCY": str(args.llm_latency),
+            "ANSWER_CACHE_SIZE": "0",
+        })
+        if args.fake_embeddings:
+            os.environ["EMBEDDING_BACKEND"] = "hash"
+            os.environ["ALLOW_FAKE_EMBEDDINGS"] = "1"
+
+        try:
+            from get_embedding_function import get_backend
+            config = {key: value for key, value in vars(args).items()
+                      if key not in ("output", "baseline", "save_baseline", "tolerance", "keep")}
+            config["pdfs"] = [os.path.basename(pdf) for pdf in args.pdfs]
+            config["embedding_backend"] = get_backend()
+            result = {"config": config}
+            result["ingestion"] = run_ingestion(args, workdir)
+            result["query"] = run_queries(args, workdir)
+            result["peak_rss_mb"] = peak_rss_mb()
+        finally:
+            if not args.keep:
+                shutil.rmtree(workdir, ignore_errors=True)
+
+        try:
+            commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True,
+                                    text=True, check=True).stdout.strip()
+        except (OSError, subprocess.CalledProcessError):
+            commit = None
+        result["meta"] = {"commit": commit, "python": platform.python_version(), "platform": platform.platform(),
+                          "cpus": os.cpu_count(), "time": time.strftime("%Y-%m-%dT%H:%M:%S")}
+
+        text = json.dumps(result, indent=2)
+        for path in filter(None, (args.output, args.save_baseline)):
+            with open(path, "w", encoding="utf-8") as f:
+                f.write(text + "\n")
+        if not args.output:
+            print(text, file=stdout)
+
+        if args.baseline:
+            with open(args.baseline, "r", encoding="utf-8") as f:
+                regressions = compare(result, json.load(f), args.tolerance)
+            if regressions:
+                print(f"❌ {len(regressions)} regression(s): {', '.join(regressions)}")
+                sys.exit(1)
+            print("✅ No regressions")
+
+
+if __name__ == "__main__":
+    main()
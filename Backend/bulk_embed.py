@@ -0,0 +1,82 @@
+import logging
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from langchain_core.embeddings import Embeddings
+
+logger = logging.getLogger(__name__)
+
+# Texts per worker call; each worker holds its own copy of the model
+BULK_BATCH_SIZE = 64
+
+_model = None
+
+
+def _init_worker(threads, backend):
+    global _model
+    try:
+        import torch
+        torch.set_num_threads(threads)
+    except ImportError:
+        pass
+    from get_embedding_function import load_encoder
+    _model = load_encoder(backend)
+
+
+def _embed(texts):
+    return _model.embed_documents(texts)
+
+
+class ParallelEmbeddings(Embeddings):
+    """Spreads embed_documents over a pool of processes, one model per process.
+
+    Each call is cut into batches of batch_size texts that run on the workers
+    in parallel; with bucket=True texts are sorted by length first, so each
+    batch pads to a similar length and less encoder time goes to padding.
+    Vectors come back in input order. Cores are divided between the workers
+    so their torch thread pools don't oversubscribe the machine.
+    """
+
+    def __init__(self, workers, batch_size=BULK_BATCH_SIZE, bucket=False, backend=None):
+        self.workers = workers
+        self.batch_size = batch_size
+        self.bucket = bucket
+        threads = max(1, (os.cpu_count() or 1) // workers)
+        # spawn: workers must not inherit the parent's threads or a half-loaded model
+        self._pool = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn"),
+                                         initializer=_init_worker, initargs=(threads, backend))
+
+    def embed_documents(self, texts):
+        order = list(range(len(texts)))
+        if self.bucket:
+            order.sort(key=lambda i: len(texts[i]))
+        batches = [order[i:i + self.batch_size] for i in range(0, len(order), self.batch_size)]
+        futures = [self._pool.submit(_embed, [texts[i] for i in batch]) for batch in batches]
+        vectors = [None] * len(texts)
+        for batch, future in zip(batches, futures):
+            for i, vector in zip(batch, future.result()):
+                vectors[i] = vector
+        return vectors
+
+    def embed_query(self, text):
+        return self.embed_documents([text])[0]
+
+    def close(self):
+        self._pool.shutdown()
+
+
+def get_bulk_embedding_function(workers, batch_size=BULK_BATCH_SIZE, bucket=False, backend=None):
+    """Cached embedder for index builds, parallel across workers processes when workers > 1.
+
+    The disk cache and the e5 prefixes sit in front of the pool, so only this
+    process writes the cache.
+    """
+    from get_embedding_function import E5Embeddings, cache_name, get_backend, get_embedding_function
+    if workers <= 1:
+        return get_embedding_function(cache=True, backend=backend)
+    from embedding_cache import CachedEmbeddings
+    backend = get_backend(backend)
+    logger.info(f"Embedding with {workers} {backend} worker processes, batches of {batch_size}"
+                f"{' bucketed by length' if bucket else ''}")
+    parallel = ParallelEmbeddings(workers, batch_size, bucket, backend)
+    return CachedEmbeddings(E5Embeddings(parallel), cache_name(backend))
@@ -0,0 +1,122 @@
+import logging
+import os
+import re
+
+logger = logging.getLogger(__name__)
+
+# Configuration
+CONTEXT_TOKEN_BUDGET = int(os.getenv("CONTEXT_TOKEN_BUDGET", "1200"))
+NEAR_DUPLICATE_JACCARD = 0.8  # passages sharing this much of their 5-word shingles are duplicates
+MIN_OVERLAP_CHARS = 30
+SEPARATOR = "\n\n---\n\n"
+
+TOKEN_PATTERN = re.compile(r"\w+|[^\w\s]")
+
+
+def count_tokens(text):
+    """Approximate LLM token count: words and punctuation marks."""
+    return len(TOKEN_PATTERN.findall(text))
+
+
+def _shingles(text, size=5):
+    words = text.lower().split()
+    if len(words) <= size:
+        return {" ".join(words)}
+    return {" ".join(words[i:i + size]) for i in range(len(words) - size + 1)}
+
+
+def _overlap(left, right, max_overlap=1000):
+    """Length of the longest suffix of left that is a prefix of right (0 if shorter than MIN_OVERLAP_CHARS)."""
+    probe = right[:MIN_OVERLAP_CHARS]
+    if len(probe) < MIN_OVERLAP_CHARS:
+        return 0
+    start = max(0, len(left) - max_overlap)
+    idx = left.find(probe, start)
+    while idx != -1:
+        if right.startswith(left[idx:]):
+            return len(left) - idx
+        idx = left.find(probe, idx + 1)
+    return 0
+
+
+def _join(left, right):
+    """The text covering both if they overlap or one contains the other, else None."""
+    if right in left:
+        return left
+    if left in right:
+        return right
+    overlap = _overlap(left, right)
+    if overlap:
+        return left + right[overlap:]
+    overlap = _overlap(right, left)
+    if overlap:
+        return right + left[overlap:]
+    return None
+
+
+def _merge_spans(results):
+    """Merge chunks of the same source whose texts overlap or contain each other.
+
+    Returns spans as [text, source, best_rank] in order of their best rank.
+    """
+    spans = []
+    for rank, (doc, _score) in enumerate(results):
+        span = [doc.page_content.strip(), doc.metadata.get("source"), rank]
+        # A grown span can bridge spans that did not touch before, so keep merging until it stands alone
+        merged = True
+        while merged:
+            merged = False
+            for other in spans:
+                joined = _join(other[0], span[0]) if other[1] == span[1] else None
+                if joined is not None:
+                    spans.remove(other)
+                    span = [joined, span[1], min(other[2], span[2])]
+                    merged = True
+                    break
+        spans.append(span)
+    spans.sort(key=lambda span: span[2])
+    return spans
+
+
+def _truncate(text, max_tokens):
+    tokens = 0
+    for match in TOKEN_PATTERN.finditer(text):
+        tokens += 1
+        if tokens > max_tokens:
+            return text[:match.start()].rstrip() + " ..."
+    return text
+
+
+def build_context(results, budget=CONTEXT_TOKEN_BUDGET):
+    """Turn retrieved (Document, score) pairs into a deduplicated, budgeted context string.
+
+    Overlapping chunks of the same source are merged into one span, spans that
+    are near-duplicates of a more relevant one are dropped, and the rest are
+    packed in relevance order until about `budget` tokens are used.
+    """
+    raw_tokens = count_tokens(SEPARATOR.join(doc.page_content for doc, _score in results))
+
+    kept, kept_shingles = [], []
+    for text, _source, _rank in _merge_spans(results):
+        shingles = _shingles(text)
+        if any(len(shingles & other) / len(shingles | other) >= NEAR_DUPLICATE_JACCARD
+               for other in kept_shingles):
+            continue
+        kept.append(text)
+        kept_shingles.append(shingles)
+
+    passages, used = [], 0
+    for text in kept:
+        tokens = count_tokens(text)
+        if used + tokens > budget:
+            remaining = budget - used
+            if remaining >= 50 or not passages:
+                passages.append(_truncate(text, remaining))
+            break
+        passages.append(text)
+        used += tokens
+
+    context = SEPARATOR.join(passages)
+    logger.debug(f"Context tokens: {raw_tokens} -> {count_tokens(context)} "
+                f"({len(results)} chunks -> {len(passages)} passages)")
+    return context
@@ -1,119 +1,390 @@
 import argparse
+import hashlib
+import json
 import os
-import shutil
-from langchain_community.document_loaders import TextLoader
+import queue
+import threading
+import time
+from filelock import FileLock
 from langchain.text_splitter import RecursiveCharacterTextSplitter
 from langchain.schema import Document
-from get_embedding_function import get_embedding_function
-from langchain_chroma import Chroma
-from typing import List
+from bulk_embed import get_bulk_embedding_function, BULK_BATCH_SIZE
+from get_embedding_function import (EMBEDDING_MODEL, PASSAGE_PREFIX, QUERY_PREFIX, get_backend,
+                                    get_embedding_function)
+from index_store import (INDEX_ROOT, activate_version, bump_index_version, create_version, current_path,
+                         open_chroma, read_index_manifest, update_index_manifest)
+from lexical_index import load_lexical_index, save_lexical_index
+from pdf_cache import file_sha256
 
-CHROMA_PATH = "chroma1"
+CHROMA_PATH = INDEX_ROOT
 DATA_PATH = "data"
+CHUNK_SIZE = 800
+CHUNK_OVERLAP = 200
+# Per-file hash, mtime and chunk IDs, stored next to the collection it describes
+MANIFEST_NAME = "ingest_manifest.json"
+# Held in the index root while an update runs, so the ingestion worker and this CLI take turns
+MANIFEST_LOCK_NAME = "ingest.lock"
+# Files are read and split this many characters at a time, and chunks are embedded in batches
+READ_WINDOW_CHARS = 1024 * 1024
+EMBED_BATCH_SIZE = 100
 
 
 def main():
     parser = argparse.ArgumentParser()
-    parser.add_argument("--reset", action="store_true", help="Reset the database.")
+    parser.add_argument("--reset", action="store_true",
+                        help="Build a fresh index version and switch to it once it is complete.")
+    parser.add_argument("--workers", type=int, default=1,
+                        help="Embedding worker processes, each with its own model copy.")
+    parser.add_argument("--batch-size", type=int, default=None,
+                        help=f"Texts per embedding call (default {EMBED_BATCH_SIZE}, or {BULK_BATCH_SIZE} per worker).")
+    parser.add_argument("--bucket", action="store_true",
+                        help="Batch chunks of similar length together to cut padding.")
     args = parser.parse_args()
     if args.reset:
-        print("✨ Clearing Database")
-        clear_database()
+        print("✨ Building a new index version")
 
-    documents = load_documents()
-    chunks = split_documents(documents)
-    add_to_chroma(chunks)
+    sync_directory(workers=args.workers, batch_size=args.batch_size, bucket=args.bucket, rebuild=args.reset)
 
 
-def load_documents():
-    documents = []
-    for file_name in os.listdir(DATA_PATH):
-        file_path = os.path.join(DATA_PATH, file_name)
+def iter_text_files(data_path=DATA_PATH):
+    for file_name in sorted(os.listdir(data_path)):
+        file_path = os.path.join(data_path, file_name)
         if os.path.isfile(file_path) and file_name.endswith(".txt"):
-            print(f"📖 Loading file: {file_name}")
-            loader = TextLoader(file_path, encoding='utf-8')
-            documents.extend(loader.load())
-    return documents
+            yield file_path
 
 
-def split_documents(documents: List[Document]):
-    text_splitter = RecursiveCharacterTextSplitter(
-        chunk_size=800,
-        chunk_overlap=200,
+def get_text_splitter():
+    return RecursiveCharacterTextSplitter(
+        chunk_size=CHUNK_SIZE,
+        chunk_overlap=CHUNK_OVERLAP,
         length_function=len,
         is_separator_regex=False,
     )
-    return text_splitter.split_documents(documents)
 
 
-# def add_to_chroma(chunks: List[Document]):
-#     db = Chroma(
-#         persist_directory=CHROMA_PATH, embedding_function=get_embedding_function()
-#     )
+def iter_windows(file_path, window_chars=READ_WINDOW_CHARS):
+    """Yield a file's text in pieces of about window_chars, cut at paragraph breaks."""
+    carry = ""
+    with open(file_path, "r", encoding="utf-8") as f:
+        while True:
+            block = f.read(window_chars)
+            if not block:
+                break
+            text = carry + block
+            cut = text.rfind("\n\n")
+            if cut <= 0:
+                cut = text.rfind("\n")
+            if cut <= 0:
+                if len(text) < 2 * window_chars:
+                    carry = text
+                    continue
+                cut = len(text)  # no line breaks at all, cut anywhere
+            yield text[:cut]
+            carry = text[cut:]
+    if carry.strip():
+        yield carry
 
-#     chunks_with_ids = calculate_chunk_ids(chunks)
-#     existing_items = db.get(include=[])
-#     existing_ids = set(existing_items["ids"])
-#     print(f"Number of existing documents in DB: {len(existing_ids)}")
 
-#     new_chunks = [chunk for chunk in chunks_with_ids if chunk.metadata["id"] not in existing_ids]
+def iter_chunks(file_path, window_chars=READ_WINDOW_CHARS):
+    """Split a text file window by window without reading it into memory whole."""
+    splitter = get_text_splitter()
+    for window in iter_windows(file_path, window_chars):
+        yield from splitter.split_documents([Document(page_content=window, metadata={"source": file_path})])
 
-#     if new_chunks:
-#         print(f"👉 Adding new documents: {len(new_chunks)}")
-#         new_chunk_ids = [chunk.metadata["id"] for chunk in new_chunks]
-#         db.add_documents(new_chunks, ids=new_chunk_ids)
-#         db.persist()
-#     else:
-#         print("✅ No new documents to add")
 
-def add_to_chroma(chunks: List[Document], batch_size=100):
-    db = Chroma(
-        persist_directory=CHROMA_PATH, embedding_function=get_embedding_function()
-    )
+def batched(iterable, size):
+    batch = []
+    for item in iterable:
+        batch.append(item)
+        if len(batch) == size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def index_chunks(chunks, db, lexical=None, batch_size=EMBED_BATCH_SIZE):
+    """Embed and upsert a stream of chunks with IDs; returns the number added.
+
+    The calling thread embeds batch N while a writer thread upserts batch
+    N-1, with at most one batch waiting in between, so memory is bounded by
+    a few batches however long the stream is. Chunks already in the store
+    are skipped.
+    """
+    pending = queue.Queue(maxsize=1)
+    errors = []
+
+    def write():
+        while True:
+            item = pending.get()
+            if item is None:
+                return
+            if errors:
+                continue
+            batch, vectors = item
+            try:
+                db._collection.upsert(
+                    ids=[chunk.metadata["id"] for chunk in batch],
+                    embeddings=vectors,
+                    documents=[chunk.page_content for chunk in batch],
+                    metadatas=[chunk.metadata for chunk in batch],
+                )
+                if lexical is not None:
+                    for chunk in batch:
+                        lexical.add(chunk.metadata["id"], chunk.page_content)
+            except Exception as e:
+                errors.append(e)
+
+    writer = threading.Thread(target=write, name="chroma-writer", daemon=True)
+    writer.start()
+    added = skipped = 0
+    start = time.perf_counter()
+    try:
+        for batch in batched(chunks, batch_size):
+            # Only look up the IDs we are about to add instead of pulling every ID in the store
+            existing_ids = get_existing_ids(db, [chunk.metadata["id"] for chunk in batch])
+            new_chunks = [chunk for chunk in batch if chunk.metadata["id"] not in existing_ids]
+            skipped += len(batch) - len(new_chunks)
+            if not new_chunks:
+                continue
+            vectors = db.embeddings.embed_documents([chunk.page_content for chunk in new_chunks])
+            if errors:
+                break
+            pending.put((new_chunks, vectors))
+            added += len(new_chunks)
+    finally:
+        pending.put(None)
+        writer.join()
+    if errors:
+        raise errors[0]
 
-    chunks_with_ids = calculate_chunk_ids(chunks)
-    existing_items = db.get(include=[])
-    existing_ids = set(existing_items["ids"])
-    print(f"Number of existing documents in DB: {len(existing_ids)}")
-
-    new_chunks = [chunk for chunk in chunks_with_ids if chunk.metadata["id"] not in existing_ids]
-
-    if new_chunks:
-        print(f"👉 Adding new documents: {len(new_chunks)}")
-        for i in range(0, len(new_chunks), batch_size):
-            batch = new_chunks[i:i + batch_size]
-            new_chunk_ids = [chunk.metadata["id"] for chunk in batch]
-            db.add_documents(batch, ids=new_chunk_ids)
-            print(f"✅ Added batch {i//batch_size + 1}")
-        #db.persist()
+    elapsed = time.perf_counter() - start
+    if added:
+        print(f"✅ Added {added} chunks in {elapsed:.1f}s ({added / elapsed:.1f} chunks/s), "
+              f"{skipped} already in DB")
     else:
         print("✅ No new documents to add")
+    return added
 
 
-def calculate_chunk_ids(chunks):
-    last_page_id = None
-    current_chunk_index = 0
+def get_existing_ids(db, ids, batch_size=1000):
+    existing_ids = set()
+    for i in range(0, len(ids), batch_size):
+        existing_ids.update(db.get(ids=ids[i:i + batch_size], include=[])["ids"])
+    return existing_ids
 
-    for chunk in chunks:
-        source = chunk.metadata.get("source", "unknown")
-        page = chunk.metadata.get("page", 0)
-        current_page_id = f"{source}:{page}"
 
-        if current_page_id == last_page_id:
-            current_chunk_index += 1
-        else:
-            current_chunk_index = 0
+def index_config():
+    """Everything that must match for two builds to produce compatible vectors and chunks."""
+    return {
+        "embedding_model": EMBEDDING_MODEL,
+        "embedding_backend": get_backend(),
+        "query_prefix": QUERY_PREFIX,
+        "passage_prefix": PASSAGE_PREFIX,
+        "chunk_size": CHUNK_SIZE,
+        "chunk_overlap": CHUNK_OVERLAP,
+    }
 
-        chunk_id = f"{current_page_id}:{current_chunk_index}"
-        last_page_id = current_page_id
-        chunk.metadata["id"] = chunk_id
 
-    return chunks
+def open_index(root=CHROMA_PATH, rebuild=False):
+    """Return (path, building): the active index to update in place, or a new version to build.
+
+    A new version is started when rebuild is set or nothing is active yet.
+    Raises ValueError if the active version was built with a different
+    model or chunking, since adding to it would mix incompatible vectors.
+    """
+    path = None if rebuild else current_path(root)
+    if path is None:
+        return create_version(root, index_config()), True
+    manifest = read_index_manifest(path)
+    if manifest is not None and manifest.get("config") != index_config():
+        raise ValueError(f"Index {os.path.basename(path)} was built with {manifest.get('config')}, "
+                         f"not {index_config()}; rebuild it with 'python data_process.py --reset'")
+    return path, False
+
+
+def finish_build(root, path):
+    """Mark a new version complete and switch queries over to it."""
+    update_index_manifest(path, status="ready")
+    activate_version(root, os.path.basename(path))
+    print(f"🔀 Now serving index version {os.path.basename(path)}")
+
+
+def _manifest_lock(chroma_path):
+    os.makedirs(chroma_path, exist_ok=True)
+    return FileLock(os.path.join(chroma_path, MANIFEST_LOCK_NAME))
+
+
+def index_file(file_path, chroma_path=CHROMA_PATH, embedding_function=None):
+    """Bring a single text file up to date in the active index; returns the number of chunks added."""
+    with _manifest_lock(chroma_path):
+        path, building = open_index(chroma_path)
+        # Opened fresh under the lock: another process may have written since the last call
+        db = open_chroma(path, embedding_function or get_embedding_function(cache=True), reload=True)
+        manifest = load_manifest(path)
+        lexical = load_lexical_index(path, db)
+        snapshot = json.dumps(manifest, sort_keys=True)
+        added = sync_file(file_path, db, manifest, lexical)
+        changed = json.dumps(manifest, sort_keys=True) != snapshot
+        if changed:
+            save_lexical_index(lexical, path)
+        save_manifest(manifest, path, changed=changed)
+        if building:
+            finish_build(chroma_path, path)
+    return added
+
+
+def sync_directory(data_path=DATA_PATH, chroma_path=CHROMA_PATH, workers=1, batch_size=None, bucket=False,
+                   rebuild=False):
+    """Index new and changed files in data_path and drop chunks of removed files.
+
+    Unchanged files (same size and mtime, or same content hash) are not read
+    or split at all. With rebuild everything goes into a new index version
+    that is activated only when complete. With workers > 1 embedding is
+    spread over that many processes, each fed batch_size texts per step.
+    """
+    if workers > 1:
+        batch_size = batch_size or BULK_BATCH_SIZE
+        embedding_function = get_bulk_embedding_function(workers, batch_size, bucket)
+        # Hand the pool enough chunks per step to keep every worker busy
+        step = batch_size * workers
+    else:
+        embedding_function = get_embedding_function(cache=True)
+        step = batch_size or EMBED_BATCH_SIZE
+    try:
+        with _manifest_lock(chroma_path):
+            path, building = open_index(chroma_path, rebuild)
+            if building:
+                print(f"🏗️ Building index version {os.path.basename(path)}")
+            db = open_chroma(path, embedding_function, reload=True)
+            manifest = load_manifest(path)
+            lexical = load_lexical_index(path, db)
+            snapshot = json.dumps(manifest, sort_keys=True)
+            present = set()
+            added = 0
+            start = time.perf_counter()
+            for file_path in iter_text_files(data_path):
+                present.add(file_path)
+                added += sync_file(file_path, db, manifest, lexical, batch_size=step)
+            elapsed = time.perf_counter() - start
+            if added:
+                print(f"⚡ Indexed {added} chunks in {elapsed:.1f}s ({added / elapsed:.1f} chunks/s)")
+
+            for file_path in list(manifest):
+                if file_path not in present and os.path.dirname(file_path) == data_path:
+                    print(f"🗑️ Removing chunks of deleted file: {file_path}")
+                    delete_chunks(db, manifest.pop(file_path)["chunk_ids"], lexical)
+            changed = json.dumps(manifest, sort_keys=True) != snapshot
+            if changed:
+                save_lexical_index(lexical, path)
+            save_manifest(manifest, path, changed=changed)
+            if building:
+                finish_build(chroma_path, path)
+
+        stats = embedding_function.stats()
+        print(f"🧠 Embedding cache: {stats['hits']} hits, {stats['misses']} misses "
+              f"({stats['hit_rate']:.0%} hit rate), {stats['bytes'] / 1e6:.1f} MB stored")
+    finally:
+        # Stops the worker processes of a bulk build
+        embedding_function.close()
 
 
-def clear_database():
-    if os.path.exists(CHROMA_PATH):
-        shutil.rmtree(CHROMA_PATH)
+def sync_file(file_path, db, manifest, lexical=None, batch_size=EMBED_BATCH_SIZE):
+    """Re-index file_path if it changed since the manifest entry; returns chunks added."""
+    stat = os.stat(file_path)
+    entry = manifest.get(file_path)
+    if entry and entry["size"] == stat.st_size and entry["mtime"] == stat.st_mtime:
+        return 0
+
+    file_hash = file_sha256(file_path)
+    if entry and entry["sha256"] == file_hash:
+        entry["mtime"] = stat.st_mtime  # touched but not edited
+        return 0
+
+    print(f"📖 Loading file: {os.path.basename(file_path)}")
+    if entry:
+        old_ids = set(entry["chunk_ids"])
+    else:
+        # Chunks indexed before the manifest existed (or under the old page:index IDs)
+        old_ids = set(db.get(where={"source": file_path}, include=[])["ids"])
+
+    new_ids = []
+
+    def record_ids(chunks):
+        for chunk in chunks:
+            new_ids.append(chunk.metadata["id"])
+            yield chunk
+
+    added = index_chunks(record_ids(iter_chunk_ids(iter_chunks(file_path))), db, lexical, batch_size)
+    # Stale chunks go only after their replacements are in, so the file never disappears mid-sync
+    delete_chunks(db, sorted(old_ids - set(new_ids)), lexical)
+
+    manifest[file_path] = {
+        "sha256": file_hash,
+        "size": stat.st_size,
+        "mtime": stat.st_mtime,
+        "chunk_ids": new_ids,
+    }
+    return added
+
+
+def delete_chunks(db, ids, lexical=None, batch_size=1000):
+    if ids:
+        print(f"🗑️ Deleting stale chunks: {len(ids)}")
+    for i in range(0, len(ids), batch_size):
+        db.delete(ids=ids[i:i + batch_size])
+    if lexical is not None:
+        for chunk_id in ids:
+            lexical.remove(chunk_id)
+
+
+def load_manifest(chroma_path=CHROMA_PATH):
+    manifest_path = os.path.join(chroma_path, MANIFEST_NAME)
+    if not os.path.exists(manifest_path):
+        return {}
+    with open(manifest_path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def save_manifest(manifest, chroma_path=CHROMA_PATH, changed=True):
+    os.makedirs(chroma_path, exist_ok=True)
+    manifest_path = os.path.join(chroma_path, MANIFEST_NAME)
+    with open(f"{manifest_path}.tmp", "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=1)
+    os.replace(f"{manifest_path}.tmp", manifest_path)
+    if changed:
+        if read_index_manifest(chroma_path) is not None:
+            # Keep the version's record of its document set current
+            update_index_manifest(
+                chroma_path,
+                documents={source: {"sha256": entry["sha256"], "chunks": len(entry["chunk_ids"])}
+                           for source, entry in manifest.items()},
+                chunks=sum(len(entry["chunk_ids"]) for entry in manifest.values()),
+            )
+        # Invalidate answer caches built on the previous contents
+        bump_index_version(chroma_path)
+
+
+def iter_chunk_ids(chunks):
+    """Give each chunk a "source:content-hash" ID as it streams past.
+
+    IDs depend on the chunk text, not its position, so an edit only changes the
+    IDs of the chunks it touches. Repeated identical text within a source gets
+    an occurrence suffix.
+    """
+    seen = {}
+
+    for chunk in chunks:
+        source = chunk.metadata.get("source", "unknown")
+        content_hash = hashlib.sha256(chunk.page_content.encode("utf-8")).hexdigest()[:16]
+        chunk_id = f"{source}:{content_hash}"
+
+        occurrence = seen.get(chunk_id, 0)
+        seen[chunk_id] = occurrence + 1
+        if occurrence:
+            chunk_id = f"{chunk_id}:{occurrence}"
+        chunk.metadata["id"] = chunk_id
+        yield chunk
 
 
 if __name__ == "__main__":
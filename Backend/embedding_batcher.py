@@ -0,0 +1,78 @@
+import threading
+import time
+from concurrent.futures import Future
+from langchain_core.embeddings import Embeddings
+from get_embedding_function import embed_queries
+
+# Collect concurrent queries for up to this long before encoding them together
+BATCH_WAIT_MS = 5
+MAX_BATCH = 64
+
+
+class EmbeddingBatcher(Embeddings):
+    """Micro-batches concurrent embed_query calls into one encoder call.
+
+    Each caller enqueues its text and blocks on a future. A background thread
+    takes the first waiting query, gathers whatever else arrives within
+    max_wait_ms (up to max_batch texts) and encodes them in a single forward
+    pass. embed_documents is passed straight through.
+    """
+
+    def __init__(self, base, max_wait_ms=BATCH_WAIT_MS, max_batch=MAX_BATCH):
+        self.base = base
+        self.max_wait = max_wait_ms / 1000
+        self.max_batch = max_batch
+        self.batches = 0
+        self.queries = 0
+        self._pending = []
+        self._cond = threading.Condition()
+        self._thread = threading.Thread(target=self._run, name="embedding-batcher", daemon=True)
+        self._thread.start()
+
+    def embed_query(self, text):
+        future = Future()
+        with self._cond:
+            self._pending.append((text, future))
+            self._cond.notify()
+        return future.result()
+
+    def embed_documents(self, texts):
+        return self.base.embed_documents(texts)
+
+    def embed_queries(self, texts):
+        return embed_queries(self.base, texts)
+
+    def _take_batch(self):
+        with self._cond:
+            while not self._pending:
+                self._cond.wait()
+            deadline = time.monotonic() + self.max_wait
+            while len(self._pending) < self.max_batch:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                self._cond.wait(remaining)
+            batch = self._pending[:self.max_batch]
+            del self._pending[:self.max_batch]
+            return batch
+
+    def _run(self):
+        while True:
+            batch = self._take_batch()
+            try:
+                vectors = embed_queries(self.base, [text for text, _future in batch])
+            except Exception as e:
+                for _text, future in batch:
+                    future.set_exception(e)
+                continue
+            self.batches += 1
+            self.queries += len(batch)
+            for (_text, future), vector in zip(batch, vectors):
+                future.set_result(vector)
+
+    def stats(self):
+        return {
+            "batches": self.batches,
+            "queries": self.queries,
+            "avg_batch_size": round(self.queries / self.batches, 2) if self.batches else None,
+        }
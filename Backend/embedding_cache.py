@@ -0,0 +1,143 @@
+import hashlib
+import json
+import logging
+import os
+import re
+import threading
+import numpy as np
+from filelock import FileLock
+from langchain_core.embeddings import Embeddings
+from get_embedding_function import embed_queries
+
+logger = logging.getLogger(__name__)
+
+EMBEDDING_CACHE_DIR = os.getenv("EMBEDDING_CACHE_DIR", "embedding_cache")
+
+
+def text_hash(text):
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+class CachedEmbeddings(Embeddings):
+    """Disk-backed cache in front of an embedding model.
+
+    Passage vectors are appended to a float32 matrix (vectors.f32, read through
+    a memory map) and keys.txt holds one text hash per row. Each model gets its
+    own directory, so the cache is keyed by model name and text hash. Queries
+    are passed straight through to the model. Appends hold a file lock, so the
+    ingestion worker and the data_process CLI can share one cache directory.
+    """
+
+    def __init__(self, base, model_name, cache_dir=EMBEDDING_CACHE_DIR):
+        self.base = base
+        self.model_name = model_name
+        self.cache_dir = os.path.join(cache_dir, re.sub(r"[^A-Za-z0-9_.-]+", "_", model_name))
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._keys_path = os.path.join(self.cache_dir, "keys.txt")
+        self._vectors_path = os.path.join(self.cache_dir, "vectors.f32")
+        self._meta_path = os.path.join(self.cache_dir, "meta.json")
+        self._file_lock = FileLock(os.path.join(self.cache_dir, "cache.lock"))
+        self._index = {}
+        self._rows = 0
+        self._sizes = None  # (keys.txt, vectors.f32) sizes when last loaded
+        self._dim = None
+        self._matrix = None
+        os.makedirs(self.cache_dir, exist_ok=True)
+        with self._file_lock:
+            self._load()
+
+    def _file_sizes(self):
+        return os.path.getsize(self._keys_path), os.path.getsize(self._vectors_path)
+
+    def _load(self):
+        """Read the cache files; call with the file lock held."""
+        if not os.path.exists(self._meta_path):
+            return
+        self._matrix = None  # release the mapping before the files are truncated
+        with open(self._meta_path, "r", encoding="utf-8") as f:
+            self._dim = json.load(f)["dim"]
+        with open(self._keys_path, "r", encoding="ascii") as f:
+            keys = f.read().split()
+        row_bytes = 4 * self._dim
+        rows = min(len(keys), os.path.getsize(self._vectors_path) // row_bytes)
+        # A torn write leaves vectors without keys or a partial last row; cut both files back to the rows they share
+        if os.path.getsize(self._vectors_path) != rows * row_bytes:
+            os.truncate(self._vectors_path, rows * row_bytes)
+        if len(keys) != rows:
+            with open(self._keys_path, "w", encoding="ascii") as f:
+                f.write("".join(f"{key}\n" for key in keys[:rows]))
+        self._index = {}
+        for row, key in enumerate(keys[:rows]):
+            self._index.setdefault(key, row)
+        self._rows = rows
+        self._sizes = self._file_sizes()
+        self._remap()
+
+    def _remap(self):
+        self._matrix = (np.memmap(self._vectors_path, dtype=np.float32, mode="r", shape=(self._rows, self._dim))
+                        if self._rows else None)
+
+    def _append(self, keys, vectors):
+        vectors = np.asarray(vectors, dtype=np.float32)
+        with self._file_lock:
+            if self._dim is None or self._file_sizes() != self._sizes:
+                self._load()  # another process created or extended the cache
+            if self._dim is None:
+                self._dim = vectors.shape[1]
+                with open(self._meta_path, "w", encoding="utf-8") as f:
+                    json.dump({"model": self.model_name, "dim": self._dim}, f)
+                for path in (self._vectors_path, self._keys_path):
+                    open(path, "wb").close()
+            new = [i for i, key in enumerate(keys) if key not in self._index]
+            if new:
+                with open(self._vectors_path, "ab") as f:
+                    f.write(vectors[new].tobytes())
+                with open(self._keys_path, "a", encoding="ascii") as f:
+                    f.write("".join(f"{keys[i]}\n" for i in new))
+                for i in new:
+                    self._index[keys[i]] = self._rows
+                    self._rows += 1
+            self._sizes = self._file_sizes()
+        self._remap()
+
+    def embed_documents(self, texts):
+        if not texts:
+            return []
+        keys = [text_hash(text) for text in texts]
+        with self._lock:
+            missing = {}
+            for key, text in zip(keys, texts):
+                if key not in self._index and key not in missing:
+                    missing[key] = text
+            self.misses += len(missing)
+            self.hits += len(keys) - len(missing)
+            if missing:
+                vectors = self.base.embed_documents(list(missing.values()))
+                self._append(list(missing), vectors)
+            rows = [self._index[key] for key in keys]
+            return self._matrix[rows].tolist()
+
+    def embed_query(self, text):
+        return self.base.embed_query(text)
+
+    def embed_queries(self, texts):
+        return embed_queries(self.base, texts)
+
+    def close(self):
+        """Shut down the model behind the cache (the worker pool of a bulk build)."""
+        if hasattr(self.base, "close"):
+            self.base.close()
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "model": self.model_name,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0,
+                "entries": len(self._index),
+                "bytes": self._rows * 4 * (self._dim or 0),
+            }
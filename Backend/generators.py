@@ -0,0 +1,219 @@
+import hashlib
+import logging
+import os
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+# Configuration (backend chosen with the LLM_BACKEND environment variable)
+DEFAULT_BACKEND = "groq"  # groq | llamacpp | hf | stub
+GROQ_MODEL = "llama3-70b-8192"
+LLAMA_MODEL_PATH = os.getenv("LLAMA_MODEL_PATH", "models/qwen2.5-1.5b-instruct-q4_k_m.gguf")
+HF_MODEL = os.getenv("HF_MODEL", "Qwen/Qwen2.5-0.5B-Instruct")
+MAX_NEW_TOKENS = int(os.getenv("MAX_NEW_TOKENS", "512"))
+
+
+class Generator:
+    """Text generation backend used by the RAG engine.
+
+    Subclasses implement _generate(prompt) and _stream(prompt); this class
+    times every call and keeps latency and tokens/second totals.
+    """
+
+    name = "base"
+
+    def __init__(self):
+        self.requests = 0
+        self.tokens = 0
+        self.seconds = 0.0
+        self._lock = threading.Lock()
+
+    def generate(self, prompt):
+        start = time.perf_counter()
+        text, tokens = self._generate(prompt)
+        self._record(tokens, time.perf_counter() - start)
+        return text
+
+    def stream(self, prompt):
+        start = time.perf_counter()
+        tokens = 0
+        try:
+            for fragment in self._stream(prompt):
+                tokens += 1
+                yield fragment
+        finally:
+            self._record(tokens, time.perf_counter() - start)
+
+    def _generate(self, prompt):
+        """Return (text, token_count)."""
+        raise NotImplementedError
+
+    def _stream(self, prompt):
+        text, _tokens = self._generate(prompt)
+        yield text
+
+    def _record(self, tokens, seconds):
+        with self._lock:
+            self.requests += 1
+            self.tokens += tokens
+            self.seconds += seconds
+        rate = tokens / seconds if seconds else 0.0
+        logger.debug(f"{self.name}: {tokens} tokens in {seconds:.2f}s ({rate:.1f} tokens/s)")
+
+    def stats(self):
+        with self._lock:
+            return {
+                "backend": self.name,
+                "requests": self.requests,
+                "tokens": self.tokens,
+                "avg_latency_seconds": round(self.seconds / self.requests, 3) if self.requests else None,
+                "tokens_per_second": round(self.tokens / self.seconds, 1) if self.seconds else None,
+            }
+
+
+class GroqGenerator(Generator):
+    """Remote generation through the Groq API."""
+
+    name = "groq"
+
+    def __init__(self, model_name=GROQ_MODEL):
+        super().__init__()
+        from langchain_groq import ChatGroq
+        self.llm = ChatGroq(model_name=model_name, temperature=0, streaming=False)
+
+    def _generate(self, prompt):
+        response = self.llm.invoke(prompt)
+        text = response.content if hasattr(response, 'content') else str(response)
+        usage = getattr(response, "usage_metadata", None) or {}
+        return text, usage.get("output_tokens") or len(text.split())
+
+    def _stream(self, prompt):
+        for chunk in self.llm.stream(prompt):
+            text = chunk.content if hasattr(chunk, 'content') else str(chunk)
+            if text:
+                yield text
+
+
+def chat_messages(prompt):
+    """The RAG prompt as a single user turn for instruct models' chat templates."""
+    return [{"role": "user", "content": prompt}]
+
+
+class LlamaCppGenerator(Generator):
+    """In-process CPU generation with a quantized GGUF model via llama-cpp-python.
+
+    A llama.cpp context is not thread-safe, so calls from concurrent
+    requests are serialized; the model already uses every core.
+    """
+
+    name = "llamacpp"
+
+    def __init__(self, model_path=LLAMA_MODEL_PATH, n_ctx=4096):
+        super().__init__()
+        try:
+            from llama_cpp import Llama
+        except ImportError as e:
+            raise ImportError("LLM_BACKEND=llamacpp requires 'pip install llama-cpp-python'") from e
+        self.llm = Llama(model_path=model_path, n_ctx=n_ctx, n_threads=os.cpu_count(), verbose=False)
+        self._llm_lock = threading.Lock()
+
+    def _generate(self, prompt):
+        with self._llm_lock:
+            result = self.llm.create_chat_completion(chat_messages(prompt), max_tokens=MAX_NEW_TOKENS, temperature=0)
+        return result["choices"][0]["message"]["content"], result["usage"]["completion_tokens"]
+
+    def _stream(self, prompt):
+        with self._llm_lock:
+            for part in self.llm.create_chat_completion(chat_messages(prompt), max_tokens=MAX_NEW_TOKENS,
+                                                        temperature=0, stream=True):
+                text = part["choices"][0]["delta"].get("content")
+                if text:
+                    yield text
+
+
+class HFPipelineGenerator(Generator):
+    """In-process CPU generation with a small HuggingFace causal LM."""
+
+    name = "hf"
+
+    def __init__(self, model_name=HF_MODEL):
+        super().__init__()
+        from transformers import AutoModelForCausalLM, AutoTokenizer
+        self.tokenizer = AutoTokenizer.from_pretrained(model_name)
+        self.model = AutoModelForCausalLM.from_pretrained(model_name)
+        self.model.eval()
+
+    def _inputs(self, prompt):
+        if not self.tokenizer.chat_template:
+            return self.tokenizer(prompt, return_tensors="pt")
+        text = self.tokenizer.apply_chat_template(chat_messages(prompt), tokenize=False, add_generation_prompt=True)
+        # The template already contains the special tokens
+        return self.tokenizer(text, return_tensors="pt", add_special_tokens=False)
+
+    def _generate(self, prompt):
+        inputs = self._inputs(prompt)
+        output = self.model.generate(**inputs, max_new_tokens=MAX_NEW_TOKENS, do_sample=False)
+        new_tokens = output[0][inputs["input_ids"].shape[1]:]
+        return self.tokenizer.decode(new_tokens, skip_special_tokens=True), len(new_tokens)
+
+    def _stream(self, prompt):
+        from transformers import TextIteratorStreamer
+        streamer = TextIteratorStreamer(self.tokenizer, skip_prompt=True, skip_special_tokens=True)
+        kwargs = dict(**self._inputs(prompt), max_new_tokens=MAX_NEW_TOKENS, do_sample=False, streamer=streamer)
+        thread = threading.Thread(target=self.model.generate, kwargs=kwargs, daemon=True)
+        thread.start()
+        for text in streamer:
+            if text:
+                yield text
+        thread.join()
+
+
+class StubGenerator(Generator):
+    """Deterministic offline backend for tests and benchmarks.
+
+    The answer depends only on the prompt; latency seconds are spread evenly
+    over the emitted tokens to imitate a real model.
+    """
+
+    name = "stub"
+
+    def __init__(self, latency=None, tokens=20):
+        super().__init__()
+        self.latency = float(os.getenv("STUB_LLM_LATENCY", "0")) if latency is None else latency
+        self.token_count = tokens
+
+    def _tokens(self, prompt):
+        digest = hashlib.sha256(prompt.encode("utf-8")).hexdigest()
+        return ["Stub", "answer"] + [digest[(4 * i) % 60:(4 * i) % 60 + 4] for i in range(self.token_count - 2)]
+
+    def _generate(self, prompt):
+        tokens = self._tokens(prompt)
+        if self.latency:
+            time.sleep(self.latency)
+        return " ".join(tokens), len(tokens)
+
+    def _stream(self, prompt):
+        tokens = self._tokens(prompt)
+        for i, token in enumerate(tokens):
+            if self.latency:
+                time.sleep(self.latency / len(tokens))
+            yield token if i == 0 else f" {token}"
+
+
+GENERATORS = {
+    "groq": GroqGenerator,
+    "llamacpp": LlamaCppGenerator,
+    "hf": HFPipelineGenerator,
+    "stub": StubGenerator,
+}
+
+
+def get_generator(name=None, **kwargs):
+    """Build the generator backend registered under name (default: $LLM_BACKEND)."""
+    name = name or os.getenv("LLM_BACKEND", DEFAULT_BACKEND)
+    try:
+        backend = GENERATORS[name]
+    except KeyError:
+        raise ValueError(f"Unknown LLM backend '{name}', expected one of {sorted(GENERATORS)}")
+    return backend(**kwargs)
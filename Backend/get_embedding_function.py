@@ -1,8 +1,128 @@
 #from langchain_community.embeddings import HuggingFaceEmbeddings
+import hashlib
+import math
+import os
+import re
+from langchain_core.embeddings import Embeddings
 from langchain_huggingface import HuggingFaceEmbeddings
 
-def get_embedding_function():
-    embeddings = HuggingFaceEmbeddings(
-        model_name="intfloat/e5-small-v2"
-    )
+EMBEDDING_MODEL = "intfloat/e5-small-v2"
+# torch | onnx | int8 | hash (chosen with the EMBEDDING_BACKEND environment variable)
+DEFAULT_BACKEND = "torch"
+MODEL_BACKENDS = ("torch", "onnx", "int8")
+BACKENDS = MODEL_BACKENDS + ("hash",)
+# hash vectors carry no meaning; they are only accepted when tests or benchmarks set this
+ALLOW_FAKE_EMBEDDINGS = "ALLOW_FAKE_EMBEDDINGS"
+HASH_DIM = 384
+# e5 models are trained with these prefixes and lose accuracy without them
+QUERY_PREFIX = "query: "
+PASSAGE_PREFIX = "passage: "
+
+
+class E5Embeddings(Embeddings):
+    """Adds the e5 "query: " / "passage: " prefixes in front of a raw encoder."""
+
+    def __init__(self, base):
+        self.base = base
+
+    def embed_documents(self, texts):
+        return self.base.embed_documents([PASSAGE_PREFIX + text for text in texts])
+
+    def embed_query(self, text):
+        return self.base.embed_documents([QUERY_PREFIX + text])[0]
+
+    def embed_queries(self, texts):
+        """Encode several questions in one call."""
+        return self.base.embed_documents([QUERY_PREFIX + text for text in texts])
+
+    def close(self):
+        if hasattr(self.base, "close"):
+            self.base.close()
+
+
+class HashEmbeddings(Embeddings):
+    """Deterministic offline stand-in for the model, for tests and benchmarks.
+
+    Words are hashed into a fixed number of signed buckets and the vector is
+    L2-normalised, so texts sharing words are close. Needs no model download.
+    Selected with EMBEDDING_BACKEND=hash, which also requires ALLOW_FAKE_EMBEDDINGS=1.
+    """
+
+    def __init__(self, dim=HASH_DIM):
+        self.dim = dim
+
+    def _embed(self, text):
+        vector = [0.0] * self.dim
+        for word in re.findall(r"\w+", text.lower()):
+            digest = hashlib.blake2b(word.encode("utf-8"), digest_size=8).digest()
+            bucket = int.from_bytes(digest[:4], "little") % self.dim
+            vector[bucket] += 1.0 if digest[4] & 1 else -1.0
+        norm = math.sqrt(sum(v * v for v in vector)) or 1.0
+        return [v / norm for v in vector]
+
+    def embed_documents(self, texts):
+        return [self._embed(text) for text in texts]
+
+    def embed_query(self, text):
+        return self._embed(text)
+
+
+def embed_queries(embedding_function, texts):
+    """Encode several questions in one call, with the query prefix if the model uses one."""
+    if hasattr(embedding_function, "embed_queries"):
+        return embedding_function.embed_queries(list(texts))
+    return embedding_function.embed_documents(list(texts))
+
+
+def get_backend(backend=None):
+    backend = backend or os.getenv("EMBEDDING_BACKEND", DEFAULT_BACKEND)
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown embedding backend '{backend}', expected one of {list(BACKENDS)}")
+    if backend == "hash" and os.getenv(ALLOW_FAKE_EMBEDDINGS) != "1":
+        raise ValueError(f"The hash embedding backend is for tests and benchmarks only; "
+                         f"set {ALLOW_FAKE_EMBEDDINGS}=1 to use it")
+    return backend
+
+
+def load_encoder(backend=None):
+    """The bare sentence encoder for a backend, without e5 prefixes.
+
+    torch is the full-precision PyTorch model, onnx runs the same weights
+    through ONNX Runtime, and int8 is the PyTorch model with its linear
+    layers dynamically quantized to int8. hash is HashEmbeddings.
+    """
+    backend = get_backend(backend)
+    if backend == "hash":
+        return HashEmbeddings()
+    model_kwargs = {"device": "cpu"}
+    if backend == "onnx":
+        model_kwargs["backend"] = "onnx"
+    try:
+        embeddings = HuggingFaceEmbeddings(
+            model_name=EMBEDDING_MODEL,
+            model_kwargs=model_kwargs,
+            encode_kwargs={"normalize_embeddings": True},
+        )
+    except ImportError as e:
+        if backend != "onnx":
+            raise
+        raise ImportError("EMBEDDING_BACKEND=onnx requires 'pip install optimum[onnxruntime]'") from e
+    if backend == "int8":
+        import torch
+        torch.quantization.quantize_dynamic(embeddings._client, {torch.nn.Linear},
+                                            dtype=torch.qint8, inplace=True)
+    return embeddings
+
+
+def cache_name(backend=None):
+    """Embedding cache key: vectors differ between backends and prefix schemes."""
+    return f"{EMBEDDING_MODEL}-{get_backend(backend)}-e5prefix"
+
+
+def get_embedding_function(cache=False, backend=None):
+    embeddings = E5Embeddings(load_encoder(backend))
+    if cache:
+        # Reuse vectors of chunk text that was already embedded by an earlier build
+        from embedding_cache import CachedEmbeddings
+        return CachedEmbeddings(embeddings, cache_name(backend))
     return embeddings
@@ -0,0 +1,220 @@
+"""Versioned index directories.
+
+Every full build goes into its own directory under <root>/versions/, and a
+CURRENT file in the root names the version queries are served from. A build
+is switched to with one atomic rename once it is complete, so queries never
+see a half-built store, and the previous version stays on disk for rollback:
+
+    python index_store.py list
+    python index_store.py activate v20250101-120000
+    python index_store.py rollback
+    python index_store.py prune --keep 3
+
+A root that holds a Chroma store directly (no CURRENT file yet) is served as
+is until the first versioned build is activated.
+"""
+import argparse
+import json
+import os
+import shutil
+import time
+
+# Root of all index versions, shared by the build scripts and the query servers
+INDEX_ROOT = os.getenv("INDEX_ROOT", "chroma")
+VERSIONS_DIR = "versions"
+CURRENT_NAME = "CURRENT"
+HISTORY_NAME = "HISTORY"
+# Model, chunking and document set of a version, stored inside it
+INDEX_MANIFEST_NAME = "index.json"
+# Stamp file inside a Chroma directory, rewritten whenever its chunks change
+INDEX_VERSION_NAME = "index_version"
+
+
+def _write_atomic(path, text):
+    with open(f"{path}.tmp", "w", encoding="utf-8") as f:
+        f.write(text)
+    os.replace(f"{path}.tmp", path)
+
+
+def read_index_version(chroma_path):
+    """Return the current version stamp of an index, or None if it was never stamped."""
+    try:
+        with open(os.path.join(chroma_path, INDEX_VERSION_NAME), "r", encoding="utf-8") as f:
+            return f.read().strip() or None
+    except OSError:
+        return None
+
+
+def open_chroma(chroma_path, embedding_function, reload=False):
+    """Open the Chroma store in chroma_path.
+
+    chromadb keeps one client System per directory and process, with the HNSW
+    index in memory, and hands it back on every open. With reload that System
+    is dropped first, so chunks another process wrote since are read from disk;
+    handles opened earlier keep working on the old one.
+    """
+    from chromadb.api.shared_system_client import SharedSystemClient
+    from langchain_chroma import Chroma
+    if reload:
+        SharedSystemClient._identifier_to_system.pop(chroma_path, None)
+    return Chroma(persist_directory=chroma_path, embedding_function=embedding_function)
+
+
+def bump_index_version(chroma_path):
+    """Mark an index as changed so caches built on top of it are invalidated."""
+    os.makedirs(chroma_path, exist_ok=True)
+    version = str(time.time_ns())
+    _write_atomic(os.path.join(chroma_path, INDEX_VERSION_NAME), version)
+    return version
+
+
+def version_path(root, version):
+    return os.path.join(root, VERSIONS_DIR, version)
+
+
+def read_index_manifest(path):
+    """The manifest of an index version directory, or None for an unversioned store."""
+    try:
+        with open(os.path.join(path, INDEX_MANIFEST_NAME), "r", encoding="utf-8") as f:
+            return json.load(f)
+    except OSError:
+        return None
+
+
+def update_index_manifest(path, **fields):
+    manifest = read_index_manifest(path) or {}
+    manifest.update(fields)
+    _write_atomic(os.path.join(path, INDEX_MANIFEST_NAME), json.dumps(manifest, indent=1))
+    return manifest
+
+
+def current_version(root=INDEX_ROOT):
+    try:
+        with open(os.path.join(root, CURRENT_NAME), "r", encoding="utf-8") as f:
+            return f.read().strip() or None
+    except OSError:
+        return None
+
+
+def current_path(root=INDEX_ROOT):
+    """Directory of the active index: the CURRENT version, else a legacy store in root, else None."""
+    version = current_version(root)
+    if version:
+        return version_path(root, version)
+    if os.path.exists(os.path.join(root, "chroma.sqlite3")):
+        return root
+    return None
+
+
+def create_version(root, config):
+    """Create an empty version directory for a new build and return its path."""
+    version = time.strftime("v%Y%m%d-%H%M%S")
+    path, n = version_path(root, version), 1
+    while os.path.exists(path):
+        n += 1
+        path = version_path(root, f"{version}-{n}")
+    os.makedirs(path)
+    update_index_manifest(path, version=os.path.basename(path), status="building",
+                          created=time.strftime("%Y-%m-%dT%H:%M:%S"), config=config,
+                          documents={}, chunks=0)
+    return path
+
+
+def _history(root):
+    try:
+        with open(os.path.join(root, HISTORY_NAME), "r", encoding="utf-8") as f:
+            return f.read().split()
+    except OSError:
+        return []
+
+
+def _point_to(root, version, history):
+    _write_atomic(os.path.join(root, HISTORY_NAME), "".join(f"{v}\n" for v in history))
+    _write_atomic(os.path.join(root, CURRENT_NAME), version)
+
+
+def activate_version(root, version):
+    """Serve queries from version; raises ValueError if it is missing or unfinished."""
+    manifest = read_index_manifest(version_path(root, version))
+    if manifest is None:
+        raise ValueError(f"No index version '{version}' in {root}")
+    if manifest.get("status") != "ready":
+        raise ValueError(f"Index version '{version}' is not ready (status: {manifest.get('status')})")
+    history = [v for v in _history(root) if v != version] + [version]
+    _point_to(root, version, history)
+    return version
+
+
+def rollback(root=INDEX_ROOT):
+    """Switch back to the version that was active before the current one."""
+    history = _history(root)
+    current = current_version(root)
+    if current in history:
+        history.remove(current)
+    while history:
+        previous = history[-1]
+        manifest = read_index_manifest(version_path(root, previous))
+        if manifest and manifest.get("status") == "ready":
+            _point_to(root, previous, history)
+            return previous
+        history.pop()
+    raise ValueError("No earlier index version to roll back to")
+
+
+def list_versions(root=INDEX_ROOT):
+    versions_dir = os.path.join(root, VERSIONS_DIR)
+    if not os.path.isdir(versions_dir):
+        return []
+    current = current_version(root)
+    versions = []
+    for name in sorted(os.listdir(versions_dir)):
+        manifest = read_index_manifest(version_path(root, name))
+        if manifest is not None:
+            manifest["active"] = name == current
+            versions.append(manifest)
+    return versions
+
+
+def prune_versions(root=INDEX_ROOT, keep=3):
+    """Delete all but the newest keep versions, never touching the active or previous one."""
+    protected = set(_history(root)[-2:]) | {current_version(root)}
+    names = [manifest["version"] for manifest in list_versions(root)]
+    removed = [name for name in (names[:-keep] if keep else names) if name not in protected]
+    for name in removed:
+        shutil.rmtree(version_path(root, name), ignore_errors=True)
+    return removed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Manage versioned index directories.")
+    parser.add_argument("--root", default=INDEX_ROOT)
+    commands = parser.add_subparsers(dest="command", required=True)
+    commands.add_parser("list", help="Show all versions.")
+    activate = commands.add_parser("activate", help="Serve queries from a version.")
+    activate.add_argument("version")
+    commands.add_parser("rollback", help="Switch back to the previously active version.")
+    prune = commands.add_parser("prune", help="Delete old versions.")
+    prune.add_argument("--keep", type=int, default=3)
+    args = parser.parse_args()
+
+    try:
+        if args.command == "list":
+            for manifest in list_versions(args.root):
+                config = manifest.get("config", {})
+                print(f"{'*' if manifest['active'] else ' '} {manifest['version']:<20} {manifest['status']:<9} "
+                      f"{len(manifest.get('documents', {})):>5} docs {manifest.get('chunks', 0):>8} chunks  "
+                      f"{config.get('embedding_model')} ({config.get('embedding_backend')}), "
+                      f"chunks {config.get('chunk_size')}/{config.get('chunk_overlap')}")
+        elif args.command == "activate":
+            print(f"✅ Serving {activate_version(args.root, args.version)}")
+        elif args.command == "rollback":
+            print(f"↩️ Rolled back to {rollback(args.root)}")
+        elif args.command == "prune":
+            removed = prune_versions(args.root, args.keep)
+            print(f"🗑️ Removed {len(removed)} version(s): {', '.join(removed) or '-'}")
+    except ValueError as e:
+        raise SystemExit(f"❌ {e}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,153 @@
+import logging
+import os
+import queue
+import shutil
+import threading
+import time
+import uuid
+from admin_upload import process_pdf
+from data_process import index_file, DATA_PATH
+from get_embedding_function import get_embedding_function
+from rag_engine import CHROMA_PATH
+from telemetry import span
+
+logger = logging.getLogger(__name__)
+
+# Finished jobs stay queryable for this many seconds, and at most this many are kept
+JOB_TTL = float(os.getenv("INGEST_JOB_TTL", str(24 * 3600)))
+MAX_FINISHED_JOBS = int(os.getenv("INGEST_MAX_FINISHED_JOBS", "1000"))
+
+
+class IngestionJob:
+    """State of one uploaded PDF moving through extraction and indexing."""
+
+    def __init__(self, pdf_path, filename, cleanup_dir=None):
+        self.id = uuid.uuid4().hex
+        self.pdf_path = pdf_path
+        self.filename = filename
+        self.cleanup_dir = cleanup_dir
+        self.status = "queued"  # queued -> extracting -> indexing -> done | failed
+        self.pages_done = 0
+        self.page_count = None
+        self.output_file = None
+        self.chunks_added = None
+        self.error = None
+        self.created = time.time()
+        self.finished = None
+
+    def to_dict(self):
+        return {
+            "job_id": self.id,
+            "filename": self.filename,
+            "status": self.status,
+            "pages_done": self.pages_done,
+            "page_count": self.page_count,
+            "output_file": os.path.basename(self.output_file) if self.output_file else None,
+            "chunks_added": self.chunks_added,
+            "error": self.error,
+            "seconds": round((self.finished or time.time()) - self.created, 2),
+        }
+
+
+class IngestionWorker:
+    """Background thread that extracts uploaded PDFs and upserts only their chunks.
+
+    Jobs run one at a time in submission order; the embedder is created on
+    the first job and reused. Files are added to the active index version.
+    Finished jobs are forgotten after JOB_TTL seconds or beyond MAX_FINISHED_JOBS.
+    """
+
+    def __init__(self, output_folder=DATA_PATH, chroma_path=CHROMA_PATH):
+        self.output_folder = output_folder
+        self.chroma_path = chroma_path
+        self.jobs = {}
+        self._queue = queue.Queue()
+        self._embedding_function = None
+        self._thread = None
+        self._lock = threading.Lock()
+        os.makedirs(output_folder, exist_ok=True)
+
+    def submit(self, pdf_path, filename, cleanup_dir=None):
+        """Queue a PDF for ingestion and return its job.
+
+        cleanup_dir, if given, is removed once the job has finished with the PDF.
+        """
+        job = IngestionJob(pdf_path, filename, cleanup_dir)
+        with self._lock:
+            self._evict()
+            self.jobs[job.id] = job
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="ingestion", daemon=True)
+                self._thread.start()
+        self._queue.put(job)
+        logger.info(f"Queued ingestion job {job.id} for {filename}")
+        return job
+
+    def get(self, job_id):
+        with self._lock:
+            self._evict()
+            return self.jobs.get(job_id)
+
+    def _evict(self):
+        """Drop expired finished jobs, then the oldest ones beyond the limit; call with the lock held."""
+        cutoff = time.time() - JOB_TTL
+        finished = [job for job in self.jobs.values() if job.finished is not None]
+        finished.sort(key=lambda job: job.finished)
+        excess = len(finished) - MAX_FINISHED_JOBS
+        for i, job in enumerate(finished):
+            if i < excess or job.finished < cutoff:
+                del self.jobs[job.id]
+
+    def queue_depth(self):
+        """Jobs queued or running."""
+        return self._queue.unfinished_tasks
+
+    def _get_embedding_function(self):
+        if self._embedding_function is None:
+            self._embedding_function = get_embedding_function(cache=True)
+        return self._embedding_function
+
+    def _run(self):
+        while True:
+            job = self._queue.get()
+            try:
+                self._process(job)
+            finally:
+                self._queue.task_done()
+
+    def _process(self, job):
+        def progress(done, total):
+            job.pages_done, job.page_count = done, total
+
+        try:
+            job.status = "extracting"
+            with span("ingest_extraction"):
+                job.output_file = process_pdf(job.pdf_path, self.output_folder, progress=progress)
+            job.status = "indexing"
+            with span("ingest_indexing"):
+                job.chunks_added = index_file(job.output_file, chroma_path=self.chroma_path,
+                                              embedding_function=self._get_embedding_function())
+            job.status = "done"
+            logger.info(f"Ingestion job {job.id} indexed {job.chunks_added} chunks from {job.filename}")
+        except Exception as e:
+            job.status = "failed"
+            job.error = str(e)
+            logger.error(f"Ingestion job {job.id} failed: {e}")
+        finally:
+            job.finished = time.time()
+            if job.cleanup_dir:
+                shutil.rmtree(job.cleanup_dir, ignore_errors=True)
+
+
+_worker = None
+_worker_lock = threading.Lock()
+
+
+def get_ingestion_worker():
+    """Return the process-wide ingestion worker."""
+    global _worker
+    if _worker is None:
+        with _worker_lock:
+            if _worker is None:
+                _worker = IngestionWorker()
+    return _worker
@@ -0,0 +1,182 @@
+import heapq
+import math
+import os
+import pickle
+import re
+from array import array
+from collections import Counter
+
+# Stored next to the Chroma collection it mirrors
+BM25_NAME = "bm25.pkl"
+
+STOPWORDS = frozenset(
+    "a an and are as at be by for from has how in is it of on or that the this to was what "
+    "when where which who why with explain define describe discuss write".split()
+)
+# Words, numbers and dotted section numbers such as 3.2.1
+TOKEN_PATTERN = re.compile(r"[a-z0-9]+(?:\.[0-9]+)*")
+
+
+def tokenize(text):
+    return [t for t in TOKEN_PATTERN.findall(text.lower()) if t not in STOPWORDS]
+
+
+class BM25Index:
+    """In-process BM25 inverted index over chunk texts.
+
+    Postings are two parallel arrays per term (row numbers and term
+    frequencies) so the index stays compact in memory and on disk. Removed
+    chunks are tombstoned and dropped by compact() once they outnumber the
+    live ones. Document frequencies count live chunks only and are kept up
+    to date on add and remove, so a search only walks the query's postings.
+    """
+
+    def __init__(self, k1=1.5, b=0.75):
+        self.k1 = k1
+        self.b = b
+        self.ids = []  # row -> chunk id, None once removed
+        self.rows = {}  # chunk id -> row
+        self.lengths = array("I")
+        self.postings = {}  # term -> (array of rows, array of term frequencies)
+        self.df = Counter()  # term -> live chunks containing it
+        self.row_terms = []  # row -> distinct terms of the chunk, () once removed
+        self.total_length = 0
+
+    def __len__(self):
+        return len(self.rows)
+
+    def add(self, chunk_id, text):
+        if chunk_id in self.rows:
+            self.remove(chunk_id)
+        tokens = tokenize(text)
+        row = len(self.ids)
+        self.ids.append(chunk_id)
+        self.rows[chunk_id] = row
+        self.lengths.append(len(tokens))
+        self.total_length += len(tokens)
+        counts = Counter(tokens)
+        self.row_terms.append(tuple(counts))
+        self.df.update(counts.keys())
+        for term, count in counts.items():
+            if term not in self.postings:
+                self.postings[term] = (array("I"), array("I"))
+            rows, freqs = self.postings[term]
+            rows.append(row)
+            freqs.append(count)
+
+    def remove(self, chunk_id):
+        row = self.rows.pop(chunk_id, None)
+        if row is None:
+            return
+        self.ids[row] = None
+        self.total_length -= self.lengths[row]
+        self.df.subtract(self.row_terms[row])
+        self.row_terms[row] = ()
+        if len(self.ids) - len(self.rows) > max(len(self.rows), 1000):
+            self.compact()
+
+    def compact(self):
+        """Rebuild the postings without tombstoned rows."""
+        remap = {}
+        ids, lengths, row_terms = [], array("I"), []
+        for row, chunk_id in enumerate(self.ids):
+            if chunk_id is not None:
+                remap[row] = len(ids)
+                ids.append(chunk_id)
+                lengths.append(self.lengths[row])
+                row_terms.append(self.row_terms[row])
+        postings = {}
+        for term, (rows, freqs) in self.postings.items():
+            new_rows, new_freqs = array("I"), array("I")
+            for row, freq in zip(rows, freqs):
+                if row in remap:
+                    new_rows.append(remap[row])
+                    new_freqs.append(freq)
+            if new_rows:
+                postings[term] = (new_rows, new_freqs)
+        self.ids, self.lengths, self.postings, self.row_terms = ids, lengths, postings, row_terms
+        self.rows = {chunk_id: row for row, chunk_id in enumerate(ids)}
+        self.df = +self.df  # drop terms no live chunk uses
+
+    def _count_terms(self):
+        """Derive df and row_terms from the postings (indexes saved before they were stored)."""
+        self.df = Counter()
+        self.row_terms = [[] for _ in self.ids]
+        for term, (rows, _freqs) in self.postings.items():
+            for row in rows:
+                if self.ids[row] is not None:
+                    self.df[term] += 1
+                    self.row_terms[row].append(term)
+        self.row_terms = [tuple(terms) for terms in self.row_terms]
+
+    def search(self, query_text, k=20):
+        """Return up to k (chunk_id, bm25_score) pairs, best first."""
+        live = len(self.rows)
+        if not live:
+            return []
+        avg_length = self.total_length / live or 1.0
+        scores = {}
+        for term in set(tokenize(query_text)):
+            posting = self.postings.get(term)
+            if posting is None:
+                continue
+            rows, freqs = posting
+            df = self.df[term]
+            if not df:
+                continue
+            idf = math.log(1 + (live - df + 0.5) / (df + 0.5))
+            for row, freq in zip(rows, freqs):
+                if self.ids[row] is None:
+                    continue
+                norm = self.k1 * (1 - self.b + self.b * self.lengths[row] / avg_length)
+                scores[row] = scores.get(row, 0.0) + idf * freq * (self.k1 + 1) / (freq + norm)
+        best = heapq.nlargest(k, scores.items(), key=lambda item: item[1])
+        return [(self.ids[row], score) for row, score in best]
+
+    def save(self, path):
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "wb") as f:
+            pickle.dump(self.__dict__, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path):
+        index = cls()
+        with open(path, "rb") as f:
+            state = pickle.load(f)
+        index.__dict__.update(state)
+        if "df" not in state:
+            index._count_terms()
+        return index
+
+
+def load_lexical_index(chroma_path, db=None, batch_size=1000):
+    """Load the BM25 index of a collection, building it from the store if it is missing."""
+    path = os.path.join(chroma_path, BM25_NAME)
+    if os.path.exists(path):
+        return BM25Index.load(path)
+    index = BM25Index()
+    if db is not None:
+        offset = 0
+        while True:
+            batch = db.get(include=["documents"], limit=batch_size, offset=offset)
+            for chunk_id, text in zip(batch["ids"], batch["documents"]):
+                index.add(chunk_id, text or "")
+            if len(batch["ids"]) < batch_size:
+                break
+            offset += batch_size
+    return index
+
+
+def save_lexical_index(index, chroma_path):
+    os.makedirs(chroma_path, exist_ok=True)
+    index.save(os.path.join(chroma_path, BM25_NAME))
+
+
+def reciprocal_rank_fusion(rankings, k=60):
+    """Fuse ranked lists of IDs into one list of (id, score), best first."""
+    scores = {}
+    for ranking in rankings:
+        for rank, item_id in enumerate(ranking):
+            scores[item_id] = scores.get(item_id, 0.0) + 1.0 / (k + rank + 1)
+    return sorted(scores.items(), key=lambda item: item[1], reverse=True)
@@ -0,0 +1,119 @@
+import hashlib
+import json
+import logging
+import os
+import threading
+
+logger = logging.getLogger(__name__)
+
+# Configuration
+PDF_CACHE_DIR = os.getenv("PDF_CACHE_DIR", "pdf_cache")
+PDF_CACHE_MAX_BYTES = int(os.getenv("PDF_CACHE_MAX_MB", "256")) * 1024 * 1024
+
+
+def file_sha256(path, block_size=1024 * 1024):
+    """SHA-256 of a file's bytes, read in blocks."""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(block_size), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+class PDFTextCache:
+    """On-disk cache of extracted page texts and parsed questions, keyed by PDF content.
+
+    Each entry is one JSON file named after the SHA-256 of the PDF bytes. The
+    file mtime is refreshed on every hit and the least recently used entries are
+    removed once the directory grows past max_bytes.
+    """
+
+    def __init__(self, cache_dir=PDF_CACHE_DIR, max_bytes=PDF_CACHE_MAX_BYTES):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+        os.makedirs(cache_dir, exist_ok=True)
+
+    def _path(self, key):
+        return os.path.join(self.cache_dir, f"{key}.json")
+
+    def get(self, key):
+        """Return the cached {"pages", "questions"} entry or None."""
+        path = self._path(key)
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                entry = json.load(f)
+            os.utime(path)  # mark as recently used
+        except (OSError, ValueError):
+            with self._lock:
+                self.misses += 1
+            return None
+        with self._lock:
+            self.hits += 1
+        return entry
+
+    def put(self, key, pages, questions):
+        """Store the page texts and questions for a PDF, then enforce the size bound."""
+        path = self._path(key)
+        tmp_path = f"{path}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"pages": pages, "questions": questions}, f, ensure_ascii=False)
+        os.replace(tmp_path, path)
+        self._evict()
+
+    def _entries(self):
+        entries = []
+        for name in os.listdir(self.cache_dir):
+            if not name.endswith(".json"):
+                continue
+            try:
+                st = os.stat(os.path.join(self.cache_dir, name))
+            except OSError:
+                continue
+            entries.append((st.st_mtime, st.st_size, name))
+        return entries
+
+    def _evict(self):
+        with self._lock:
+            entries = sorted(self._entries())
+            total = sum(size for _mtime, size, _name in entries)
+            while entries and total > self.max_bytes:
+                _mtime, size, name = entries.pop(0)
+                try:
+                    os.remove(os.path.join(self.cache_dir, name))
+                except OSError:
+                    continue
+                total -= size
+                self.evictions += 1
+                logger.info(f"Evicted PDF cache entry {name}")
+
+    def stats(self):
+        entries = self._entries()
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0,
+                "evictions": self.evictions,
+                "entries": len(entries),
+                "bytes": sum(size for _mtime, size, _name in entries),
+                "max_bytes": self.max_bytes,
+            }
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_pdf_cache():
+    """Return the process-wide PDF text cache."""
+    global _cache
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                _cache = PDFTextCache()
+    return _cache
@@ -0,0 +1,219 @@
+import io
+import logging
+import multiprocessing
+import os
+import tempfile
+import unicodedata
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+import fitz  # PyMuPDF
+import ocrmypdf
+from pdfminer.converter import TextConverter
+from pdfminer.layout import LAParams
+from pdfminer.pdfinterp import PDFPageInterpreter, PDFResourceManager
+from pdfminer.pdfpage import PDFPage
+from telemetry import span
+
+logger = logging.getLogger(__name__)
+
+# A page with fewer characters than this is treated as having no text layer
+MIN_PAGE_CHARS = 25
+# Pages whose text is less clean than this fall back to the next extractor
+MIN_TEXT_QUALITY = 0.9
+# Parallel extraction: worker processes and pages per shard
+EXTRACT_WORKERS = int(os.getenv("EXTRACT_WORKERS", str(os.cpu_count() or 1)))
+SHARD_PAGES = 16
+
+
+class OCRError(RuntimeError):
+    """OCR of a document's scanned pages failed, so their text would be missing."""
+
+
+def has_text_layer(text, min_chars=MIN_PAGE_CHARS):
+    """True if a page's extracted text is substantial enough to skip OCR."""
+    return len(text.strip()) >= min_chars
+
+
+def ocr_pages(doc, page_numbers, jobs=None):
+    """OCR only the given pages of an open document.
+
+    The pages are copied into a small PDF, run through OCRmyPDF and read back,
+    so OCR time scales with the number of scanned pages. Returns a
+    {page_number: text} mapping. jobs limits OCRmyPDF's own parallelism.
+    """
+    if not page_numbers:
+        return {}
+    with span("ocr", pages=len(page_numbers)), tempfile.TemporaryDirectory() as temp_dir:
+        subset_path = os.path.join(temp_dir, "pages.pdf")
+        ocr_path = os.path.join(temp_dir, "pages_ocr.pdf")
+
+        subset = fitz.open()
+        for page_number in page_numbers:
+            subset.insert_pdf(doc, from_page=page_number, to_page=page_number)
+        subset.save(subset_path)
+        subset.close()
+
+        ocrmypdf.ocr(subset_path, ocr_path, force_ocr=True, output_type="pdf",
+                     optimize=0, progress_bar=False, jobs=jobs)
+
+        ocr_doc = fitz.open(ocr_path)
+        texts = {
+            page_number: ocr_doc[i].get_text("text")
+            for i, page_number in enumerate(page_numbers)
+        }
+        ocr_doc.close()
+    logger.info(f"OCR applied to {len(page_numbers)} page(s)")
+    return texts
+
+
+def text_quality(text):
+    """Share of a page's characters that look like real text (0..1).
+
+    Broken font encodings show up as replacement characters, private-use
+    glyphs and control characters, which count against the page.
+    """
+    stripped = text.strip()
+    if not stripped:
+        return 0.0
+    bad = sum(1 for c in stripped
+              if c == "\ufffd" or unicodedata.category(c) in ("Co", "Cc", "Cn") and not c.isspace())
+    return 1.0 - bad / len(stripped)
+
+
+def is_usable(text, min_chars=MIN_PAGE_CHARS):
+    return has_text_layer(text, min_chars) and text_quality(text) >= MIN_TEXT_QUALITY
+
+
+class _PdfminerReader:
+    """Reads single pages with pdfminer, parsing the document only once and only if asked."""
+
+    def __init__(self, pdf_path):
+        self.pdf_path = pdf_path
+        self._file = None
+        self._pages = None
+        self._resources = PDFResourceManager()
+
+    def page_text(self, page_number):
+        try:
+            if self._pages is None:
+                self._file = open(self.pdf_path, "rb")
+                self._pages = list(PDFPage.get_pages(self._file))
+            output = io.StringIO()
+            device = TextConverter(self._resources, output, laparams=LAParams())
+            try:
+                PDFPageInterpreter(self._resources, device).process_page(self._pages[page_number])
+            finally:
+                device.close()
+            return output.getvalue()
+        except Exception as e:
+            logger.error(f"pdfminer failed on page {page_number + 1} of {self.pdf_path}: {e}")
+            return ""
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+
+
+def _extract_range(pdf_path, start, stop, min_chars=MIN_PAGE_CHARS, ocr_jobs=None):
+    """Extract pages [start, stop) of a PDF with one extractor per page.
+
+    PyMuPDF is used where its text passes the quality check; pages that have
+    a text layer PyMuPDF decodes badly fall back to pdfminer, and pages
+    neither can read are OCRed together. Returns (start, texts, methods)
+    where methods names the extractor used per page. Raises OCRError if the
+    scanned pages could not be OCRed.
+    """
+    doc = fitz.open(pdf_path)
+    pdfminer = _PdfminerReader(pdf_path)
+    try:
+        texts, methods = [], []
+        for i in range(start, stop):
+            text = doc[i].get_text("text")
+            method = "pymupdf"
+            if not is_usable(text, min_chars):
+                # Scanned pages have no text layer for pdfminer to read either
+                fallback = pdfminer.page_text(i) if has_text_layer(text, min_chars) else ""
+                if is_usable(fallback, min_chars):
+                    text, method = fallback, "pdfminer"
+                else:
+                    method = "ocr"
+            texts.append(text)
+            methods.append(method)
+
+        scanned = [start + i for i, method in enumerate(methods) if method == "ocr"]
+        if scanned:
+            logger.info(f"{len(scanned)} of {len(texts)} pages in {pdf_path} need OCR")
+            try:
+                ocr_texts = ocr_pages(doc, scanned, jobs=ocr_jobs)
+            except Exception as e:
+                raise OCRError(f"OCR failed on {len(scanned)} page(s) of {pdf_path}: {e}") from e
+            for page_number, text in ocr_texts.items():
+                texts[page_number - start] = text
+    finally:
+        doc.close()
+        pdfminer.close()
+    return start, texts, methods
+
+
+def _page_count(pdf_path):
+    doc = fitz.open(pdf_path)
+    page_count = doc.page_count
+    doc.close()
+    return page_count
+
+
+def iter_pages(pdf_path, workers=EXTRACT_WORKERS, shard_pages=SHARD_PAGES,
+               min_chars=MIN_PAGE_CHARS, progress=None, methods=None):
+    """Yield page texts in order while only a few shards are held in memory.
+
+    With workers > 1, shards of shard_pages pages are extracted in a process
+    pool with at most 2 * workers shards in flight (OCRmyPDF is limited to
+    one job per worker so the pool does not oversubscribe the cores).
+    progress, if given, is called as progress(pages_done, page_count); if
+    methods is a dict it collects how many pages each extractor handled.
+    """
+    page_count = _page_count(pdf_path)
+    shards = [(start, min(start + shard_pages, page_count))
+              for start in range(0, page_count, shard_pages)]
+    pages_done = 0
+
+    def finish(shard_texts, shard_methods):
+        nonlocal pages_done
+        pages_done += len(shard_texts)
+        if methods is not None:
+            for method in shard_methods:
+                methods[method] = methods.get(method, 0) + 1
+        if progress:
+            progress(pages_done, page_count)
+
+    if workers <= 1 or len(shards) <= 1:
+        for start, stop in shards:
+            _start, shard_texts, shard_methods = _extract_range(pdf_path, start, stop, min_chars)
+            finish(shard_texts, shard_methods)
+            yield from shard_texts
+        return
+
+    # spawn: this runs inside threaded servers, and a forked child can inherit a lock held by another thread
+    with ProcessPoolExecutor(max_workers=min(workers, len(shards)),
+                             mp_context=multiprocessing.get_context("spawn")) as pool:
+        pending = deque()
+        next_shard = 0
+        while pending or next_shard < len(shards):
+            while next_shard < len(shards) and len(pending) < 2 * workers:
+                start, stop = shards[next_shard]
+                pending.append(pool.submit(_extract_range, pdf_path, start, stop, min_chars, 1))
+                next_shard += 1
+            _start, shard_texts, shard_methods = pending.popleft().result()
+            finish(shard_texts, shard_methods)
+            yield from shard_texts
+
+
+def extract_pages(pdf_path, min_chars=MIN_PAGE_CHARS):
+    """Return the text of every page in order, OCRing only pages without a text layer."""
+    return list(iter_pages(pdf_path, workers=1, min_chars=min_chars))
+
+
+def extract_pages_parallel(pdf_path, workers=EXTRACT_WORKERS, shard_pages=SHARD_PAGES,
+                           min_chars=MIN_PAGE_CHARS, progress=None):
+    """Like extract_pages, but spreads page ranges across a process pool."""
+    return list(iter_pages(pdf_path, workers, shard_pages, min_chars, progress))
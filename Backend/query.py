@@ -1,31 +1,28 @@
 import argparse
-import fitz  # PyMuPDF
-import ocrmypdf
-from dotenv import load_dotenv
-from langchain_chroma import Chroma
-from langchain.prompts import ChatPromptTemplate
-from langchain_groq import ChatGroq
-from get_embedding_function import get_embedding_function
-import re
+import json
+import os
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from rag_engine import get_engine
+from pdf_cache import get_pdf_cache, file_sha256
+from pdf_extract import extract_pages
+from answer_cache import get_answer_cache, context_fingerprint
+from question_parser import PARSER_VERSION, parse_questions
+from telemetry import count, get_logger, span
 
-# Load environment variables
-load_dotenv()
+logger = get_logger(__name__)
 
-# Constants
-CHROMA_PATH = "chroma"
-PROMPT_TEMPLATE = """
-Answer the question based only on the following context:
-
-{context}
-
----
-
-Answer the question based on the above context: {question}
-"""
+# Concurrency for question papers: parallel questions and per-question timeout (seconds)
+QUERY_WORKERS = int(os.getenv("QUERY_WORKERS", "4"))
+QUESTION_TIMEOUT = float(os.getenv("QUESTION_TIMEOUT", "120"))
+MAX_QUESTIONS = 20
 
 def main():
     parser = argparse.ArgumentParser(description="Extract questions from a PDF and query the RAG system.")
     parser.add_argument("pdf_path", type=str, help="Path to the PDF file.")
+    parser.add_argument("--workers", type=int, default=QUERY_WORKERS, help="Questions answered in parallel.")
+    parser.add_argument("--timeout", type=float, default=QUESTION_TIMEOUT, help="Per-question timeout in seconds.")
     args = parser.parse_args()
 
     # Perform OCR if necessary and extract questions
@@ -38,93 +35,272 @@ def main():
 
     print(f"Total Questions Found: {len(questions)}")
 
-    # Process each question
-    results = []
-    for i, question in enumerate(questions[:20], 1):  # Limit to first 20 questions
-        print(f"\nProcessing Question {i}: {question}")
-        response_text = query_rag(question)
-        results.append((question, response_text))
+    # Process the questions concurrently (limit to first 20 questions)
+    results = query_many(questions[:MAX_QUESTIONS], max_workers=args.workers, timeout=args.timeout)
 
     # Print all results
     print("\n--- Final Results ---")
-    for i, (question, answer) in enumerate(results, 1):
-        print(f"\nQuestion {i}: {question}\nAnswer: {answer}")
+    for i, result in enumerate(results, 1):
+        answer = result["answer"] if result["error"] is None else f"[error] {result['error']}"
+        print(f"\nQuestion {i}: {result['question']}\nAnswer: {answer}")
 
 def extract_questions_from_pdf(pdf_path):
-    print(f"DEBUG: Entering extract_questions_from_pdf with pdf_path: {pdf_path}")
-    # Perform OCR if needed
-    ocr_output_path = "ocr_output.pdf"
-    ocrmypdf.ocr(pdf_path, ocr_output_path, force_ocr=True, output_type="pdf", optimize=3)
+    """Return the question texts of a paper in order."""
+    return [question["text"] for question in extract_question_records(pdf_path)]
 
-    # Extract text using PyMuPDF (fitz)
-    doc = fitz.open(ocr_output_path)
+def extract_question_records(pdf_path):
+    """Return the paper's questions as {"number", "part", "text", "marks", "page"} records."""
+    with span("extract_questions"):
+        # Repeat uploads of the same paper are served from the content-addressed cache; the
+        # parser version is part of the key so entries written by an older parser are never reused
+        cache = get_pdf_cache()
+        key = f"{file_sha256(pdf_path)}-q{PARSER_VERSION}"
+        cached = cache.get(key)
+        if cached is not None:
+            count("eduquest_cache_requests_total", "Cache lookups by cache and result.", cache="pdf", result="hit")
+            logger.debug(f"PDF cache hit for {key[:12]}, skipping OCR")
+            return cached["questions"]
+        count("eduquest_cache_requests_total", "Cache lookups by cache and result.", cache="pdf", result="miss")
+
+        # OCR failures raise before anything is cached
+        all_text = extract_page_texts(pdf_path)
+        questions = parse_questions(all_text)
+        logger.debug(f"Extracted {len(questions)} questions")
+        # Usable text layers are never empty, so an empty page is one OCR could not read;
+        # such results (and papers without questions) are retried on the next upload
+        if questions and all(page_text.strip() for page_text in all_text):
+            cache.put(key, all_text, questions)
+        else:
+            logger.info(f"Not caching extraction of {pdf_path}: {len(questions)} questions, "
+                        f"{sum(1 for page_text in all_text if not page_text.strip())} empty pages")
+        return questions
 
+def extract_page_texts(pdf_path):
+    """Return every page's text (empty for unreadable pages), OCRing only pages that lack a text layer."""
     all_text = []
-    for i, page in enumerate(doc):
-        page_text = page.get_text("text")
-        if page_text.strip():
+    with span("text_extraction"):
+        for i, page_text in enumerate(extract_pages(pdf_path)):
+            if not page_text.strip():
+                logger.warning(f"No text extracted from page {i+1}")
             all_text.append(page_text)
-        else:
-            print(f"Warning: No text extracted from page {i+1}")
 
-    doc.close()
+    processed = sum(1 for page_text in all_text if page_text.strip())
+    if not processed:
+        logger.warning("No text extracted from any pages.")
+    else:
+        logger.info(f"Total Pages Processed: {processed}")
+    return all_text
 
-    if not all_text:
-        print("No text extracted from any pages.")
-        return []
+def query_rag(query_text: str, embedding=None):
+    try:
+        return answer_question(query_text, embedding=embedding)
+    except Exception as e:
+        logger.error(f"Error in query_rag: {e}")
+        return str(e)
 
-    print(f"Total Pages Processed: {len(all_text)}")
+def answer_question(query_text: str, results=None, embedding=None):
+    """Retrieve context and generate an answer; unlike query_rag, errors propagate.
 
-    # Combine text from all pages
-    text = "\n".join(all_text)
+    results and embedding can carry context already fetched with
+    engine.retrieve_batch. Answers are served from the answer cache when the
+    same (or a near-identical) question was answered against the same context.
+    """
+    cached, results, embedding, context_key = lookup_cached_answer(query_text, results, embedding)
+    if cached is not None:
+        return cached["answer"]
 
-    # Improved question extraction using regex for multiline questions
-    question_pattern = re.compile(r'(?<=\n)(.*?\?)', re.DOTALL)
-    questions = question_pattern.findall(text)
+    logger.debug(f"Retrieved {len(results or [])} chunks")
 
-    print(f"DEBUG: Extracted questions: {questions}")
-    return questions
+    if not results:
+        logger.info("No relevant context found for the query.")
+        return "No relevant context found."
 
-def query_rag(query_text: str):
-    print(f"DEBUG: Entering query_rag with query: '{query_text}'")
-    try:
-        embedding_function = get_embedding_function()
-        db = Chroma(persist_directory=CHROMA_PATH, embedding_function=embedding_function)
+    # Prepare prompt
+    engine = get_engine()
+    prompt = engine.build_prompt(query_text, results)
+
+    # Generate response with the shared LLM client
+    response_text = engine.generate(prompt)
+
+    logger.debug(f"LLM response: {len(response_text)} chars")
+    get_answer_cache().put(query_text, embedding, context_key, response_text, source_list(results))
+    return response_text
+
+def lookup_cached_answer(query_text: str, results=None, embedding=None):
+    """Check both answer cache tiers, retrieving context only when the exact tier misses.
+
+    Returns (cached_entry or None, results, embedding, context_key).
+    """
+    engine = get_engine()
+    cache = get_answer_cache()
+    cache.sync_index_version(engine.index_version())
+
+    cached = cache.get_exact(query_text)
+    if cached is not None:
+        _count_answer_cache("exact_hit")
+        return cached, results, embedding, None
+
+    if embedding is None:
+        embedding = engine.embed_query(query_text)
+    if results is None:
+        results = engine.retrieve_by_vector(embedding, k=5, query_text=query_text)
+    if not results:
+        return None, results, embedding, None
+
+    context_key = context_fingerprint(results)
+    cached = cache.get_semantic(embedding, context_key)
+    _count_answer_cache("miss" if cached is None else "semantic_hit")
+    return cached, results, embedding, context_key
 
-        results = db.similarity_search_with_score(query_text, k=5)
+def _count_answer_cache(result):
+    count("eduquest_cache_requests_total", "Cache lookups by cache and result.", cache="answer", result=result)
 
-        print(f"DEBUG: ChromaDB results: {results}")
+def source_list(results):
+    return [
+        {"source": doc.metadata.get("source"), "id": doc.metadata.get("id"), "score": score}
+        for doc, score in results
+    ]
 
-        if not results:
-            print("No relevant context found for the query.")
-            return "No relevant context found."
+def query_rag_stream(query_text: str, results=None, embedding=None):
+    """Streaming counterpart of answer_question.
 
-        context_text = "\n\n---\n\n".join([doc.page_content for doc, _score in results])
+    Yields event dicts as the pipeline advances:
+      {"stage": "retrieval", "sources": [...]} once the context is retrieved,
+      {"stage": "token", "token": "..."} for each generated fragment,
+      {"stage": "done", "answer": "...", "sources": [...]} at the end.
+    A cached answer is sent as a single token. Errors propagate to the caller.
+    """
+    cached, results, embedding, context_key = lookup_cached_answer(query_text, results, embedding)
+    if cached is not None:
+        yield {"stage": "retrieval", "sources": cached["sources"], "cached": True}
+        yield {"stage": "token", "token": cached["answer"]}
+        yield {"stage": "done", "answer": cached["answer"], "sources": cached["sources"], "cached": True}
+        return
 
-        # Prepare prompt
-        prompt_template = ChatPromptTemplate.from_template(PROMPT_TEMPLATE)
-        prompt = prompt_template.format(context=context_text, question=query_text)
+    sources = source_list(results)
+    yield {"stage": "retrieval", "sources": sources}
 
-        # Initialize Groq LLM
-        llm = ChatGroq(
-            model_name="llama3-70b-8192",
-            temperature=0,
-            streaming=False
-        )
+    if not results:
+        yield {"stage": "done", "answer": "No relevant context found.", "sources": sources}
+        return
 
-        # Generate response
-        response = llm.invoke(prompt)
-        response_text = response.content if hasattr(response, 'content') else str(response)
+    engine = get_engine()
+    prompt = engine.build_prompt(query_text, results)
+    tokens = []
+    for token in engine.stream(prompt):
+        tokens.append(token)
+        yield {"stage": "token", "token": token}
+    answer = "".join(tokens)
+    get_answer_cache().put(query_text, embedding, context_key, answer, sources)
+    yield {"stage": "done", "answer": answer, "sources": sources}
 
-        print(f"DEBUG: Groq LLM response: {response_text}")
-        return response_text
+def query_rag_sse(query_text: str):
+    """query_rag_stream rendered as Server-Sent Events for the /query_stream endpoints.
 
+    Generation events carry only the new token, so the stream stays linear in
+    the answer length; the final event carries the full answer and errors are
+    sent as a final error event.
+    """
+    try:
+        for event in query_rag_stream(query_text):
+            if event["stage"] == "retrieval":
+                message = f"Found {len(event['sources'])} relevant passages, generating answer..."
+                yield f"data: {json.dumps({'status': 'processing', 'stage': 'retrieval', 'message': message, 'sources': event['sources']})}\n\n"
+            elif event["stage"] == "token":
+                yield f"data: {json.dumps({'status': 'processing', 'stage': 'generation', 'token': event['token']})}\n\n"
+            else:
+                # Send final result
+                yield f"data: {json.dumps({'status': 'success', 'response': event['answer'], 'sources': event['sources']})}\n\n"
     except Exception as e:
-        print(f"DEBUG: Error in query_rag: {e}")
-        return str(e)
+        logger.error(f"Error in query_rag_stream: {e}")
+        yield f"data: {json.dumps({'status': 'error', 'error': str(e)})}\n\n"
+
+_executor = None
+_executor_lock = threading.Lock()
+
+def get_query_executor(workers=QUERY_WORKERS):
+    """Return the process-wide pool query_many runs questions on, created with at least QUERY_WORKERS threads."""
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(max_workers=max(1, workers, QUERY_WORKERS), thread_name_prefix="query")
+    return _executor
+
+def query_many(questions, max_workers=QUERY_WORKERS, timeout=QUESTION_TIMEOUT, embeddings=None):
+    """Answer questions concurrently with at most max_workers in flight.
+
+    Results keep the input order as {"question", "answer", "error"} dicts. A
+    question that fails or runs longer than timeout seconds (counted from when
+    it starts, not while it waits for a worker) gets an error entry and the
+    rest of the batch is still returned. A timeout does not stop the question:
+    its generation keeps a worker of the shared pool until it finishes.
+    embeddings can carry the question embeddings when the caller already
+    computed them.
+    """
+    # One batched encode and vector search for the whole paper
+    try:
+        engine = get_engine()
+        if embeddings is None:
+            embeddings = engine.embed_queries(questions)
+        retrieved = engine.retrieve_batch(questions, k=5, embeddings=embeddings)
+    except Exception as e:
+        logger.warning(f"Batch retrieval failed, retrieving per question: {e}")
+        retrieved = [None] * len(questions)
+        if embeddings is None:
+            embeddings = [None] * len(questions)
+
+    results = [{"question": question, "answer": None, "error": None} for question in questions]
+    started = {}  # index -> monotonic start time
+    start_signals = {}  # index -> Future resolved when the question leaves the queue
+
+    def run(index):
+        started[index] = time.monotonic()
+        start_signals[index].set_result(None)
+        return answer_question(questions[index], retrieved[index], embeddings[index])
+
+    executor = get_query_executor(max_workers)
+    queued = iter(range(len(questions)))
+    running = {}  # future -> index
+
+    def submit_next():
+        index = next(queued, None)
+        if index is not None:
+            start_signals[index] = Future()
+            running[executor.submit(run, index)] = index
+
+    for _ in range(max(1, max_workers)):
+        submit_next()
+    try:
+        while running:
+            # Wake up on a finished question, a queued one starting, or the earliest deadline
+            waiting = [start_signals[index] for index in running.values() if index not in started]
+            deadline = None
+            if timeout is not None:
+                deadline = min((started[index] + timeout for index in running.values() if index in started),
+                               default=None)
+            wait(list(running) + waiting, return_when=FIRST_COMPLETED,
+                 timeout=None if deadline is None else max(deadline - time.monotonic(), 0))
+
+            now = time.monotonic()
+            for future, index in list(running.items()):
+                if future.done():
+                    try:
+                        results[index]["answer"] = future.result()
+                    except Exception as e:
+                        results[index]["error"] = str(e)
+                elif timeout is not None and index in started and now - started[index] >= timeout:
+                    results[index]["error"] = f"Timed out after {timeout}s"
+                else:
+                    continue
+                del running[future]
+                submit_next()
+    finally:
+        for future in running:
+            future.cancel()
+    return results
 
 #Test ChromaDB
 if __name__ == "__main__":
-    embedding_function = get_embedding_function()
-    db = Chroma(persist_directory=CHROMA_PATH, embedding_function=embedding_function)
-    print(f"DEBUG: ChromaDB count: {db._collection.count()}")
\ No newline at end of file
+    engine = get_engine().warm_up()
+    print(f"ChromaDB count: {engine.db._collection.count()}")
\ No newline at end of file
@@ -0,0 +1,215 @@
+import re
+from collections import deque
+
+# Bumped whenever the records change, so cached parses of older versions are not reused
+PARSER_VERSION = 1
+# Lines repeated at the top or bottom of several pages are running headers/footers
+EDGE_LINES = 3
+MIN_EDGE_CHARS = 8
+# Inside an open question a number may skip a few (OCR misses); numbers never run backwards
+MAX_NUMBER_GAP = 3
+MIN_QUESTION_WORDS = 2
+MAX_QUESTION_CHARS = 1000
+# Unnumbered lines kept while looking for a closing "?"
+MAX_PENDING_LINES = 3
+
+# "1.", "1)", "12 ", "Q2", "Q.2", "Question 3:" at the start of a line
+NUMBER_PATTERN = re.compile(r"(?:(q(?:uestion)?\s?\.?\s?)(\d{1,2})|(\d{1,2}))(?:\s?[.):-])?(?:\s+|$)", re.I)
+# "(a)", "a)", "a.", "(ii)", "iv)"
+PART_PATTERN = re.compile(r"\(?([a-h]|[ivx]{1,4})\)\s*|([a-h])\.\s+", re.I)
+# "(5)", "[5 marks]", "5 marks" or a bare number after the closing punctuation
+TRAILING_MARKS_PATTERN = re.compile(
+    r"\s?(?:[\[(]\s?(\d{1,2})\s?(?:marks?)?\s?[\])]|(\d{1,2})\s?marks?|(?<=[?.:])\s(\d{1,2}))$", re.I)
+MARKS_LINE_PATTERN = re.compile(r"[\[(]?\s?(\d{1,2})\s?(?:marks?)?\s?[\])]?", re.I)
+# Section headings and instructions; they end the open question
+BOUNDARY_PATTERN = re.compile(
+    r"(?:part\s?[a-c]\b|module\s?[-:]?\s?(?:\d|[ivx]+)\b|section\s?[a-c\d]\b|answer\s(?:all|any)\b"
+    r"|each\s(?:question\s)?carries\b|max(?:imum)?\.?\s?marks\b|duration\b|time\s?:|reg\.?\s?no\b|name\s?:"
+    r"|course\s(?:code|name)\b|page\s?\d+(?:\s?of\s?\d+)?$|or$|marks$|\*+$)", re.I)
+WORD_PATTERN = re.compile(r"\w+")
+ROMAN_PARTS = frozenset("i ii iii iv v vi vii viii ix x".split())
+
+
+def normalize(text):
+    """Lower-case word tokens, used to spot the same question twice."""
+    return " ".join(WORD_PATTERN.findall(text.lower()))
+
+
+class QuestionParser:
+    """Streaming question-paper parser.
+
+    Pages are fed in order and read line by line. A numbered line ("1.",
+    "Q2") or a part label ("(a)", "ii)") starts a question, following lines
+    continue it, and a marks annotation ("(5)", "[5 marks]"), a section
+    heading or the next number ends it. Stems without marks are prefixed to
+    their parts. Unnumbered text only counts when it ends in "?". Each line
+    is matched once with anchored patterns, so parsing is linear in the text.
+    """
+
+    def __init__(self):
+        self.last_number = 0
+        self.number = None
+        self.stem = ""
+        self.current = None  # {"number", "part", "page", "lines", "length", "marks"} of the open question
+        self.held = None  # (page, number) of a bare number that is either marks or the next question
+        self.pending = deque(maxlen=MAX_PENDING_LINES)
+        self.edges = set()
+        self.seen = set()
+
+    def feed(self, page_number, text):
+        """Yield the questions completed by this page's text."""
+        lines = [" ".join(line.split()) for line in text.splitlines()]
+        lines = [line for line in lines if line]
+        edges = {line for line in lines[:EDGE_LINES] + lines[-EDGE_LINES:] if len(line) >= MIN_EDGE_CHARS}
+        for i, line in enumerate(lines):
+            at_edge = i < EDGE_LINES or i >= len(lines) - EDGE_LINES
+            if at_edge and line in self.edges:
+                continue
+            yield from self._line(page_number, line)
+        self.edges |= edges
+
+    def close(self):
+        """Yield the question still open at the end of the paper."""
+        if self.held is not None:
+            self.current["marks"] = self.held[1]
+            self.held = None
+        yield from self._close()
+
+    def _accepts(self, number, explicit):
+        if explicit:
+            return True
+        if self.current is None:
+            # After marks or a section heading; 1 again starts a second paper in the same file
+            return number > self.last_number or number == 1
+        return self.last_number < number <= self.last_number + MAX_NUMBER_GAP
+
+    def _awaiting_marks(self):
+        return self.current is not None and self.current["lines"] and self.current["marks"] is None
+
+    def _line(self, page_number, line):
+        if self.held is not None:
+            yield from self._resolve_held(line)
+
+        if BOUNDARY_PATTERN.match(line):
+            yield from self._close()
+            self.pending.clear()
+            return
+
+        match = NUMBER_PATTERN.match(line)
+        if match:
+            number = int(match.group(2) or match.group(3))
+            rest = line[match.end():]
+            explicit = bool(match.group(1))
+            bare_next = not rest and number == self.last_number + 1
+            if bare_next and not explicit and self._awaiting_marks():
+                # Table layouts put marks and the next number on lines of their own; the next line decides
+                self.held = (page_number, number)
+                return
+            # Any other bare number is only a question number when it is the next one; otherwise it may be marks
+            if (rest or explicit or bare_next) and self._accepts(number, explicit):
+                yield from self._start(page_number, number)
+                line = rest
+                if not line:
+                    return
+
+        marks_line = MARKS_LINE_PATTERN.fullmatch(line)
+        if marks_line:
+            if self.current is not None and self.current["lines"] and self.current["marks"] is None:
+                self.current["marks"] = int(marks_line.group(1))
+                yield from self._close()
+            return
+
+        match = PART_PATTERN.match(line)
+        if match and (match.group(1) or match.group(2).islower()):
+            part = (match.group(1) or match.group(2)).lower()
+            current = self.current
+            # Roman items listed in the text of an open question or lettered part stay in it
+            nested = (part in ROMAN_PARTS and self._awaiting_marks() and current["part"] not in ROMAN_PARTS)
+            if not nested:
+                if current is not None and current["part"] is None and current["marks"] is None:
+                    self.stem = " ".join(current["lines"])  # the parent's text is the stem of its parts
+                    self.current = None
+                else:
+                    yield from self._close()
+                self._open(page_number, part, self.number)
+                line = line[match.end():]
+                if not line:
+                    return
+
+        marks = TRAILING_MARKS_PATTERN.search(line)
+        if marks:
+            line = line[:marks.start()].rstrip()
+
+        if self.current is None:
+            self.pending.append(line)
+            if line.endswith("?"):
+                lines = list(self.pending)
+                self._open(page_number)
+                self.current["lines"] = lines
+                yield from self._close()
+            elif line.endswith((".", ":")):
+                self.pending.clear()
+            return
+
+        if self.current["length"] + len(line) <= MAX_QUESTION_CHARS:
+            self.current["lines"].append(line)
+            self.current["length"] += len(line) + 1
+        if marks:
+            self.current["marks"] = int(next(group for group in marks.groups() if group))
+            yield from self._close()
+
+    def _resolve_held(self, line):
+        page_number, number = self.held
+        self.held = None
+        match = NUMBER_PATTERN.match(line)
+        if (BOUNDARY_PATTERN.match(line) or MARKS_LINE_PATTERN.fullmatch(line)
+                or match and int(match.group(2) or match.group(3)) == number):
+            self.current["marks"] = number
+            yield from self._close()
+        else:
+            yield from self._start(page_number, number)
+
+    def _start(self, page_number, number):
+        yield from self._close()
+        self.number, self.stem, self.last_number = number, "", number
+        self._open(page_number, number=number)
+
+    def _open(self, page_number, part=None, number=None):
+        self.current = {"number": number, "part": part, "page": page_number,
+                        "lines": [], "length": 0, "marks": None}
+        self.pending.clear()
+
+    def _close(self):
+        current, self.current = self.current, None
+        if current is None:
+            return
+        text = " ".join(current["lines"]).strip()
+        if current["part"] is not None and self.stem:
+            text = f"{self.stem} {text}"
+        key = normalize(text)
+        if len(key.split()) < MIN_QUESTION_WORDS or key in self.seen:
+            return
+        self.seen.add(key)
+        yield {
+            "number": current["number"],
+            "part": current["part"],
+            "text": text,
+            "marks": current["marks"],
+            "page": current["page"],
+        }
+
+
+def iter_questions(pages):
+    """Yield question records from page texts as each page arrives.
+
+    Records are {"number", "part", "text", "marks", "page"} dicts with 1-based
+    page numbers; number, part and marks are None when the paper has none.
+    """
+    parser = QuestionParser()
+    for page_number, text in enumerate(pages, 1):
+        yield from parser.feed(page_number, text or "")
+    yield from parser.close()
+
+
+def parse_questions(pages):
+    return list(iter_questions(pages))
@@ -0,0 +1,293 @@
+import logging
+import os
+import threading
+import time
+from dotenv import load_dotenv
+from langchain.schema import Document
+from langchain.prompts import ChatPromptTemplate
+from context_builder import build_context, count_tokens
+from get_embedding_function import embed_queries, get_embedding_function
+from generators import get_generator
+from index_store import INDEX_ROOT, current_path, open_chroma, read_index_version
+from lexical_index import load_lexical_index, reciprocal_rank_fusion
+from telemetry import record_stage, span
+
+# Load environment variables (GROQ_API_KEY, LLM_BACKEND)
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+# Constants
+CHROMA_PATH = INDEX_ROOT
+TOP_K = 5
+# How often to look for a newly activated index version
+INDEX_CHECK_SECONDS = float(os.getenv("INDEX_CHECK_SECONDS", "2"))
+# Fuse BM25 and vector rankings; each retriever contributes this many candidates
+HYBRID_RETRIEVAL = os.getenv("HYBRID_RETRIEVAL", "1") == "1"
+HYBRID_CANDIDATES = 20
+PROMPT_TEMPLATE = """
+Answer the question based only on the following context:
+
+{context}
+
+---
+
+Answer the question based on the above context: {question}
+"""
+
+
+class RAGEngine:
+    """Long-lived retrieval engine shared by every request.
+
+    The embedding model, the Chroma handle, the prompt template and the
+    generator backend (see generators.py) are created once in warm_up() and
+    reused, so a question only pays for encoding, vector search and generation.
+    chroma_path is an index root (see index_store.py); when another version is
+    activated there, or the served one is changed by another process, the
+    engine reopens it without a restart.
+    """
+
+    def __init__(self, chroma_path=CHROMA_PATH, embedding_function=None, generator=None):
+        self.index_root = chroma_path
+        self.chroma_path = None  # directory of the version being served
+        self.chroma_version = None  # its version stamp when it was opened
+        self.embedding_function = embedding_function
+        self.generator = generator
+        self.hybrid = HYBRID_RETRIEVAL
+        self.db = None
+        self.lexical = None
+        self._lexical_version = None
+        self.prompt_template = ChatPromptTemplate.from_template(PROMPT_TEMPLATE)
+        self.error = None
+        self.warmup_seconds = None
+        self._lock = threading.Lock()
+        self._lexical_lock = threading.Lock()
+        self._ready = threading.Event()
+        self._index_checked = 0.0
+
+    @property
+    def ready(self):
+        return self._ready.is_set()
+
+    def warm_up(self):
+        """Load the embedder, open the vector store and load the generator (idempotent)."""
+        if self._ready.is_set():
+            self._follow_index()
+            return self
+        with self._lock:
+            if self._ready.is_set():
+                return self
+            start = time.perf_counter()
+            try:
+                if self.embedding_function is None:
+                    self.embedding_function = get_embedding_function()
+                self.chroma_path = current_path(self.index_root) or self.index_root
+                self.chroma_version = read_index_version(self.chroma_path)
+                self.db = open_chroma(self.chroma_path, self.embedding_function)
+                self._index_checked = time.monotonic()
+                if self.generator is None:
+                    self.generator = get_generator()
+                # The first encode initialises the tokenizer and model graph
+                self.embedding_function.embed_query("warm up")
+            except Exception as e:
+                self.error = str(e)
+                logger.error(f"RAG engine warm-up failed: {e}")
+                raise
+            self.error = None
+            self.warmup_seconds = round(time.perf_counter() - start, 3)
+            self._ready.set()
+            logger.info(f"RAG engine ready in {self.warmup_seconds}s, serving {self.chroma_path}")
+        return self
+
+    def _follow_index(self):
+        """Reopen the index if another version was activated or its stamp changed since the last check."""
+        now = time.monotonic()
+        if now - self._index_checked < INDEX_CHECK_SECONDS:
+            return
+        self._index_checked = now
+        path = current_path(self.index_root) or self.index_root
+        version = read_index_version(path)
+        if path == self.chroma_path and version == self.chroma_version:
+            return
+        with self._lock:
+            if path == self.chroma_path and version == self.chroma_version:
+                return
+            try:
+                # A fresh client: the cached one never sees chunks written by another process
+                db = open_chroma(path, self.embedding_function, reload=True)
+                db._collection.count()
+            except Exception as e:
+                logger.error(f"Could not open index {path}, still serving {self.chroma_path}: {e}")
+                return
+            # Requests already running finish on the old handle
+            self.db, self.chroma_path, self.chroma_version, self.lexical = db, path, version, None
+        logger.info(f"Switched to index {path} (version {version})")
+
+    def status(self):
+        """Readiness information for the health endpoint."""
+        return {
+            "ready": self.ready,
+            "error": self.error,
+            "warmup_seconds": self.warmup_seconds,
+            "chroma_path": self.chroma_path,
+            "index_version": self.index_version(),
+            "generator": self.generator.stats() if self.generator else None,
+        }
+
+    def retrieve(self, query_text: str, k=TOP_K):
+        """Top-k (Document, score) pairs for a question.
+
+        With hybrid retrieval the score is the reciprocal rank fusion score
+        (higher is better); otherwise it is the vector distance.
+        """
+        self.warm_up()
+        if not self.hybrid:
+            with span("vector_search"):
+                return self.db.similarity_search_with_score(query_text, k=k)
+        return self.retrieve_by_vector(self.embed_query(query_text), k, query_text)
+
+    def embed_query(self, query_text: str):
+        self.warm_up()
+        with span("embedding"):
+            return self.embedding_function.embed_query(query_text)
+
+    def retrieve_by_vector(self, embedding, k=TOP_K, query_text=None):
+        """Same results as retrieve(), for a question that is already encoded.
+
+        query_text is needed for the BM25 side of hybrid retrieval; without it
+        only the vector search runs.
+        """
+        self.warm_up()
+        if not self.hybrid or query_text is None:
+            with span("vector_search"):
+                return self._vector_search([embedding], k)[0]
+        with span("vector_search"):
+            candidates = self._vector_search([embedding], HYBRID_CANDIDATES)[0]
+        return self._fuse(query_text, candidates, k)
+
+    def _vector_search(self, embeddings, k):
+        """(Document, distance) lists for encoded questions, nearest first, as retrieve() scores them."""
+        results = self.db._collection.query(
+            query_embeddings=embeddings,
+            n_results=k,
+            include=["documents", "metadatas", "distances"],
+        )
+        return [
+            [
+                (Document(page_content=text, metadata=metadata or {}, id=doc_id), distance)
+                for text, metadata, doc_id, distance in zip(
+                    results["documents"][i], results["metadatas"][i],
+                    results["ids"][i], results["distances"][i])
+            ]
+            for i in range(len(embeddings))
+        ]
+
+    def lexical_index(self):
+        """The BM25 index of the collection, reloaded when the index version changes."""
+        version = self.index_version()
+        if self.lexical is None or version != self._lexical_version:
+            with self._lexical_lock:
+                if self.lexical is None or version != self._lexical_version:
+                    self.lexical = load_lexical_index(self.chroma_path, self.db)
+                    self._lexical_version = version
+        return self.lexical
+
+    def _fuse(self, query_text, vector_results, k):
+        """Reciprocal rank fusion of vector candidates with BM25 hits."""
+        docs = {(doc.id or doc.metadata.get("id")): doc for doc, _score in vector_results}
+        with span("bm25_search"):
+            lexical_ids = [chunk_id for chunk_id, _score in self.lexical_index().search(query_text, HYBRID_CANDIDATES)]
+        fused = reciprocal_rank_fusion([list(docs), lexical_ids])[:k]
+
+        missing = [chunk_id for chunk_id, _score in fused if chunk_id not in docs]
+        if missing:
+            fetched = self.db.get(ids=missing, include=["documents", "metadatas"])
+            for chunk_id, text, metadata in zip(fetched["ids"], fetched["documents"], fetched["metadatas"]):
+                docs[chunk_id] = Document(page_content=text, metadata=metadata or {}, id=chunk_id)
+        return [(docs[chunk_id], score) for chunk_id, score in fused if chunk_id in docs]
+
+    def index_version(self):
+        """Version stamp of the served index.
+
+        Changes whenever chunks are added or removed or another version is activated.
+        """
+        path = self.chroma_path or current_path(self.index_root) or self.index_root
+        return f"{os.path.basename(os.path.normpath(path))}:{read_index_version(path)}"
+
+    def embed_queries(self, query_texts):
+        """Encode several questions in one forward pass."""
+        self.warm_up()
+        with span("embedding", batch=len(query_texts)):
+            return embed_queries(self.embedding_function, query_texts)
+
+    def retrieve_batch(self, query_texts, k=TOP_K, embeddings=None):
+        """Top-k (Document, score) lists for many questions with one encode and one search.
+
+        Returns the same documents and distances as calling retrieve() for each
+        question, in input order. Pass embeddings to reuse an earlier embed_queries().
+        """
+        query_texts = list(query_texts)
+        if not query_texts:
+            return []
+        if embeddings is None:
+            embeddings = self.embed_queries(query_texts)
+        self.warm_up()
+        with span("vector_search", batch=len(query_texts)):
+            batch = self._vector_search(embeddings, HYBRID_CANDIDATES if self.hybrid else k)
+        if self.hybrid:
+            return [self._fuse(q, candidates, k) for q, candidates in zip(query_texts, batch)]
+        return batch
+
+    def build_prompt(self, query_text: str, results):
+        # Deduplicated, merged and packed into the context token budget
+        with span("prompt"):
+            context_text = build_context(results)
+            prompt = self.prompt_template.format(context=context_text, question=query_text)
+        logger.debug(f"Prompt tokens: {count_tokens(prompt)}")
+        return prompt
+
+    def generate(self, prompt):
+        self.warm_up()
+        with span("generation"):
+            return self.generator.generate(prompt)
+
+    def stream(self, prompt):
+        """Yield answer text fragments as the generator produces them."""
+        self.warm_up()
+        # Each step may run on a different pool thread, so time it by hand instead of holding a span open
+        start = time.perf_counter()
+        error = False
+        try:
+            yield from self.generator.stream(prompt)
+        except Exception:
+            error = True
+            raise
+        finally:
+            record_stage("generation", time.perf_counter() - start, error)
+
+
+_engine = None
+_engine_lock = threading.Lock()
+
+
+def get_engine():
+    """Return the process-wide engine, creating it on first use."""
+    global _engine
+    if _engine is None:
+        with _engine_lock:
+            if _engine is None:
+                _engine = RAGEngine()
+    return _engine
+
+
+def warm_up_in_background():
+    """Start warming the shared engine without blocking server startup."""
+    def _warm():
+        try:
+            get_engine().warm_up()
+        except Exception:
+            pass  # recorded in engine.error and reported by /health
+
+    thread = threading.Thread(target=_warm, name="rag-warmup", daemon=True)
+    thread.start()
+    return thread
@@ -1,10 +1,16 @@
+import logging
 import os
 import uuid
-import json
-import time
 from flask import Flask, request, jsonify, Response, stream_with_context
 from flask_cors import CORS
-from query import query_rag, extract_questions_from_pdf
+from query import query_rag, query_rag_sse
+from rag_engine import get_engine, warm_up_in_background
+from pdf_cache import get_pdf_cache
+from answer_cache import get_answer_cache
+from answer_bank import answer_paper, get_answer_bank, lookup_answer
+from telemetry import get_logger, get_profiler, register_gauge, render_metrics, span
+
+logger = get_logger(__name__)
 
 app = Flask(__name__)
 CORS(app, resources={r"/*": {"origins": "*"}}, supports_credentials=True)
@@ -13,14 +19,22 @@ UPLOAD_FOLDER = os.path.join(os.getcwd(), "upload")
 os.makedirs(UPLOAD_FOLDER, exist_ok=True)
 history = {}
 
+register_gauge("eduquest_answer_cache_entries", "Answers held in the answer cache.",
+               lambda: get_answer_cache().stats()["entries"])
+register_gauge("eduquest_pdf_cache_bytes", "Bytes used by the extracted PDF text cache.",
+               lambda: get_pdf_cache().stats()["bytes"])
+register_gauge("eduquest_answer_bank_entries", "Answer bank entries that can be served (fresh) or await refresh (stale).",
+               lambda: {state: get_answer_bank().stats(get_engine().index_version())[state]
+                        for state in ("fresh", "stale")}, label="state")
+
 
 @app.route('/query', methods=['POST'])
 def handle_query():
-    print("handle_query function called.")
-    print(f"Headers: {request.headers}")
-    print(f"Request Form: {request.form}")
-    print(f"Request Files: {request.files}")
+    with span("request", endpoint="/query"):
+        return _handle_query()
+
 
+def _handle_query():
     try:
         if 'file' in request.files:
             # Handle file upload
@@ -36,13 +50,14 @@ def handle_query():
             file.save(temp_pdf_path)
 
             try:
-                questions = extract_questions_from_pdf(temp_pdf_path)
-                if not questions:
+                # Banked papers and questions are served from the answer bank; the rest are
+                # answered concurrently and failed questions carry an "error"
+                results = answer_paper(temp_pdf_path)
+                if results is None:
                     return jsonify({"error": "No questions found in the PDF"}), 400
 
-                # Format each question and answer as a pair
-                results = [{"question": q, "answer": query_rag(q)} for q in questions[:20]]
-                return jsonify({"status": "success", "responses": results})
+                failed = sum(1 for r in results if r["error"] is not None)
+                return jsonify({"status": "partial" if failed else "success", "responses": results})
 
             finally:
                 os.remove(temp_pdf_path)
@@ -53,66 +68,42 @@ def handle_query():
             if not query_text:
                 return jsonify({"error": "Invalid or missing 'question' in request body"}), 400
 
-            print(f"Calling query_rag with text: '{query_text}'")
+            logger.debug(f"Answering a {len(query_text)}-character question")
             try:
-                response_text = query_rag(query_text)
-                print(f"query_rag response: '{response_text}'")
+                entry, embedding = lookup_answer(query_text)
+                response_text = query_rag(query_text, embedding) if entry is None else entry["answer"]
                 # Return as a single question-answer pair
                 return jsonify({
                     "status": "success", 
                     "responses": [{"question": query_text, "answer": response_text}]
                 })
             except Exception as e:
-                print(f"Error in query_rag: {e}")
+                logger.error(f"Error in query_rag: {e}")
                 return jsonify({"error": "Error processing question."}), 500
 
         else:
             return jsonify({"error": "No file or question provided"}), 400
 
     except Exception as e:
+        logger.error(f"Error handling /query: {e}")
         return jsonify({"error": str(e)}), 500
 
 
 @app.route('/query_stream', methods=['GET', 'POST'])
 def handle_query_stream():
-    print("handle_query_stream function called.")
-    print(f"Headers: {request.headers}")
-    
     try:
         # Get the question from either GET parameters or POST form data
         if request.method == 'GET':
             query_text = request.args.get('question', '').strip()
-            print(f"GET Request Args: {request.args}")
         else:  # POST
             query_text = request.form.get('question', '').strip()
-            print(f"POST Request Form: {request.form}")
         
         if not query_text:
             return jsonify({"error": "Invalid or missing 'question' in request"}), 400
         
         def generate():
-            # Send initial processing message
-            yield f"data: {json.dumps({'status': 'processing', 'partial': 'Thinking about your question...'})}\n\n"
-            time.sleep(0.5)  # Small delay to show initial message
-            
-            # Progress update
-            yield f"data: {json.dumps({'status': 'processing', 'partial': 'Analyzing relevant information...'})}\n\n"
-            time.sleep(0.5)
-            
-            # Another progress update
-            yield f"data: {json.dumps({'status': 'processing', 'partial': 'Finalizing the best answer...'})}\n\n"
-            
-            try:
-                # Get the actual answer
-                print(f"Calling query_rag with text: '{query_text}'")
-                response_text = query_rag(query_text)
-                print(f"query_rag response: '{response_text}'")
-                
-                # Send final result
-                yield f"data: {json.dumps({'status': 'success', 'response': response_text})}\n\n"
-            except Exception as e:
-                print(f"Error in query_rag: {e}")
-                yield f"data: {json.dumps({'status': 'error', 'error': str(e)})}\n\n"
+            # Stream real pipeline stages: retrieval first, then LLM tokens as they arrive
+            yield from query_rag_sse(query_text)
         
         return Response(stream_with_context(generate()), 
                        mimetype="text/event-stream",
@@ -122,9 +113,50 @@ def handle_query_stream():
                        })
             
     except Exception as e:
-        print(f"Exception in handle_query_stream: {e}")
+        logger.error(f"Exception in handle_query_stream: {e}")
         return jsonify({"error": str(e)}), 500
 
 
+@app.route('/health', methods=['GET'])
+def health():
+    # 503 until the shared engine has loaded the embedder, vector store and generator
+    status = get_engine().status()
+    return jsonify(status), (200 if status["ready"] else 503)
+
+
+@app.route('/pdf_cache/stats', methods=['GET'])
+def pdf_cache_stats():
+    return jsonify(get_pdf_cache().stats())
+
+
+@app.route('/answer_cache/stats', methods=['GET'])
+def answer_cache_stats():
+    return jsonify(get_answer_cache().stats())
+
+
+@app.route('/answer_bank/stats', methods=['GET'])
+def answer_bank_stats():
+    return jsonify(get_answer_bank().stats(get_engine().index_version()))
+
+
+@app.route('/metrics', methods=['GET'])
+def metrics():
+    return Response(render_metrics(), mimetype="text/plain; version=0.0.4")
+
+
+@app.route('/debug/profile', methods=['GET'])
+def profile():
+    # Folded stacks for flamegraph.pl / speedscope; ?reset=1 starts a new window
+    profiler = get_profiler()
+    if profiler is None:
+        return jsonify({"error": "Profiler disabled, start the server with PROFILER=1"}), 404
+    return Response(profiler.folded(reset=request.args.get("reset") == "1"), mimetype="text/plain")
+
+
 if __name__ == '__main__':
+    # Load the models once at startup instead of on the first question
+    logging.basicConfig(level=os.getenv("LOG_LEVEL", "INFO"),
+                        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    get_profiler()
+    warm_up_in_background()
     app.run(host="0.0.0.0", port=5000, debug=True)
\ No newline at end of file
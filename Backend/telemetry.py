@@ -0,0 +1,280 @@
+"""Tracing spans, Prometheus metrics, rate-limited logging and an opt-in sampling profiler.
+
+    with span("embedding"):
+        vector = model.embed_query(text)
+
+Every span is timed into the eduquest_stage_seconds histogram (label
+"stage") and, when OpenTelemetry is installed, also opened as an
+OpenTelemetry span so an exporter configured for the process picks it up.
+render_metrics() returns everything in the Prometheus text format for the
+/metrics endpoints.
+"""
+import bisect
+import contextvars
+import logging
+import os
+import sys
+import threading
+import time
+import uuid
+from collections import Counter
+from contextlib import contextmanager
+
+try:
+    from opentelemetry import trace as _otel_trace
+    _tracer = _otel_trace.get_tracer("eduquest")
+except ImportError:
+    _tracer = None
+
+logger = logging.getLogger(__name__)
+
+# Configuration
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120)
+LOG_RATE_LIMIT = int(os.getenv("LOG_RATE_LIMIT", "10"))  # records per call site ...
+LOG_RATE_PERIOD = float(os.getenv("LOG_RATE_PERIOD", "60"))  # ... per this many seconds
+PROFILER_ENABLED = os.getenv("PROFILER", "0") == "1"
+PROFILER_INTERVAL = float(os.getenv("PROFILER_INTERVAL_MS", "10")) / 1000
+
+_current_trace = contextvars.ContextVar("eduquest_trace", default=None)
+
+
+class Histogram:
+    """Cumulative-bucket latency histogram, one series per label value."""
+
+    def __init__(self, name, help_text, label, buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.help = help_text
+        self.label = label
+        self.buckets = buckets
+        self._series = {}  # label value -> [bucket counts..., +Inf count, sum]
+        self._lock = threading.Lock()
+
+    def observe(self, value, label_value):
+        with self._lock:
+            series = self._series.get(label_value)
+            if series is None:
+                series = self._series[label_value] = [0] * (len(self.buckets) + 1) + [0.0]
+            series[bisect.bisect_left(self.buckets, value)] += 1
+            series[-1] += value
+
+    def snapshot(self):
+        """{label value: {"count": n, "seconds": total}} for every series."""
+        with self._lock:
+            return {value: {"count": sum(series[:-1]), "seconds": series[-1]}
+                    for value, series in self._series.items()}
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            for value, series in sorted(self._series.items()):
+                cumulative = 0
+                for bound, count in zip(self.buckets + ("+Inf",), series[:-1]):
+                    cumulative += count
+                    lines.append(f'{self.name}_bucket{{{self.label}="{value}",le="{bound}"}} {cumulative}')
+                lines.append(f'{self.name}_sum{{{self.label}="{value}"}} {series[-1]:.6f}')
+                lines.append(f'{self.name}_count{{{self.label}="{value}"}} {cumulative}')
+        return lines
+
+
+class Counters:
+    """Monotonic counters, one series per (name, labels)."""
+
+    def __init__(self):
+        self._values = Counter()
+        self._help = {}
+        self._lock = threading.Lock()
+
+    def inc(self, name, help_text="", amount=1, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self._values[key] += amount
+            self._help.setdefault(name, help_text)
+
+    def render(self):
+        lines, seen = [], set()
+        with self._lock:
+            for (name, labels), value in sorted(self._values.items()):
+                if name not in seen:
+                    seen.add(name)
+                    lines += [f"# HELP {name} {self._help[name]}", f"# TYPE {name} counter"]
+                label_text = ",".join(f'{k}="{v}"' for k, v in labels)
+                lines.append(f"{name}{{{label_text}}} {value}" if label_text else f"{name} {value}")
+        return lines
+
+
+STAGE_SECONDS = Histogram("eduquest_stage_seconds", "Time spent in each pipeline stage.", "stage")
+counters = Counters()
+_gauges = {}  # name -> (help, callback returning a number or {label_value: number}, label)
+
+
+def register_gauge(name, help_text, callback, label=None):
+    """Report callback() as a gauge at scrape time (queue depths, cache sizes)."""
+    _gauges[name] = (help_text, callback, label)
+
+
+def count(name, help_text="", amount=1, **labels):
+    counters.inc(name, help_text, amount, **labels)
+
+
+def record_stage(stage, seconds, error=False):
+    """Record a finished stage timed by the caller, without a trace span.
+
+    For work that is suspended and resumed on other threads, such as a
+    streamed response, where a span cannot stay open across the yields.
+    """
+    STAGE_SECONDS.observe(seconds, stage)
+    if error:
+        count("eduquest_stage_errors_total", "Pipeline stages that raised.", stage=stage)
+
+
+@contextmanager
+def span(stage, **attributes):
+    """Time a pipeline stage and record it as a trace span.
+
+    Spans nest: the outermost one starts a trace whose id is logged with each
+    finished span at debug level. A span must be closed on the thread that
+    opened it; use record_stage() for work that yields across threads.
+    """
+    trace_id = _current_trace.get()
+    token = _current_trace.set(uuid.uuid4().hex[:16]) if trace_id is None else None
+    start = time.perf_counter()
+    otel = _tracer.start_as_current_span(stage, attributes=attributes) if _tracer else None
+    if otel is not None:
+        otel.__enter__()
+    error = None
+    try:
+        yield
+    except BaseException as e:
+        error = e
+        raise
+    finally:
+        elapsed = time.perf_counter() - start
+        if otel is not None:
+            otel.__exit__(type(error) if error else None, error, error.__traceback__ if error else None)
+        record_stage(stage, elapsed, error is not None)
+        logger.debug(f"span trace={_current_trace.get()} stage={stage} ms={elapsed * 1000:.1f}"
+                     + "".join(f" {key}={value}" for key, value in attributes.items())
+                     + (" error=1" if error is not None else ""))
+        if token is not None:
+            _current_trace.reset(token)
+
+
+def render_metrics():
+    """All metrics in the Prometheus text exposition format."""
+    lines = STAGE_SECONDS.render() + counters.render()
+    for name, (help_text, callback, label) in sorted(_gauges.items()):
+        try:
+            value = callback()
+        except Exception as e:
+            logger.warning(f"Gauge {name} failed: {e}")
+            continue
+        lines += [f"# HELP {name} {help_text}", f"# TYPE {name} gauge"]
+        if isinstance(value, dict):
+            lines += [f'{name}{{{label}="{key}"}} {number}' for key, number in sorted(value.items())]
+        else:
+            lines.append(f"{name} {value}")
+    return "\n".join(lines) + "\n"
+
+
+class RateLimitFilter(logging.Filter):
+    """Let at most `rate` records per call site through every `period` seconds.
+
+    Suppressed records are counted, and the next record let through from the
+    same call site says how many were dropped.
+    """
+
+    def __init__(self, rate=LOG_RATE_LIMIT, period=LOG_RATE_PERIOD):
+        super().__init__()
+        self.rate = rate
+        self.period = period
+        self._sites = {}  # (pathname, lineno) -> [window start, emitted, suppressed]
+        self._lock = threading.Lock()
+
+    def filter(self, record):
+        key = (record.pathname, record.lineno)
+        now = time.monotonic()
+        with self._lock:
+            site = self._sites.get(key)
+            if site is None or now - site[0] >= self.period:
+                suppressed = site[2] if site else 0
+                site = self._sites[key] = [now, 0, 0]
+            else:
+                suppressed = 0
+            if site[1] >= self.rate:
+                site[2] += 1
+                return False
+            site[1] += 1
+        if suppressed:
+            record.msg = f"{record.msg} ({suppressed} similar messages suppressed)"
+        return True
+
+
+def get_logger(name):
+    """A logger whose records are rate limited per call site."""
+    log = logging.getLogger(name)
+    if not any(isinstance(f, RateLimitFilter) for f in log.filters):
+        log.addFilter(RateLimitFilter())
+    return log
+
+
+class SamplingProfiler:
+    """Samples every thread's stack at a fixed interval into folded-stack counts.
+
+    The output of folded() is the "frame;frame;frame count" format that
+    flamegraph.pl and speedscope read. Sampling costs a few microseconds per
+    thread per tick, so it is only started when PROFILER=1.
+    """
+
+    def __init__(self, interval=PROFILER_INTERVAL):
+        self.interval = interval
+        self.samples = Counter()
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="sampling-profiler", daemon=True)
+            self._thread.start()
+            logger.info(f"Sampling profiler started ({self.interval * 1000:.0f} ms interval)")
+        return self
+
+    def stop(self):
+        self._stop.set()
+
+    def _run(self):
+        own = threading.get_ident()
+        while not self._stop.wait(self.interval):
+            stacks = []
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == own:
+                    continue
+                names = []
+                while frame is not None:
+                    code = frame.f_code
+                    names.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{frame.f_lineno})")
+                    frame = frame.f_back
+                stacks.append(";".join(reversed(names)))
+            with self._lock:
+                self.samples.update(stacks)
+
+    def folded(self, reset=False):
+        with self._lock:
+            text = "\n".join(f"{stack} {n}" for stack, n in self.samples.most_common())
+            if reset:
+                self.samples.clear()
+        return text + "\n"
+
+
+_profiler = None
+_profiler_lock = threading.Lock()
+
+
+def get_profiler():
+    """The process-wide sampling profiler, running only if PROFILER=1 (else None)."""
+    global _profiler
+    if _profiler is None and PROFILER_ENABLED:
+        with _profiler_lock:
+            if _profiler is None:
+                _profiler = SamplingProfiler().start()
+    return _profiler
@@ -0,0 +1,137 @@
+import pytest
+
+import answer_bank
+from answer_bank import AnswerBank
+
+PAGING = [1.0, 0.0, 0.0]
+NEAR_PAGING = [0.99, 0.1, 0.0]
+DEADLOCK = [0.0, 1.0, 0.0]
+
+
+@pytest.fixture
+def bank(tmp_path, monkeypatch):
+    monkeypatch.setenv("EMBEDDING_BACKEND", "torch")
+    bank = AnswerBank(str(tmp_path), threshold=0.95)
+    bank.put("What is paging?", PAGING, "Paging splits memory into pages.", [], "ctx-1", "v1")
+    return bank
+
+
+class FakeEngine:
+    def __init__(self, version="v1"):
+        self.version = version
+        self.embedded = []
+
+    def index_version(self):
+        return self.version
+
+    def embed_query(self, text):
+        self.embedded.append(text)
+        return NEAR_PAGING if "paging" in text.lower() else DEADLOCK
+
+    def embed_queries(self, texts):
+        return [self.embed_query(text) for text in texts]
+
+
+@pytest.fixture
+def engine(bank, monkeypatch):
+    fake = FakeEngine()
+    monkeypatch.setattr(answer_bank, "get_engine", lambda: fake)
+    monkeypatch.setattr(answer_bank, "get_answer_bank", lambda: bank)
+    return fake
+
+
+def test_exact_lookup_uses_normalized_question(bank):
+    assert bank.get_exact("1. what is PAGING", "v1")["answer"] == "Paging splits memory into pages."
+    assert bank.get_exact("What is segmentation?", "v1") is None
+
+
+def test_semantic_lookup_respects_threshold(bank):
+    assert bank.get_semantic(NEAR_PAGING, "v1")["question"] == "What is paging?"
+    assert bank.get_semantic(DEADLOCK, "v1") is None
+
+
+def test_entries_go_stale_when_the_index_changes(bank):
+    assert bank.has_fresh("v1")
+    assert not bank.has_fresh("v2")
+    assert bank.get_exact("What is paging?", "v2") is None
+    assert bank.get_semantic(PAGING, "v2") is None
+    assert bank.stale_questions("v2") == ["What is paging?"]
+
+
+def test_entries_go_stale_when_the_embedding_backend_changes(bank, monkeypatch):
+    monkeypatch.setenv("EMBEDDING_BACKEND", "int8")
+    assert bank.get_exact("What is paging?", "v1") is None
+
+
+def test_paper_is_served_only_when_every_question_is_fresh(bank):
+    bank.add_paper("sha", "os.pdf", ["What is paging?", "What is a deadlock?"])
+    assert bank.get_paper("sha", "v1") is None
+
+    bank.put("What is a deadlock?", DEADLOCK, "A cycle of waiting processes.", [], "ctx-2", "v1")
+    assert [entry["question"] for entry in bank.get_paper("sha", "v1")] == ["What is paging?", "What is a deadlock?"]
+    assert bank.get_paper("sha", "v2") is None
+
+
+def test_saved_bank_is_reloaded(bank, tmp_path):
+    bank.save()
+    reloaded = AnswerBank(str(tmp_path))
+    assert reloaded.get_exact("What is paging?", "v1")["context_key"] == "ctx-1"
+    assert reloaded.get_semantic(NEAR_PAGING, "v1") is not None
+
+
+def test_miss_passes_the_embedding_to_generation(engine, monkeypatch):
+    calls = []
+    monkeypatch.setattr(answer_bank, "answer_question",
+                        lambda question, embedding=None: calls.append((question, embedding)) or "generated")
+
+    assert answer_bank.answer_with_bank("What is a deadlock?") == "generated"
+    assert calls == [("What is a deadlock?", DEADLOCK)]
+    assert engine.embedded == ["What is a deadlock?"]
+
+
+def test_hits_skip_generation(engine, monkeypatch):
+    monkeypatch.setattr(answer_bank, "answer_question", pytest.fail)
+
+    assert answer_bank.answer_with_bank("What is paging?") == "Paging splits memory into pages."
+    assert answer_bank.answer_with_bank("Explain paging") == "Paging splits memory into pages."
+    assert engine.embedded == ["Explain paging"]
+
+
+def test_answer_many_generates_only_misses_with_their_embeddings(engine, monkeypatch):
+    calls = []
+
+    def query_many(questions, max_workers, timeout, embeddings=None):
+        calls.append((questions, embeddings))
+        return [{"question": q, "answer": "generated", "error": None} for q in questions]
+
+    monkeypatch.setattr(answer_bank, "query_many", query_many)
+    results = answer_bank.answer_many(["What is paging?", "Explain paging", "What is a deadlock?"])
+
+    assert [result["answer"] for result in results] == [
+        "Paging splits memory into pages.", "Paging splits memory into pages.", "generated"]
+    assert calls == [(["What is a deadlock?"], [DEADLOCK])]
+
+
+def test_stale_bank_is_not_searched(engine, monkeypatch):
+    engine.version = "v2"
+    monkeypatch.setattr(answer_bank, "answer_question", lambda question, embedding=None: "generated")
+
+    assert answer_bank.answer_with_bank("What is paging?") == "generated"
+    assert engine.embedded == []
+
+
+def test_writers_in_other_processes_do_not_overwrite_each_other(bank, tmp_path):
+    bank.save()
+    watcher = AnswerBank(str(tmp_path))  # e.g. a long-running refresh --watch
+    builder = AnswerBank(str(tmp_path))
+    with builder.updating():
+        builder.put("What is a deadlock?", DEADLOCK, "A cycle of waiting processes.", [], "ctx-2", "v1")
+        builder.add_paper("sha", "os.pdf", ["What is a deadlock?"])
+
+    with watcher.updating():
+        watcher.put("What is paging?", PAGING, "Paging, regenerated.", [], "ctx-1", "v2")
+
+    reloaded = AnswerBank(str(tmp_path))
+    assert reloaded.get_exact("What is a deadlock?", "v1")["answer"] == "A cycle of waiting processes."
+    assert reloaded.get_exact("What is paging?", "v2")["answer"] == "Paging, regenerated."
+    assert "sha" in reloaded.papers
@@ -0,0 +1,86 @@
+from answer_cache import AnswerCache
+
+PAGING = [1.0, 0.0, 0.0]
+NEAR_PAGING = [0.99, 0.1, 0.0]
+DEADLOCK = [0.0, 1.0, 0.0]
+
+
+def test_semantic_hit_needs_similar_question_and_same_context():
+    cache = AnswerCache(threshold=0.95)
+    cache.put("What is paging?", PAGING, "ctx-1", "Paging splits memory into pages.")
+
+    assert cache.get_semantic(NEAR_PAGING, "ctx-1")["answer"] == "Paging splits memory into pages."
+    assert cache.get_semantic(NEAR_PAGING, "ctx-2") is None
+    assert cache.get_semantic(DEADLOCK, "ctx-1") is None
+    assert (cache.semantic_hits, cache.misses) == (1, 2)
+
+
+def test_best_match_wins():
+    cache = AnswerCache(threshold=0.5)
+    cache.put("What is paging?", PAGING, "ctx", "paging")
+    cache.put("What is a deadlock?", DEADLOCK, "ctx", "deadlock")
+
+    assert cache.get_semantic([0.2, 0.9, 0.0], "ctx")["answer"] == "deadlock"
+
+
+def test_expired_entries_are_not_served():
+    cache = AnswerCache(ttl=0.0)
+    cache.put("What is paging?", PAGING, "ctx", "paging")
+    cache._entries["what is paging"]["created"] -= 1
+    cache._row_created[0] -= 1
+
+    assert cache.get_semantic(PAGING, "ctx") is None
+    assert cache.get_exact("What is paging?") is None
+    assert len(cache._entries) == 0
+
+
+def test_evicted_rows_are_reused():
+    cache = AnswerCache(max_entries=2)
+    cache.put("What is paging?", PAGING, "ctx", "paging")
+    cache.put("What is a deadlock?", DEADLOCK, "ctx", "deadlock")
+    cache.get_exact("What is paging?")
+    cache.put("What is a semaphore?", [0.0, 0.0, 1.0], "ctx", "semaphore")
+
+    assert cache.get_exact("What is a deadlock?") is None
+    assert cache.get_semantic(DEADLOCK, "ctx") is None
+    assert cache.get_semantic([0.0, 0.0, 1.0], "ctx")["answer"] == "semaphore"
+    assert cache.get_semantic(PAGING, "ctx")["answer"] == "paging"
+    assert cache.evictions == 1
+    assert cache._free_rows == [1]
+
+    cache.put("What is a mutex?", DEADLOCK, "ctx", "mutex")
+    # Row 1 was reused; the least recently used semaphore entry gave up row 2
+    assert cache._free_rows == [2] and len(cache._row_keys) == 3
+    assert cache.get_semantic(DEADLOCK, "ctx")["answer"] == "mutex"
+
+
+def test_replacing_a_question_keeps_one_row():
+    cache = AnswerCache()
+    cache.put("What is paging?", PAGING, "ctx-1", "old")
+    cache.put("what is paging", PAGING, "ctx-2", "new")
+
+    assert cache.get_semantic(PAGING, "ctx-1") is None
+    assert cache.get_semantic(PAGING, "ctx-2")["answer"] == "new"
+    assert cache.stats()["entries"] == 1
+
+
+def test_index_change_and_new_embedding_size_clear_the_cache():
+    cache = AnswerCache()
+    cache.sync_index_version("v1")
+    cache.put("What is paging?", PAGING, "ctx", "paging")
+    cache.sync_index_version("v2")
+    assert cache.get_exact("What is paging?") is None
+    assert cache.get_semantic(PAGING, "ctx") is None
+
+    cache.put("What is paging?", PAGING, "ctx", "paging")
+    cache.put("What is a deadlock?", [0.0, 1.0], "ctx", "deadlock")
+    assert cache.get_exact("What is paging?") is None
+    assert cache.get_semantic([0.0, 1.0], "ctx")["answer"] == "deadlock"
+
+
+def test_zero_size_cache_stores_nothing():
+    cache = AnswerCache(max_entries=0)
+    cache.put("What is paging?", PAGING, "ctx", "paging")
+
+    assert cache.get_exact("What is paging?") is None
+    assert cache.get_semantic(PAGING, "ctx") is None
@@ -0,0 +1,24 @@
+from langchain.schema import Document
+
+from context_builder import _merge_spans, build_context
+
+TEXT = " ".join(f"word{i}" for i in range(60))
+
+
+def chunk(start, end, source="notes.txt"):
+    return Document(page_content=TEXT[start:end], metadata={"source": source}), 0.0
+
+
+def test_chunk_bridging_two_spans_merges_them():
+    c1, c2, c3 = chunk(0, 120), chunk(80, 200), chunk(160, 280)
+    assert _merge_spans([c3, c1, c2]) == [[TEXT[0:280], "notes.txt", 0]]
+
+
+def test_overlap_appears_once_in_context():
+    context = build_context([chunk(160, 280), chunk(0, 120), chunk(80, 200)])
+    assert context == TEXT[0:280]
+
+
+def test_chunks_of_different_sources_are_not_merged():
+    spans = _merge_spans([chunk(0, 120, "a.txt"), chunk(80, 200, "b.txt")])
+    assert [span[1] for span in spans] == ["a.txt", "b.txt"]
@@ -0,0 +1,66 @@
+import os
+import subprocess
+import sys
+
+import rag_engine
+from generators import StubGenerator
+from get_embedding_function import E5Embeddings, HashEmbeddings
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def run_writer(tmp_path, code):
+    """Run data_process in a separate process, like the admin upload server or the CLI."""
+    env = dict(os.environ, EMBEDDING_BACKEND="hash", ALLOW_FAKE_EMBEDDINGS="1",
+               EMBEDDING_CACHE_DIR=str(tmp_path / "embedding_cache"),
+               PYTHONPATH=os.pathsep.join(filter(None, [BACKEND_DIR, os.environ.get("PYTHONPATH")])))
+    subprocess.run([sys.executable, "-c", f"import data_process\n{code}"], cwd=tmp_path, env=env, check=True)
+
+
+def sources(results):
+    return {os.path.basename(doc.metadata["source"]) for doc, _score in results}
+
+
+def test_query_process_sees_chunks_written_by_another_process(tmp_path, monkeypatch):
+    monkeypatch.setattr(rag_engine, "INDEX_CHECK_SECONDS", 0)
+    index_root = str(tmp_path / "index")
+    data = tmp_path / "data"
+    data.mkdir()
+    (data / "paging.txt").write_text("Paging splits memory into fixed size pages and frames.")
+    run_writer(tmp_path, f"data_process.sync_directory({str(data)!r}, {index_root!r})")
+
+    engine = rag_engine.RAGEngine(index_root, embedding_function=E5Embeddings(HashEmbeddings()),
+                                  generator=StubGenerator())
+    engine.hybrid = False  # BM25 is reloaded separately; check the vector store itself
+    engine.warm_up()
+    assert sources(engine.retrieve("deadlock waiting cycle")) == {"paging.txt"}
+
+    (data / "deadlock.txt").write_text("A deadlock is a cycle of processes waiting on each other.")
+    run_writer(tmp_path, f"data_process.index_file({str(data / 'deadlock.txt')!r}, {index_root!r})")
+
+    engine.warm_up()
+    assert sources(engine.retrieve("deadlock waiting cycle")) == {"paging.txt", "deadlock.txt"}
+
+
+def test_writer_process_keeps_chunks_written_by_another_process(tmp_path, monkeypatch):
+    import data_process
+    from index_store import current_path, open_chroma
+
+    monkeypatch.setenv("EMBEDDING_BACKEND", "hash")
+    monkeypatch.setenv("ALLOW_FAKE_EMBEDDINGS", "1")
+    index_root = str(tmp_path / "index")
+    embeddings = E5Embeddings(HashEmbeddings())
+    data = tmp_path / "data"
+    data.mkdir()
+    for name, text in [("paging.txt", "Paging splits memory into fixed size pages and frames."),
+                       ("deadlock.txt", "A deadlock is a cycle of processes waiting on each other."),
+                       ("tcp.txt", "TCP retransmits segments that are not acknowledged in time.")]:
+        (data / name).write_text(text)
+
+    data_process.index_file(str(data / "paging.txt"), index_root, embeddings)
+    run_writer(tmp_path, f"data_process.index_file({str(data / 'deadlock.txt')!r}, {index_root!r})")
+    data_process.index_file(str(data / "tcp.txt"), index_root, embeddings)
+
+    db = open_chroma(current_path(index_root), embeddings, reload=True)
+    results = db.similarity_search_with_score("deadlock waiting cycle", k=3)
+    assert sources(results) == {"paging.txt", "deadlock.txt", "tcp.txt"}
@@ -0,0 +1,84 @@
+import math
+import pickle
+import random
+
+import pytest
+
+from lexical_index import BM25Index, tokenize
+
+WORDS = "paging segmentation deadlock semaphore mutex scheduler kernel thread process memory cache tlb".split()
+
+
+def brute_force_scores(index, query_text):
+    """BM25 computed from scratch over the live chunks."""
+    live = {row: chunk_id for row, chunk_id in enumerate(index.ids) if chunk_id is not None}
+    texts = {row: [term for term, (rows, _) in index.postings.items() for r in rows if r == row] for row in live}
+    avg_length = sum(index.lengths[row] for row in live) / len(live)
+    scores = {}
+    for term in set(tokenize(query_text)):
+        rows, freqs = index.postings.get(term, ((), ()))
+        df = sum(1 for row in live if term in texts[row])
+        if not df:
+            continue
+        idf = math.log(1 + (len(live) - df + 0.5) / (df + 0.5))
+        for row, freq in zip(rows, freqs):
+            if row in live:
+                norm = index.k1 * (1 - index.b + index.b * index.lengths[row] / avg_length)
+                scores[live[row]] = scores.get(live[row], 0.0) + idf * freq * (index.k1 + 1) / (freq + norm)
+    return scores
+
+
+def random_index(seed, chunks=300, removed=120):
+    rng = random.Random(seed)
+    index = BM25Index()
+    for i in range(chunks):
+        index.add(f"c{i}", " ".join(rng.choices(WORDS, k=rng.randint(3, 30))))
+    for i in rng.sample(range(chunks), removed):
+        index.remove(f"c{i}")
+    # Re-adding replaces the old row
+    for i in range(0, chunks, 25):
+        index.add(f"c{i}", " ".join(rng.choices(WORDS, k=10)))
+    return index
+
+
+def assert_matches_brute_force(index):
+    for query_text in ("paging and memory", "deadlock semaphore mutex", "tlb"):
+        expected = brute_force_scores(index, query_text)
+        results = dict(index.search(query_text, k=len(expected)))
+        assert results.keys() == expected.keys()
+        for chunk_id, score in results.items():
+            assert score == pytest.approx(expected[chunk_id])
+
+
+@pytest.mark.parametrize("seed", range(3))
+def test_search_matches_bm25_over_live_chunks(seed):
+    assert_matches_brute_force(random_index(seed))
+
+
+def test_document_frequency_survives_compaction():
+    index = random_index(0)
+    df = +index.df
+    index.compact()
+    assert index.df == df
+    assert_matches_brute_force(index)
+
+
+def test_saved_index_keeps_document_frequency(tmp_path):
+    index = random_index(1)
+    path = str(tmp_path / "bm25.pkl")
+    index.save(path)
+    loaded = BM25Index.load(path)
+    assert +loaded.df == +index.df
+    assert loaded.search("paging memory") == index.search("paging memory")
+
+
+def test_index_saved_without_document_frequency_is_upgraded(tmp_path):
+    index = random_index(2)
+    state = dict(index.__dict__)
+    del state["df"], state["row_terms"]
+    path = str(tmp_path / "bm25.pkl")
+    with open(path, "wb") as f:
+        pickle.dump(state, f)
+    loaded = BM25Index.load(path)
+    assert +loaded.df == +index.df
+    assert_matches_brute_force(loaded)
@@ -0,0 +1,125 @@
+import json
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+from langchain_core.documents import Document
+
+import query
+import rag_engine
+import telemetry
+from answer_cache import AnswerCache
+from generators import StubGenerator
+
+
+class FakeEngine:
+    """Just enough of RAGEngine for the streaming pipeline, with the stub LLM."""
+
+    def __init__(self, documents=2, fail=False):
+        self.documents = documents
+        self.fail = fail
+        self.generator = StubGenerator(tokens=6)
+
+    def index_version(self):
+        return "test:1"
+
+    def embed_query(self, text):
+        return [1.0, 0.0, 0.0]
+
+    def retrieve_by_vector(self, embedding, k=5, query_text=None):
+        if self.fail:
+            raise RuntimeError("vector store unavailable")
+        return [
+            (Document(page_content=f"chunk {i}", metadata={"id": f"notes.pdf:0:{i}", "source": "notes.pdf"}), 0.1 * i)
+            for i in range(self.documents)
+        ]
+
+    def build_prompt(self, query_text, results):
+        return f"{query_text}\n" + "\n".join(doc.page_content for doc, _score in results)
+
+    def stream(self, prompt):
+        return self.generator.stream(prompt)
+
+
+@pytest.fixture
+def engine(monkeypatch):
+    fake = FakeEngine()
+    monkeypatch.setattr(query, "get_engine", lambda: fake)
+    cache = AnswerCache()
+    monkeypatch.setattr(query, "get_answer_cache", lambda: cache)
+    return fake
+
+
+def sse_events(stream):
+    events = []
+    for message in stream:
+        assert message.startswith("data: ") and message.endswith("\n\n")
+        events.append(json.loads(message[len("data: "):]))
+    return events
+
+
+def test_stream_yields_retrieval_tokens_then_answer(engine):
+    events = list(query.query_rag_stream("What is paging?"))
+    prompt = engine.build_prompt("What is paging?", engine.retrieve_by_vector(None))
+
+    assert events[0]["stage"] == "retrieval"
+    assert [source["id"] for source in events[0]["sources"]] == ["notes.pdf:0:0", "notes.pdf:0:1"]
+    tokens = [event["token"] for event in events[1:-1]]
+    assert all(event["stage"] == "token" for event in events[1:-1])
+    assert len(tokens) == 6
+    assert events[-1]["stage"] == "done"
+    assert events[-1]["answer"] == "".join(tokens) == StubGenerator(tokens=6).generate(prompt)
+
+
+def test_sse_sends_tokens_without_the_answer_so_far(engine):
+    events = sse_events(query.query_rag_sse("What is paging?"))
+
+    assert events[0]["stage"] == "retrieval"
+    generation = events[1:-1]
+    assert generation and all(set(event) == {"status", "stage", "token"} for event in generation)
+    assert events[-1]["status"] == "success"
+    assert events[-1]["response"] == "".join(event["token"] for event in generation)
+
+
+def test_sse_without_context(engine):
+    engine.documents = 0
+    events = sse_events(query.query_rag_sse("What is paging?"))
+
+    assert [event["status"] for event in events] == ["processing", "success"]
+    assert events[-1]["response"] == "No relevant context found."
+
+
+def test_sse_reports_errors_as_final_event(engine):
+    engine.fail = True
+    events = sse_events(query.query_rag_sse("What is paging?"))
+
+    assert events == [{"status": "error", "error": "vector store unavailable"}]
+
+
+def test_repeated_question_is_streamed_from_cache(engine):
+    first = list(query.query_rag_stream("What is paging?"))
+    second = list(query.query_rag_stream("what is paging"))
+
+    assert second[0]["cached"] is True
+    assert [event["stage"] for event in second] == ["retrieval", "token", "done"]
+    assert second[1]["token"] == second[-1]["answer"] == first[-1]["answer"]
+
+
+def test_engine_stream_stepped_on_different_threads_is_timed(monkeypatch):
+    engine = rag_engine.RAGEngine(generator=StubGenerator(tokens=4))
+    monkeypatch.setattr(engine, "warm_up", lambda: None)
+    before = telemetry.STAGE_SECONDS.snapshot().get("generation", {}).get("count", 0)
+    stream = engine.stream("prompt")
+    # Like asgi_server.BoundedPool.stream, every step is a separate pool task: start on one thread, finish on another
+    pools = [ThreadPoolExecutor(max_workers=1) for _ in range(2)]
+    fragments, step = [], 0
+    while True:
+        fragment = pools[min(step, 1)].submit(next, stream, None).result()
+        step += 1
+        if fragment is None:
+            break
+        fragments.append(fragment)
+    assert [pool.submit(telemetry._current_trace.get).result() for pool in pools] == [None, None]
+    for pool in pools:
+        pool.shutdown()
+    assert fragments
+    assert telemetry.STAGE_SECONDS.snapshot()["generation"]["count"] == before + 1
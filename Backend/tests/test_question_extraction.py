@@ -0,0 +1,62 @@
+import pytest
+
+import query
+from pdf_cache import PDFTextCache
+from pdf_extract import OCRError
+
+PAPER = ["1. What is a system call? (3)\n2. Define thrashing. (3)\n"]
+
+
+@pytest.fixture
+def paper(tmp_path, monkeypatch):
+    cache = PDFTextCache(str(tmp_path / "cache"))
+    monkeypatch.setattr(query, "get_pdf_cache", lambda: cache)
+    pdf_path = tmp_path / "paper.pdf"
+    pdf_path.write_bytes(b"%PDF-1.4 test paper")
+    return str(pdf_path)
+
+
+def extract_with(monkeypatch, pages):
+    calls = []
+
+    def extract(pdf_path):
+        calls.append(pdf_path)
+        if isinstance(pages, Exception):
+            raise pages
+        return list(pages)
+
+    monkeypatch.setattr(query, "extract_page_texts", extract)
+    return calls
+
+
+def test_questions_are_cached(paper, monkeypatch):
+    calls = extract_with(monkeypatch, PAPER)
+    first = query.extract_questions_from_pdf(paper)
+    second = query.extract_questions_from_pdf(paper)
+
+    assert first == second == ["What is a system call?", "Define thrashing."]
+    assert len(calls) == 1
+
+
+def test_paper_without_questions_is_not_cached(paper, monkeypatch):
+    calls = extract_with(monkeypatch, ["Course outline only."])
+    assert query.extract_questions_from_pdf(paper) == []
+    assert query.extract_questions_from_pdf(paper) == []
+    assert len(calls) == 2
+
+
+def test_paper_with_an_unread_page_is_not_cached(paper, monkeypatch):
+    calls = extract_with(monkeypatch, PAPER + [""])
+    query.extract_questions_from_pdf(paper)
+    query.extract_questions_from_pdf(paper)
+    assert len(calls) == 2
+
+
+def test_ocr_failure_propagates_and_is_not_cached(paper, monkeypatch):
+    calls = extract_with(monkeypatch, OCRError("tesseract not found"))
+    with pytest.raises(OCRError):
+        query.extract_questions_from_pdf(paper)
+
+    extract_with(monkeypatch, PAPER)
+    assert query.extract_questions_from_pdf(paper) == ["What is a system call?", "Define thrashing."]
+    assert len(calls) == 1